@@ -13,6 +13,10 @@ from app.models import project
 from app.models import lore
 from app.models import outline
 from app.models import snapshot
+from app.models import consistency
+from app.models import job
+from app.models import activity
+from app.models import summary
 
 config = context.config
 
@@ -0,0 +1,40 @@
+"""Add lore embeddings table
+
+Revision ID: a1d4e7c2b9f0
+Revises: 5137aadbf091
+Create Date: 2026-10-17 09:12:04.318220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1d4e7c2b9f0'
+down_revision: Union[str, None] = '5137aadbf091'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    op.create_table('lore_embeddings',
+    sa.Column('lore_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('embedding', Vector(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['lore_id'], ['lore_items.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('lore_id')
+    )
+    op.create_index(op.f('ix_lore_embeddings_project_id'), 'lore_embeddings', ['project_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_lore_embeddings_project_id'), table_name='lore_embeddings')
+    op.drop_table('lore_embeddings')
@@ -0,0 +1,41 @@
+"""Add search indexes
+
+Revision ID: a8d2e5f1c7b3
+Revises: f1c6b3e8d2a7
+Create Date: 2026-10-17 18:40:12.871305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d2e5f1c7b3'
+down_revision: Union[str, None] = 'f1c6b3e8d2a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(op.f('ix_chapters_project_id'), 'chapters', ['project_id'], unique=False)
+    op.create_index('ix_chapters_content_trgm', 'chapters', ['content'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'content': 'gin_trgm_ops'})
+    op.create_index(op.f('ix_lore_items_project_id'), 'lore_items', ['project_id'], unique=False)
+    op.create_index('ix_lore_items_name_trgm', 'lore_items', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_lore_items_description_trgm', 'lore_items', ['description'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'})
+    op.create_index('ix_lore_items_content_trgm', 'lore_items', ['content'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'content': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lore_items_content_trgm', table_name='lore_items')
+    op.drop_index('ix_lore_items_description_trgm', table_name='lore_items')
+    op.drop_index('ix_lore_items_name_trgm', table_name='lore_items')
+    op.drop_index(op.f('ix_lore_items_project_id'), table_name='lore_items')
+    op.drop_index('ix_chapters_content_trgm', table_name='chapters')
+    op.drop_index(op.f('ix_chapters_project_id'), table_name='chapters')
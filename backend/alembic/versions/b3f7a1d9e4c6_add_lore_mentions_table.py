@@ -0,0 +1,40 @@
+"""Add lore mentions table
+
+Revision ID: b3f7a1d9e4c6
+Revises: a8d2e5f1c7b3
+Create Date: 2026-10-17 19:52:33.140286
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f7a1d9e4c6'
+down_revision: Union[str, None] = 'a8d2e5f1c7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('lore_mentions',
+    sa.Column('lore_id', sa.Integer(), nullable=False),
+    sa.Column('chapter_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('first_offset', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['chapter_id'], ['chapters.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['lore_id'], ['lore_items.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('lore_id', 'chapter_id')
+    )
+    op.create_index(op.f('ix_lore_mentions_chapter_id'), 'lore_mentions', ['chapter_id'], unique=False)
+    op.create_index(op.f('ix_lore_mentions_project_id'), 'lore_mentions', ['project_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_lore_mentions_project_id'), table_name='lore_mentions')
+    op.drop_index(op.f('ix_lore_mentions_chapter_id'), table_name='lore_mentions')
+    op.drop_table('lore_mentions')
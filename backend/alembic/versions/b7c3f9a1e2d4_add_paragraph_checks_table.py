@@ -0,0 +1,39 @@
+"""Add paragraph checks table
+
+Revision ID: b7c3f9a1e2d4
+Revises: a1d4e7c2b9f0
+Create Date: 2026-10-17 10:03:41.552810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c3f9a1e2d4'
+down_revision: Union[str, None] = 'a1d4e7c2b9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('paragraph_checks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chapter_id', sa.Integer(), nullable=False),
+    sa.Column('paragraph_hash', sa.String(length=64), nullable=False),
+    sa.Column('lore_stamp', sa.String(length=64), nullable=False),
+    sa.Column('issues', postgresql.JSONB(astext_type=sa.Text()), server_default='[]', nullable=False),
+    sa.Column('checked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['chapter_id'], ['chapters.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('chapter_id', 'paragraph_hash', name='uq_paragraph_checks_chapter_hash')
+    )
+    op.create_index(op.f('ix_paragraph_checks_id'), 'paragraph_checks', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_paragraph_checks_id'), table_name='paragraph_checks')
+    op.drop_table('paragraph_checks')
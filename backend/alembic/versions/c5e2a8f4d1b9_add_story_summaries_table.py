@@ -0,0 +1,50 @@
+"""Add story summaries table
+
+Revision ID: c5e2a8f4d1b9
+Revises: b3f7a1d9e4c6
+Create Date: 2026-10-17 21:14:08.527310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a8f4d1b9'
+down_revision: Union[str, None] = 'b3f7a1d9e4c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('story_summaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('level', sa.String(), nullable=False),
+    sa.Column('volume_id', sa.Integer(), nullable=True),
+    sa.Column('chapter_id', sa.Integer(), nullable=True),
+    sa.Column('source_hash', sa.String(length=64), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['chapter_id'], ['chapters.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['volume_id'], ['volumes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_story_summaries_id'), 'story_summaries', ['id'], unique=False)
+    op.create_index(op.f('ix_story_summaries_project_id'), 'story_summaries', ['project_id'], unique=False)
+    op.create_index('uq_story_summaries_chapter', 'story_summaries', ['chapter_id'], unique=True, postgresql_where=sa.text("level = 'chapter'"))
+    op.create_index('uq_story_summaries_project', 'story_summaries', ['project_id'], unique=True, postgresql_where=sa.text("level = 'project'"))
+    op.create_index('uq_story_summaries_volume', 'story_summaries', ['volume_id'], unique=True, postgresql_where=sa.text("level = 'volume'"))
+
+
+def downgrade() -> None:
+    op.drop_index('uq_story_summaries_volume', table_name='story_summaries', postgresql_where=sa.text("level = 'volume'"))
+    op.drop_index('uq_story_summaries_project', table_name='story_summaries', postgresql_where=sa.text("level = 'project'"))
+    op.drop_index('uq_story_summaries_chapter', table_name='story_summaries', postgresql_where=sa.text("level = 'chapter'"))
+    op.drop_index(op.f('ix_story_summaries_project_id'), table_name='story_summaries')
+    op.drop_index(op.f('ix_story_summaries_id'), table_name='story_summaries')
+    op.drop_table('story_summaries')
@@ -0,0 +1,49 @@
+"""Add writing activity table
+
+Revision ID: d4f1b8e6a2c9
+Revises: c2e8a5d7f3b1
+Create Date: 2026-10-17 14:21:09.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f1b8e6a2c9'
+down_revision: Union[str, None] = 'c2e8a5d7f3b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('writing_activity',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('words_added', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('words_deleted', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'project_id', 'day')
+    )
+    op.create_index('ix_writing_activity_user_day', 'writing_activity', ['user_id', 'day'], unique=False)
+
+    # Seed each project's existing words as a baseline (app.core.writing_activity.BASELINE_DAY):
+    # they count towards total words, but were not written on any real day
+    op.execute("""
+        INSERT INTO writing_activity (user_id, project_id, day, words_added, words_deleted)
+        SELECT p.user_id, p.id, DATE '1970-01-01', SUM(COALESCE(c.word_count, 0)), 0
+        FROM projects p
+        JOIN chapters c ON c.project_id = p.id
+        GROUP BY p.user_id, p.id
+        HAVING SUM(COALESCE(c.word_count, 0)) > 0
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_writing_activity_user_day', table_name='writing_activity')
+    op.drop_table('writing_activity')
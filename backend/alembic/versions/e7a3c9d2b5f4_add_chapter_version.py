@@ -0,0 +1,26 @@
+"""Add chapter version
+
+Revision ID: e7a3c9d2b5f4
+Revises: d4f1b8e6a2c9
+Create Date: 2026-10-17 16:02:47.513920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9d2b5f4'
+down_revision: Union[str, None] = 'd4f1b8e6a2c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chapters', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('chapters', 'version')
@@ -0,0 +1,49 @@
+"""Compress chapter snapshots
+
+Revision ID: f1c6b3e8d2a7
+Revises: e7a3c9d2b5f4
+Create Date: 2026-10-17 17:11:35.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6b3e8d2a7'
+down_revision: Union[str, None] = 'e7a3c9d2b5f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chapter_snapshots', sa.Column('storage', sa.String(length=16), server_default='text', nullable=False))
+    op.add_column('chapter_snapshots', sa.Column('data', sa.LargeBinary(), nullable=True))
+    op.add_column('chapter_snapshots', sa.Column('base_id', sa.Integer(), nullable=True))
+    op.add_column('chapter_snapshots', sa.Column('chain_depth', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('chapter_snapshots', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key(
+        'chapter_snapshots_base_id_fkey', 'chapter_snapshots', 'chapter_snapshots', ['base_id'], ['id']
+    )
+    op.create_index('ix_chapter_snapshots_chapter_created', 'chapter_snapshots', ['chapter_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    # Compressed rows are only readable through the application; refuse rather than drop their text
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM chapter_snapshots WHERE storage <> 'text') THEN
+                RAISE EXCEPTION 'chapter_snapshots contains compressed rows; delete them before downgrading';
+            END IF;
+        END $$;
+    """)
+    op.drop_index('ix_chapter_snapshots_chapter_created', table_name='chapter_snapshots')
+    op.drop_constraint('chapter_snapshots_base_id_fkey', 'chapter_snapshots', type_='foreignkey')
+    op.drop_column('chapter_snapshots', 'content_hash')
+    op.drop_column('chapter_snapshots', 'chain_depth')
+    op.drop_column('chapter_snapshots', 'base_id')
+    op.drop_column('chapter_snapshots', 'data')
+    op.drop_column('chapter_snapshots', 'storage')
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, projects, volumes, chapters, lore, outline, writing, consistency, snapshots, export, stats, reorder, bible
+from app.api.v1 import auth, projects, volumes, chapters, lore, outline, writing, consistency, snapshots, export, stats, reorder, bible, jobs, search, summaries
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["Auth"])
@@ -15,3 +15,6 @@ api_router.include_router(snapshots.router, tags=["Snapshots"])
 api_router.include_router(export.router, tags=["Export"])
 api_router.include_router(stats.router, prefix="/stats", tags=["Stats"])
 api_router.include_router(reorder.router, prefix="/reorder", tags=["Reorder"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+api_router.include_router(search.router, tags=["Search"])
+api_router.include_router(summaries.router, tags=["Summaries"])
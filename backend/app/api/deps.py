@@ -4,32 +4,48 @@ from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.core.config import settings
-from app.db.session import get_db
-from app.core import security
+from app.db.session import get_db, get_read_db
+from app.core import principals, security
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login/access-token")
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+async def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        if payload.get("sub") is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    # query user
-    result = await db.execute(select(User).where(User.email == email))
+    if await principals.is_token_revoked(payload):
+        raise credentials_exception
+    return payload
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
+    payload: dict = Depends(get_token_payload)
+) -> User:
+    email: str = payload["sub"]
+    user_id = payload.get("uid")
+
+    if user_id is not None:
+        if principals.TRUST_TOKEN_CLAIMS:
+            return principals.user_from_claims(payload)
+        user = await principals.get_principal(user_id)
+        if user is not None and user.email == email:
+            return user
+
+    # query user (tokens issued before `uid` existed are looked up by email)
+    query = select(User).where(User.id == user_id) if user_id is not None else select(User).where(User.email == email)
+    result = await db.execute(query)
     user = result.scalars().first()
-    if user is None:
+    if user is None or user.email != email:
         raise credentials_exception
+    await principals.cache_principal(user)
     return user
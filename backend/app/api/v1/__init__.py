@@ -1 +1 @@
-from . import auth, projects, volumes, chapters, lore, outline, writing, consistency, snapshots, export, stats, reorder, bible
+from . import auth, projects, volumes, chapters, lore, outline, writing, consistency, snapshots, export, stats, reorder, bible, jobs, search, summaries
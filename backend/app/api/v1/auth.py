@@ -1,18 +1,62 @@
 from datetime import timedelta
-from typing import Any
+from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from jose import JWTError, jwt
 
 from app.api import deps
-from app.core import security
+from app.core import principals, security
 from app.core.config import settings
 from app.models.user import User
-from app.schemas.user import UserCreate, UserLogin, Token, AuthResponse, User as UserSchema
+from app.schemas.user import (
+    UserCreate, UserLogin, Token, AuthResponse, User as UserSchema, LogoutRequest, PasswordChange,
+)
 
 router = APIRouter()
 
+def _issue_tokens(user: User) -> dict:
+    claims = {"sub": user.email, "uid": user.id}
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = security.create_access_token(
+        data=claims, expires_delta=access_token_expires
+    )
+    refresh_token = security.create_refresh_token(
+        data=claims
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token
+    }
+
+async def _run_password_op(operation, *args):
+    """Run a thread-pooled bcrypt operation; a full queue becomes a 503 the client can retry."""
+    try:
+        return await operation(*args)
+    except security.PasswordHasherBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login attempts in progress, please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+async def _authenticate(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """Check credentials; hashes made with an outdated bcrypt cost are transparently upgraded."""
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
+    if not user:
+        return None
+    valid, new_hash = await _run_password_op(security.password_hasher.verify_and_update, password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
 @router.post("/register", response_model=AuthResponse, status_code=201)
 async def register(
     user_in: UserCreate,
@@ -29,36 +73,22 @@ async def register(
     
     user = User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=await _run_password_op(security.password_hasher.hash, user_in.password),
         is_active=True
     )
     db.add(user)
     await db.commit()
     await db.refresh(user)
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = security.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    refresh_token = security.create_refresh_token(
-        data={"sub": user.email}
-    )
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "refresh_token": refresh_token
-    }
+    return _issue_tokens(user)
 
 @router.post("/login", response_model=AuthResponse)
 async def login(
     user_in: UserLogin,
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
-    result = await db.execute(select(User).where(User.email == user_in.email))
-    user = result.scalars().first()
-    
-    if not user or not security.verify_password(user_in.password, user.hashed_password):
+    user = await _authenticate(db, user_in.email, user_in.password)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="Incorrect email or password",
@@ -67,19 +97,7 @@ async def login(
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = security.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    refresh_token = security.create_refresh_token(
-        data={"sub": user.email}
-    )
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "refresh_token": refresh_token
-    }
+    return _issue_tokens(user)
 
 @router.post("/login/access-token", response_model=AuthResponse)
 async def login_access_token(
@@ -89,10 +107,8 @@ async def login_access_token(
     """
     OAuth2 compatible token login, get an access token for future requests using form data (used by Swagger UI).
     """
-    result = await db.execute(select(User).where(User.email == form_data.username))
-    user = result.scalars().first()
-    
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = await _authenticate(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="Incorrect email or password",
@@ -101,19 +117,7 @@ async def login_access_token(
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = security.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    refresh_token = security.create_refresh_token(
-        data={"sub": user.email}
-    )
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "refresh_token": refresh_token
-    }
+    return _issue_tokens(user)
 
 @router.get("/me", response_model=UserSchema)
 async def read_users_me(
@@ -123,3 +127,46 @@ async def read_users_me(
     Get current user.
     """
     return current_user
+
+@router.post("/logout")
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    payload: dict = Depends(deps.get_token_payload),
+) -> Any:
+    """
+    Revoke the current access token (and the refresh token, if given).
+    """
+    await principals.revoke_token(payload)
+    if body and body.refresh_token:
+        try:
+            refresh_payload = jwt.decode(body.refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            refresh_payload = None
+        if refresh_payload and refresh_payload.get("sub") == payload["sub"]:
+            await principals.revoke_token(refresh_payload)
+    if payload.get("uid") is not None:
+        await principals.invalidate_principal(payload["uid"])
+    return {"message": "Logged out"}
+
+@router.post("/password", response_model=AuthResponse)
+async def change_password(
+    body: PasswordChange,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Change the password. Every token issued before the change stops working;
+    fresh tokens are returned.
+    """
+    result = await db.execute(select(User).where(User.id == current_user.id))
+    user = result.scalars().first()
+    valid = user is not None and (await _run_password_op(
+        security.password_hasher.verify_and_update, body.current_password, user.hashed_password
+    ))[0]
+    if not valid:
+        raise HTTPException(status_code=400, detail="Incorrect password")
+
+    user.hashed_password = await _run_password_op(security.password_hasher.hash, body.new_password)
+    await db.commit()
+    await principals.revoke_user_tokens(user.id)
+    return _issue_tokens(user)
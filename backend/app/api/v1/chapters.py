@@ -2,12 +2,18 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, undefer
 
 from app.api import deps
 from app.models.user import User
 from app.models.project import Project, Volume, Chapter
-from app.schemas.project import Chapter as ChapterSchema, ChapterCreate, ChapterUpdate
+from app.schemas.project import Chapter as ChapterSchema, ChapterCreate, ChapterUpdate, ChapterPatch, ChapterPatchResult
+from app.core.lore_mentions import update_chapter_mentions
+from app.core.story_summaries import refresh_after_removal
+from app.core.text_patch import PatchError, apply_ops
+from app.core.text_windows import content_hash
+from app.core.word_count import word_count
+from app.core.writing_activity import record_word_delta
 
 router = APIRouter()
 
@@ -38,11 +44,16 @@ async def create_chapter(
         project_id=volume.project_id
     )
     if chapter.content:
-        chapter.word_count = len(chapter.content)
+        chapter.word_count = word_count(chapter.content)
         
     db.add(chapter)
+    await record_word_delta(db, current_user.id, volume.project_id, chapter.word_count or 0)
+    if chapter.content:
+        await db.flush()
+        await update_chapter_mentions(db, volume.project_id, chapter.id, chapter.content)
     await db.commit()
     await db.refresh(chapter)
+    await db.refresh(chapter, ["content"])  # deferred columns are not reloaded by a plain refresh
     return chapter
 
 @router.get("/chapters/{id}", response_model=ChapterSchema)
@@ -57,6 +68,7 @@ async def read_chapter(
     """
     result = await db.execute(
         select(Chapter)
+        .options(undefer(Chapter.content))
         .join(Project)
         .where(Chapter.id == id, Project.user_id == current_user.id)
     )
@@ -78,6 +90,7 @@ async def update_chapter(
     """
     result = await db.execute(
         select(Chapter)
+        .options(undefer(Chapter.content))
         .join(Project)
         .where(Chapter.id == id, Project.user_id == current_user.id)
     )
@@ -86,18 +99,85 @@ async def update_chapter(
         raise HTTPException(status_code=404, detail="Chapter not found")
     
     update_data = chapter_in.dict(exclude_unset=True)
+    expected_version = update_data.pop("version", None)
+    if expected_version is not None and expected_version != chapter.version:
+        raise HTTPException(status_code=409, detail="Chapter has been modified elsewhere, version mismatch.")
+
+    previous_word_count = chapter.word_count or 0
     for field, value in update_data.items():
         setattr(chapter, field, value)
     
     # Calculate word count if content is updated
     if "content" in update_data and update_data["content"] is not None:
-        chapter.word_count = len(update_data["content"])
+        chapter.word_count = word_count(update_data["content"])
+    if "content" in update_data:
+        chapter.version += 1
     
     db.add(chapter)
+    await record_word_delta(db, current_user.id, chapter.project_id, (chapter.word_count or 0) - previous_word_count)
+    if "content" in update_data:
+        await update_chapter_mentions(db, chapter.project_id, chapter.id, chapter.content)
     await db.commit()
     await db.refresh(chapter)
+    await db.refresh(chapter, ["content"])  # deferred columns are not reloaded by a plain refresh
     return chapter
 
+@router.patch("/chapters/{id}/content", response_model=ChapterPatchResult)
+async def patch_chapter_content(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    id: int,
+    patch_in: ChapterPatch,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Apply text operations to the chapter content (delta autosave).
+    Rejected with 409 unless `version` (and `base_hash`, when given) match
+    the stored content, or when the result differs from `result_hash`
+    (given by the client); the response carries the new version and hash
+    instead of the text. Offsets are UTF-16 code units.
+    """
+    result = await db.execute(
+        select(Chapter)
+        .options(undefer(Chapter.content))
+        .join(Project)
+        .where(Chapter.id == id, Project.user_id == current_user.id)
+        .with_for_update(of=Chapter)  # Concurrent patches to one chapter apply one after another
+    )
+    chapter = result.scalars().first()
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+
+    content = chapter.content or ""
+    if patch_in.version != chapter.version:
+        raise HTTPException(status_code=409, detail="Chapter has been modified elsewhere, version mismatch.")
+    if patch_in.base_hash is not None and patch_in.base_hash != content_hash(content):
+        raise HTTPException(status_code=409, detail="Chapter content does not match base_hash.")
+
+    try:
+        new_content, delta = apply_ops(content, ((op.offset, op.delete, op.insert) for op in patch_in.ops))
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    new_hash = content_hash(new_content)
+    if patch_in.result_hash is not None and patch_in.result_hash != new_hash:
+        raise HTTPException(status_code=409, detail="Patched content does not match result_hash.")
+
+    if new_content != content:
+        chapter.content = new_content
+        chapter.word_count = (chapter.word_count or 0) + delta.total
+        chapter.version += 1
+        await record_word_delta(db, current_user.id, chapter.project_id, delta.total)
+        await update_chapter_mentions(db, chapter.project_id, chapter.id, new_content)
+    await db.commit()
+    await db.refresh(chapter)
+    return ChapterPatchResult(
+        id=chapter.id,
+        version=chapter.version,
+        content_hash=new_hash,
+        word_count=chapter.word_count,
+        updated_at=chapter.updated_at,
+    )
+
 @router.delete("/chapters/{id}", response_model=ChapterSchema)
 async def delete_chapter(
     *,
@@ -110,6 +190,7 @@ async def delete_chapter(
     """
     result = await db.execute(
         select(Chapter)
+        .options(undefer(Chapter.content))
         .join(Project)
         .where(Chapter.id == id, Project.user_id == current_user.id)
     )
@@ -117,6 +198,9 @@ async def delete_chapter(
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
     
+    await update_chapter_mentions(db, chapter.project_id, chapter.id, None)
     await db.delete(chapter)
+    await record_word_delta(db, current_user.id, chapter.project_id, -(chapter.word_count or 0))
     await db.commit()
+    await refresh_after_removal(db, chapter.project_id, current_user.id)
     return chapter
@@ -1,19 +1,34 @@
-from typing import Any, List
+from typing import Any, List, Optional
+from bisect import bisect_right
+import asyncio
 import json
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import undefer
 
 from app.api import deps
+from app.db.session import AsyncSessionLocal
 from app.models.user import User
-from app.models.project import Project, Chapter
+from app.models.project import Project, Volume, Chapter
 from app.models.lore import LoreItem
+from app.models.consistency import ParagraphCheck
+from app.schemas.job import Job as JobSchema
 from app.schemas.consistency import (
     ConsistencyCheckResponse, ConsistencyIssue,
     ConsistencyFixRequest, ConsistencyFixResponse,
 )
 from app.core import prompts
+from app.core.config import settings
 from app.core.ai_client import ai_client
+from app.core.jobs import JobContext, enqueue_job, job_handler
+from app.core.lore_retrieval import retrieve_lore, format_lore_context
+from app.core.prompt_builder import PromptTooLong, Section, build_prompt
+from app.core.story_summaries import ensure_summaries, summary_context
+from app.core.text_windows import TextWindow, content_hash, paragraph_spans, split_windows
+from app.core.tokens import truncate_to_tokens
 
 router = APIRouter()
 
@@ -22,14 +37,18 @@ async def check_consistency(
     *,
     db: AsyncSession = Depends(deps.get_db),
     chapter_id: int,
+    refresh: bool = False,
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Check chapter consistency against lore and outline.
+    Only paragraphs whose text or mentioned lore changed since the last check are re-sent
+    to the LLM, as overlapping windows checked in parallel. `refresh` re-checks everything.
     """
     # 1. Fetch Chapter
     result = await db.execute(
         select(Chapter)
+        .options(undefer(Chapter.content))
         .join(Project)
         .where(Chapter.id == chapter_id, Project.user_id == current_user.id)
     )
@@ -39,44 +58,167 @@ async def check_consistency(
         
     project = await db.get(Project, chapter.project_id)
 
-    # 2. Fetch Lore (All active lore for now)
-    result = await db.execute(
-        select(LoreItem)
-        .where(LoreItem.project_id == project.id)
-    )
-    lore_items = result.scalars().all()
-    
-    lore_context = ""
-    for item in lore_items:
-        lore_context += f"- {item.name} ({item.category}): {item.content}\n"
-    
-    if not lore_context:
-        lore_context = "No specific lore defined yet."
-
-    # 3. Call LLM
-    prompt = prompts.CONSISTENCY_CHECK_PROMPT.format(
-        title=project.title,
-        chapter_title=chapter.title,
-        lore_context=lore_context,
-        chapter_content=chapter.content or "(Empty Chapter)"
-    )
-
     try:
-        response_text = await ai_client.generate_response(
-            prompt=prompt,
-            temperature=0.3, # Lower temperature for analysis
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse JSON
-        data = json.loads(response_text)
-        issues = data.get("issues", [])
-        
-        return {"issues": issues}
-
+        issues = await run_consistency_check(db, project, chapter, refresh=refresh)
     except Exception as e:
         print(f"AI Consistency Check Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to perform consistency check.")
+    await ensure_summaries(db, project.id, current_user.id)
+    return {"issues": issues}
+
+
+async def run_consistency_check(
+    db: AsyncSession, project: Project, chapter: Chapter, refresh: bool = False
+) -> List[dict]:
+    """
+    Check one chapter (content must be loaded) and return its merged issues.
+    Raises if the LLM call or its JSON parsing fails.
+    """
+    # 1. Reuse cached results for paragraphs whose text and mentioned lore are unchanged
+    content = chapter.content or ""
+    spans = paragraph_spans(content, settings.CONSISTENCY_WINDOW_CHARS)
+    hashes = [content_hash(content[start:end]) for start, end in spans]
+    stamps = await _lore_stamps(db, project.id, [content[start:end] for start, end in spans])
+
+    cached = {}
+    if not refresh:
+        result = await db.execute(
+            select(ParagraphCheck.paragraph_hash, ParagraphCheck.lore_stamp, ParagraphCheck.issues)
+            .where(ParagraphCheck.chapter_id == chapter.id)
+        )
+        cached = {row.paragraph_hash: (row.lore_stamp, row.issues) for row in result}
+    dirty = [i for i, h in enumerate(hashes) if cached.get(h, (None,))[0] != stamps[i]]
+
+    # 2. Retrieve the lore most relevant to this chapter (top-k, not the whole library) and the story so far
+    lore_context = story_context = ""
+    if dirty:
+        lore_items = await retrieve_lore(db, project.id, f"{chapter.title}\n{content}")
+        lore_context = format_lore_context(lore_items, empty="No specific lore defined yet.")
+        story_context = await summary_context(db, chapter)
+
+    # 3. Call LLM once per window over runs of changed paragraphs, concurrently
+    windows = []
+    for run in _consecutive_runs(dirty):
+        run_start, run_end = spans[run[0]][0], spans[run[-1]][1]
+        for window in split_windows(
+            content[run_start:run_end], settings.CONSISTENCY_WINDOW_CHARS, settings.CONSISTENCY_WINDOW_OVERLAP
+        ):
+            windows.append(TextWindow(run_start + window.start, window.text))
+    semaphore = asyncio.Semaphore(settings.CONSISTENCY_MAX_CONCURRENCY)
+
+    async def check_window(window: TextWindow) -> List[dict]:
+        prompt = build_prompt(
+            prompts.CONSISTENCY_CHECK_PROMPT,
+            [
+                Section("chapter_content", window.text, priority=0, required=True),
+                Section("lore_context", lore_context, priority=1),
+                Section(
+                    "summary_context", story_context or "暂无前情。", priority=2,
+                    max_tokens=settings.SUMMARY_CONTEXT_TOKENS, keep_end=True,
+                ),
+            ],
+            title=project.title,
+            chapter_title=chapter.title,
+        )
+        async with semaphore:
+            response_text = await ai_client.generate_response(
+                prompt=prompt.text,
+                temperature=0.3, # Lower temperature for analysis
+                response_format={"type": "json_object"},
+                cache_ttl=settings.AI_CACHE_TTL,
+                bypass_cache=refresh
+            )
+        issues = json.loads(response_text).get("issues", [])
+        for issue in issues:
+            issue["offset"] = _locate_quote(window, issue.get("quote"))
+        return issues
+
+    results = await asyncio.gather(*(check_window(w) for w in windows))
+
+    # 4. Attribute fresh issues to paragraphs (offsets stored paragraph-relative) and persist
+    fresh = {hashes[i]: [] for i in dirty}
+    starts = [start for start, _ in spans]
+    for window, issues in zip(windows, results):
+        for issue in issues:
+            anchor = issue["offset"] if issue["offset"] is not None else window.start
+            index = bisect_right(starts, anchor) - 1
+            relative = dict(issue, offset=issue["offset"] - starts[index] if issue["offset"] is not None else None)
+            if relative not in fresh[hashes[index]]:
+                fresh[hashes[index]].append(relative)
+
+    if fresh:
+        stamp_by_hash = dict(zip(hashes, stamps))
+        rows = [
+            {"chapter_id": chapter.id, "paragraph_hash": h, "lore_stamp": stamp_by_hash[h], "issues": issues}
+            for h, issues in fresh.items()
+        ]
+        stmt = insert(ParagraphCheck).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_paragraph_checks_chapter_hash",
+            set_={"lore_stamp": stmt.excluded.lore_stamp, "issues": stmt.excluded.issues, "checked_at": func.now()},
+        )
+        await db.execute(stmt)
+    await db.execute(
+        delete(ParagraphCheck)
+        .where(ParagraphCheck.chapter_id == chapter.id, ParagraphCheck.paragraph_hash.not_in(hashes))
+    )
+    await db.commit()
+
+    # 5. Assemble the chapter's issues from cached and fresh paragraph results
+    paragraph_issues = []
+    for (start, _), h in zip(spans, hashes):
+        issues = fresh[h] if h in fresh else cached[h][1]
+        for issue in issues:
+            offset = issue.get("offset")
+            paragraph_issues.append(dict(issue, offset=start + offset if offset is not None else None))
+    return _merge_issues([paragraph_issues])
+
+
+async def _lore_stamps(db: AsyncSession, project_id: int, paragraphs: List[str]) -> List[str]:
+    """Per paragraph, a hash of the lore entries it mentions by name and their last edit time."""
+    result = await db.execute(
+        select(LoreItem.id, LoreItem.name, func.coalesce(LoreItem.updated_at, LoreItem.created_at))
+        .where(LoreItem.project_id == project_id)
+    )
+    lore = [(lore_id, name, str(edited_at)) for lore_id, name, edited_at in result if name]
+    return [
+        content_hash("|".join(f"{lore_id}:{edited_at}" for lore_id, name, edited_at in lore if name in paragraph))
+        for paragraph in paragraphs
+    ]
+
+
+def _consecutive_runs(indices: List[int]) -> List[List[int]]:
+    runs: List[List[int]] = []
+    for i in indices:
+        if runs and runs[-1][-1] == i - 1:
+            runs[-1].append(i)
+        else:
+            runs.append([i])
+    return runs
+
+
+def _locate_quote(window: TextWindow, quote: Optional[str]) -> Optional[int]:
+    """Map a quote reported for a window back to its offset in the full chapter."""
+    if not quote:
+        return None
+    pos = window.text.find(quote)
+    return window.start + pos if pos >= 0 else None
+
+
+def _merge_issues(results: List[List[dict]]) -> List[dict]:
+    """Flatten per-window issues, dropping repeats from overlapping windows, in chapter order."""
+    merged = []
+    seen = set()
+    for issues in results:
+        for issue in issues:
+            quote = "".join((issue.get("quote") or "").split())
+            key = (issue.get("offset"), quote) if quote else (issue.get("type"), issue.get("description"))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(issue)
+    merged.sort(key=lambda issue: issue["offset"] if issue.get("offset") is not None else float("inf"))
+    return merged
 
 
 @router.post("/{chapter_id}/fix", response_model=ConsistencyFixResponse)
@@ -93,6 +235,7 @@ async def fix_consistency_issue(
     # Fetch chapter
     result = await db.execute(
         select(Chapter)
+        .options(undefer(Chapter.content))
         .join(Project)
         .where(Chapter.id == chapter_id, Project.user_id == current_user.id)
     )
@@ -100,26 +243,36 @@ async def fix_consistency_issue(
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
 
-    # Extract surrounding context (up to 200 chars before/after the quote)
+    # Extract surrounding context: whole sentences within a token window on each side of the quote
     chapter_content = chapter.content or ""
     quote_pos = chapter_content.find(fix_in.quote)
+    radius = settings.CONSISTENCY_FIX_CONTEXT_TOKENS
     if quote_pos >= 0:
-        ctx_start = max(0, quote_pos - 200)
-        ctx_end = min(len(chapter_content), quote_pos + len(fix_in.quote) + 200)
-        context = chapter_content[ctx_start:ctx_end]
+        quote_end = quote_pos + len(fix_in.quote)
+        context = (
+            truncate_to_tokens(chapter_content[:quote_pos], radius, keep_end=True)
+            + fix_in.quote
+            + truncate_to_tokens(chapter_content[quote_end:], radius)
+        )
     else:
-        context = chapter_content[:500]
+        context = truncate_to_tokens(chapter_content, 2 * radius)
 
-    prompt = prompts.CONSISTENCY_FIX_PROMPT.format(
-        description=fix_in.description,
-        original_text=fix_in.quote,
-        suggestion=fix_in.suggestion,
-        context=context,
-    )
+    try:
+        prompt = build_prompt(
+            prompts.CONSISTENCY_FIX_PROMPT,
+            [
+                Section("original_text", fix_in.quote, priority=0, required=True),
+                Section("description", fix_in.description, priority=1),
+                Section("suggestion", fix_in.suggestion, priority=1),
+                Section("context", context, priority=2),
+            ],
+        )
+    except PromptTooLong:
+        raise HTTPException(status_code=422, detail="Quote is too long to fix in one request")
 
     try:
         fixed_text = await ai_client.generate_response(
-            prompt=prompt,
+            prompt=prompt.text,
             temperature=0.3,
         )
         fixed_text = fixed_text.strip().strip('"').strip("'")
@@ -133,3 +286,52 @@ async def fix_consistency_issue(
         print(f"AI Consistency Fix Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate fix.")
 
+
+@job_handler("consistency_bulk")
+async def check_project_consistency_job(ctx: JobContext) -> dict:
+    """Check every chapter of a project in reading order; per-paragraph caching makes retries cheap."""
+    refresh = bool(ctx.payload.get("refresh"))
+    async with AsyncSessionLocal() as db:
+        project = await db.get(Project, ctx.project_id)
+        result = await db.execute(
+            select(Chapter.id)
+            .join(Volume, Chapter.volume_id == Volume.id)
+            .where(Chapter.project_id == ctx.project_id)
+            .order_by(Volume.order_no, Chapter.order_no)
+        )
+        chapter_ids = result.scalars().all()
+
+        summary = []
+        for n, chapter_id in enumerate(chapter_ids, start=1):
+            chapter = await db.get(Chapter, chapter_id, options=[undefer(Chapter.content)])
+            await ctx.progress(int(100 * (n - 1) / len(chapter_ids)), f"正在检查：{chapter.title} ({n}/{len(chapter_ids)})")
+            issues = await run_consistency_check(db, project, chapter, refresh=refresh)
+            summary.append({"chapter_id": chapter.id, "title": chapter.title, "issue_count": len(issues)})
+
+    await ctx.progress(100, "全书一致性检查完成")
+    return {"chapters": summary, "total_issues": sum(c["issue_count"] for c in summary)}
+
+
+@router.post("/projects/{project_id}/check-all", response_model=JobSchema, status_code=202)
+async def check_project_consistency(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    project_id: int,
+    refresh: bool = False,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Queue a consistency check of every chapter in the project.
+    Track it via GET /jobs/{id} or the /jobs/{id}/events SSE stream.
+    """
+    result = await db.execute(
+        select(Project).where(Project.id == project_id, Project.user_id == current_user.id)
+    )
+    if not result.scalars().first():
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    await ensure_summaries(db, project_id, current_user.id)
+    return await enqueue_job(
+        db, "consistency_bulk", current_user.id,
+        payload={"refresh": refresh}, project_id=project_id, message="等待检查...",
+    )
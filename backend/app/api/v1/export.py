@@ -1,71 +1,96 @@
-from typing import Any
+from typing import Any, AsyncIterator, Optional
 from io import BytesIO
 from urllib.parse import quote
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import undefer
 from sqlalchemy import asc
 
 from app.api import deps
+from app.core.exporters import EXPORT_WRITERS, ExportWriter
+from app.db.session import ReadSessionLocal
 from app.models.user import User
 from app.models.project import Project, Volume, Chapter
 
 router = APIRouter()
 
 
-@router.get("/projects/{project_id}/export/txt")
-async def export_project_txt(
+# Rows fetched per server-side cursor round trip and minimum bytes per emitted chunk
+EXPORT_YIELD_PER = 50
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+async def stream_project_export(
+    project_id: int, title: str, genre: Optional[str], writer: ExportWriter
+) -> AsyncIterator[bytes]:
+    """
+    Stream a whole project through `writer` in volume/chapter order.
+
+    Chapters come from a server-side cursor, so only `EXPORT_YIELD_PER` rows
+    (plus one pending output chunk) are held in memory at a time. The request
+    session is already closed while the response streams, so this opens its own.
+    """
+    buffer = bytearray()
+    buffer += writer.start(title, genre)
+
+    stmt = (
+        select(Volume.id, Volume.title, Chapter.title, Chapter.content)
+        .outerjoin(Chapter, Chapter.volume_id == Volume.id)
+        .where(Volume.project_id == project_id)
+        .order_by(asc(Volume.order_no), asc(Volume.id), asc(Chapter.order_no), asc(Chapter.id))
+        .execution_options(yield_per=EXPORT_YIELD_PER)
+    )
+    async with ReadSessionLocal() as session:
+        result = await session.stream(stmt)
+        current_volume_id = None
+        async for volume_id, volume_title, chapter_title, content in result:
+            if volume_id != current_volume_id:
+                current_volume_id = volume_id
+                buffer += writer.volume(volume_title)
+            if chapter_title is not None:
+                buffer += writer.chapter(chapter_title, content)
+            if len(buffer) >= EXPORT_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+
+    buffer += writer.finish()
+    if buffer:
+        yield bytes(buffer)
+
+
+@router.get("/projects/{project_id}/export/{export_format}")
+async def export_project(
     *,
     db: AsyncSession = Depends(deps.get_db),
     project_id: int,
+    export_format: str,
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
-    """Export entire project as a TXT file."""
-    # Fetch project
+    """Export entire project as a streamed TXT, Markdown (md), EPUB or DOCX file."""
+    writer_cls = EXPORT_WRITERS.get(export_format)
+    if writer_cls is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format. Choose one of: {', '.join(EXPORT_WRITERS)}",
+        )
+
+    # Fetch project metadata only (skip the volume/chapter tree)
     result = await db.execute(
-        select(Project).where(Project.id == project_id, Project.user_id == current_user.id)
+        select(Project.title, Project.genre)
+        .where(Project.id == project_id, Project.user_id == current_user.id)
     )
-    project = result.scalars().first()
+    project = result.first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # Fetch volumes+chapters ordered
-    result = await db.execute(
-        select(Volume)
-        .where(Volume.project_id == project_id)
-        .order_by(asc(Volume.order_no))
-    )
-    volumes = result.scalars().all()
-
-    lines = []
-    lines.append(f"《{project.title}》\n")
-    lines.append(f"类型: {project.genre or '未知'}\n")
-    lines.append("=" * 40 + "\n\n")
-
-    for vol in volumes:
-        result = await db.execute(
-            select(Chapter)
-            .where(Chapter.volume_id == vol.id)
-            .order_by(asc(Chapter.order_no))
-        )
-        chapters = result.scalars().all()
-
-        lines.append(f"\n{vol.title}\n")
-        lines.append("-" * 30 + "\n\n")
-
-        for ch in chapters:
-            lines.append(f"\n{ch.title}\n\n")
-            lines.append((ch.content or "(空)") + "\n\n")
-
-    content = "".join(lines)
-    buffer = BytesIO(content.encode("utf-8"))
-
-    filename = quote(f"{project.title}.txt")
+    writer = writer_cls()
+    filename = quote(f"{project.title}.{writer.extension}")
 
     return StreamingResponse(
-        buffer,
-        media_type="text/plain; charset=utf-8",
+        stream_project_export(project_id, project.title, project.genre, writer),
+        media_type=writer.media_type,
         headers={
             "Content-Disposition": f"attachment; filename*=UTF-8''{filename}"
         }
@@ -82,6 +107,7 @@ async def export_chapter_txt(
     """Export a single chapter as TXT."""
     result = await db.execute(
         select(Chapter)
+        .options(undefer(Chapter.content))
         .join(Project)
         .where(Chapter.id == chapter_id, Project.user_id == current_user.id)
     )
@@ -0,0 +1,111 @@
+from typing import Any, List, Optional
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import desc
+
+from app.api import deps
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.jobs import job_channel, job_event
+from app.core.text_windows import content_hash
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.models.job import Job
+from app.schemas.job import Job as JobSchema
+
+router = APIRouter()
+
+
+def _event_id(payload: dict) -> str:
+    """Events are full snapshots, so a digest of the payload identifies what the client has already seen."""
+    return content_hash(json.dumps(payload, sort_keys=True, ensure_ascii=False))[:16]
+
+
+def _format_event(payload: dict) -> str:
+    return f"id: {_event_id(payload)}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def _load_event(job_id: str, project_id: Optional[int]) -> Optional[dict]:
+    # Fresh session: the request session is closed once streaming starts
+    async with AsyncSessionLocal() as db:
+        job = await db.get(Job, job_id)
+    if not job or (project_id is not None and job.project_id != project_id):
+        return None
+    return job_event(job)
+
+
+def job_event_stream(
+    job_id: str, project_id: Optional[int] = None, last_event_id: Optional[str] = None
+) -> StreamingResponse:
+    """
+    SSE stream of a job's progress until it succeeds or fails. Updates are pushed
+    by the event bus; each heartbeat also re-reads the job, which catches updates
+    published in processes this one cannot hear and jobs that stalled and were failed.
+    A reconnecting client sending Last-Event-ID skips the snapshot it already has.
+    """
+    async def event_generator():
+        async with event_bus.subscribe(job_channel(job_id)) as subscription:
+            last_sent = last_event_id
+            payload = await _load_event(job_id, project_id)
+            while True:
+                if payload is None:
+                    yield f"data: {json.dumps({'progress': 0, 'error': 'Task not found'})}\n\n"
+                    return
+                if _event_id(payload) != last_sent:
+                    yield _format_event(payload)
+                    last_sent = _event_id(payload)
+                if payload["completed"]:
+                    return
+
+                payload = await subscription.next(timeout=settings.EVENT_HEARTBEAT_SECONDS)
+                if payload is None:
+                    yield ": heartbeat\n\n"
+                    payload = await _load_event(job_id, project_id)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/", response_model=List[JobSchema])
+async def read_jobs(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    project_id: Optional[int] = None,
+    limit: int = 20,
+) -> Any:
+    """List the current user's recent jobs, newest first."""
+    query = select(Job).where(Job.user_id == current_user.id)
+    if project_id is not None:
+        query = query.where(Job.project_id == project_id)
+    result = await db.execute(query.order_by(desc(Job.created_at)).limit(limit))
+    return result.scalars().all()
+
+
+@router.get("/{job_id}", response_model=JobSchema)
+async def read_job(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    job_id: str,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Get a job's status, progress and result."""
+    job = await db.get(Job, job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    SSE progress stream for a job. Like the bible status stream this is not
+    behind auth (EventSource cannot send headers); the random job id is the capability.
+    """
+    return job_event_stream(job_id, last_event_id=last_event_id)
@@ -5,15 +5,35 @@ from sqlalchemy.future import select
 
 from app.api import deps
 from app.models.user import User
-from app.models.project import Project
-from app.models.lore import LoreItem
-from app.schemas.lore import LoreItem as LoreItemSchema, LoreItemCreate, LoreItemUpdate, LoreGenerateRequest
+from app.models.project import Project, Volume, Chapter
+from app.models.lore import LoreItem, LoreMention
+from app.schemas.job import Job as JobSchema
+from app.schemas.lore import (
+    LoreItem as LoreItemSchema, LoreItemCreate, LoreItemUpdate, LoreGenerateRequest,
+    LoreAppearance, ChapterLoreMention,
+)
 from app.core.ai_client import ai_client
+from app.core.jobs import JobContext, job_handler
+from app.core.lore_mentions import JOB_KIND as MENTIONS_JOB_KIND, enqueue_mention_reindex, reindex_project_mentions
+from app.core.lore_retrieval import JOB_KIND as EMBEDDINGS_JOB_KIND, backfill_project_embeddings, index_lore_item
+from app.core.prompt_builder import PromptTooLong, Section, build_prompt
+from app.db.session import AsyncSessionLocal
 from app.core.prompts import LORE_GENERATION_PROMPT, SYSTEM_WRITING_ASSISTANT
 import json
 
 router = APIRouter()
 
+@job_handler(MENTIONS_JOB_KIND)
+async def reindex_lore_mentions_job(ctx: JobContext) -> dict:
+    """Rebuild the project's lore mention index after its lore names changed."""
+    async with AsyncSessionLocal() as db:
+        return await reindex_project_mentions(db, ctx.project_id, ctx.progress)
+
+@job_handler(EMBEDDINGS_JOB_KIND)
+async def backfill_lore_embeddings_job(ctx: JobContext) -> dict:
+    """Embed the project's lore items that retrieval found without a vector."""
+    return await backfill_project_embeddings(ctx.project_id)
+
 @router.post("/projects/{project_id}/lore/generate", response_model=LoreItemSchema)
 async def generate_lore_item(
     *,
@@ -34,16 +54,21 @@ async def generate_lore_item(
         raise HTTPException(status_code=404, detail="Project not found")
 
     # Prepare Prompt
-    prompt = LORE_GENERATION_PROMPT.format(
-        title=project.title,
-        genre=project.genre,
-        category=request.category,
-        instruction=request.prompt
-    )
+    try:
+        prompt = build_prompt(
+            LORE_GENERATION_PROMPT,
+            [Section("instruction", request.prompt, required=True)],
+            system_role=SYSTEM_WRITING_ASSISTANT,
+            title=project.title,
+            genre=project.genre,
+            category=request.category,
+        )
+    except PromptTooLong:
+        raise HTTPException(status_code=422, detail="Prompt is too long")
 
     # Call AI
     ai_response = await ai_client.generate_response(
-        prompt=prompt,
+        prompt=prompt.text,
         system_role=SYSTEM_WRITING_ASSISTANT,
         response_format={"type": "json_object"}
     )
@@ -72,6 +97,8 @@ async def generate_lore_item(
     db.add(lore_item)
     await db.commit()
     await db.refresh(lore_item)
+    await index_lore_item(lore_item)
+    await enqueue_mention_reindex(db, project_id, current_user.id)
     return lore_item
 
 @router.get("/projects/{project_id}/lore", response_model=List[LoreItemSchema])
@@ -123,6 +150,8 @@ async def create_lore_item(
     db.add(lore_item)
     await db.commit()
     await db.refresh(lore_item)
+    await index_lore_item(lore_item)
+    await enqueue_mention_reindex(db, project_id, current_user.id)
     return lore_item
 
 @router.get("/lore/{id}", response_model=LoreItemSchema)
@@ -166,12 +195,18 @@ async def update_lore_item(
         raise HTTPException(status_code=404, detail="Lore item not found")
     
     update_data = lore_in.model_dump(exclude_unset=True)
+    renamed = any(
+        field in update_data and update_data[field] != getattr(lore_item, field) for field in ("name", "attributes")
+    )
     for field, value in update_data.items():
         setattr(lore_item, field, value)
     
     db.add(lore_item)
     await db.commit()
     await db.refresh(lore_item)
+    await index_lore_item(lore_item)
+    if renamed:  # Names and aliases decide what is matched
+        await enqueue_mention_reindex(db, lore_item.project_id, current_user.id)
     return lore_item
 
 @router.delete("/lore/{id}", response_model=LoreItemSchema)
@@ -196,3 +231,86 @@ async def delete_lore_item(
     await db.delete(lore_item)
     await db.commit()
     return lore_item
+
+@router.get("/lore/{id}/mentions", response_model=List[LoreAppearance])
+async def read_lore_mentions(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    id: int,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Chapters that mention the lore item by name or alias, in reading order.
+    """
+    result = await db.execute(
+        select(LoreItem.id)
+        .join(Project)
+        .where(LoreItem.id == id, Project.user_id == current_user.id)
+    )
+    if not result.scalars().first():
+        raise HTTPException(status_code=404, detail="Lore item not found")
+
+    result = await db.execute(
+        select(
+            LoreMention.lore_id, LoreMention.chapter_id, LoreMention.count, LoreMention.first_offset,
+            Chapter.title.label("chapter_title"), Chapter.volume_id, Volume.order_no.label("volume_order_no"),
+            Chapter.order_no.label("chapter_order_no"),
+        )
+        .join(Chapter, Chapter.id == LoreMention.chapter_id)
+        .join(Volume, Volume.id == Chapter.volume_id)
+        .where(LoreMention.lore_id == id)
+        .order_by(Volume.order_no, Chapter.order_no, Chapter.id)
+    )
+    return [LoreAppearance(**row._mapping) for row in result]
+
+@router.get("/chapters/{chapter_id}/lore-mentions", response_model=List[ChapterLoreMention])
+async def read_chapter_lore_mentions(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    chapter_id: int,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Lore items mentioned in a chapter, most mentioned first.
+    """
+    result = await db.execute(
+        select(Chapter.id)
+        .join(Project)
+        .where(Chapter.id == chapter_id, Project.user_id == current_user.id)
+    )
+    if not result.scalars().first():
+        raise HTTPException(status_code=404, detail="Chapter not found")
+
+    result = await db.execute(
+        select(
+            LoreMention.lore_id, LoreMention.chapter_id, LoreMention.count, LoreMention.first_offset,
+            LoreItem.name, LoreItem.category,
+        )
+        .join(LoreItem, LoreItem.id == LoreMention.lore_id)
+        .where(LoreMention.chapter_id == chapter_id)
+        .order_by(LoreMention.count.desc(), LoreMention.first_offset)
+    )
+    return [ChapterLoreMention(**row._mapping) for row in result]
+
+@router.post("/projects/{project_id}/lore/mentions/reindex", response_model=JobSchema, status_code=202)
+async def reindex_lore_mentions(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    project_id: int,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Queue a rebuild of the project's lore mention index. Saves keep it
+    current on their own; this is for data written before the index
+    existed. Track it via GET /jobs/{id}.
+    """
+    project_result = await db.execute(
+        select(Project).where(Project.id == project_id, Project.user_id == current_user.id)
+    )
+    if not project_result.scalars().first():
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    job = await enqueue_mention_reindex(db, project_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="A reindex is already queued for this project")
+    return job
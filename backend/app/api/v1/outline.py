@@ -1,18 +1,187 @@
-from typing import Any, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import re
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import Integer, String, Text, case, column, exists, func, insert, literal, update, values as sa_values
 from app.api import deps
-from app.models.project import Project, Volume, Chapter
+from app.db.session import AsyncSessionLocal
+from app.models.project import Project, Volume, Chapter, ChapterStatus
 from app.models.outline import Outline
-from app.models.lore import LoreItem
 from app.schemas import outline as outline_schemas
+from app.schemas.job import Job as JobSchema
 from app.core.ai_client import ai_client
-from app.core.prompts import OUTLINE_GENERATION_PROMPT, SYSTEM_WRITING_ASSISTANT
+from app.core.config import settings
+from app.core.jobs import JobContext, enqueue_job, job_handler
+from app.core.lore_mentions import enqueue_mention_reindex
+from app.core.lore_retrieval import retrieve_lore, format_lore_context
+from app.core.prompt_builder import Section, build_prompt
+from app.core.writing_context import outline_summaries
+from app.core.prompts import OUTLINE_GENERATION_PROMPT, OUTLINE_SKELETON_PROMPT, SYSTEM_WRITING_ASSISTANT
 import json
 
 router = APIRouter()
 
+class OutlineGenerationError(Exception):
+    pass
+
+
+def _parse_json(ai_response: Optional[str], step: str) -> dict:
+    if not ai_response:
+        raise OutlineGenerationError(f"AI generation failed at {step}")
+    try:
+        return json.loads(ai_response)
+    except json.JSONDecodeError:
+        raise OutlineGenerationError(f"AI returned invalid JSON at {step}")
+
+
+async def generate_outline_volumes(
+    db: AsyncSession,
+    project: Project,
+    prompt: Optional[str] = None,
+    volume_count: Optional[int] = None,
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Skeleton-first outline pipeline. One call plans every volume's title and arc,
+    then each volume's chapter list is expanded concurrently against that skeleton.
+    Yields ("skeleton", {"volumes": [...]}) once, then ("volume", volume) as each
+    expansion finishes, in completion order. Raises OutlineGenerationError.
+    """
+    volume_count = volume_count or settings.OUTLINE_DEFAULT_VOLUMES
+
+    # Retrieve the lore most relevant to the premise for context
+    lore_items = await retrieve_lore(
+        db, project.id, f"{project.title}\n{project.genre}\n{project.description or ''}\n{prompt or ''}"
+    )
+    project_info = dict(
+        title=project.title,
+        genre=project.genre,
+        target_words=project.target_words,
+    )
+    # Shared by every call; the lore gives way first when the budget is tight
+    project_sections = [
+        Section("instruction", prompt if prompt else "无特殊指令，请根据作品类型自由发挥。", priority=0),
+        Section("description", project.description or "无特别简介", priority=1),
+        Section("lore_context", format_lore_context(lore_items, detailed=False), priority=3),
+    ]
+
+    # 1. Skeleton: titles and arcs of every volume in one cheap call
+    skeleton_response = await ai_client.generate_response(
+        prompt=build_prompt(
+            OUTLINE_SKELETON_PROMPT, project_sections, system_role=SYSTEM_WRITING_ASSISTANT,
+            volume_count=volume_count, **project_info,
+        ).text,
+        system_role=SYSTEM_WRITING_ASSISTANT,
+        response_format={"type": "json_object"}
+    )
+    planned = _parse_json(skeleton_response, "skeleton").get("volumes") or []
+    skeleton = []
+    for vol_no in range(1, volume_count + 1):
+        node = planned[vol_no - 1] if vol_no <= len(planned) and isinstance(planned[vol_no - 1], dict) else {}
+        skeleton.append({
+            "order_no": vol_no,
+            "title": node.get("title") or f"第{vol_no}卷",
+            "arc": node.get("arc") or "",
+        })
+    yield "skeleton", {"volumes": skeleton}
+
+    skeleton_context = "\n".join(f"第{v['order_no']}卷: {v['title']} —— {v['arc']}" for v in skeleton)
+    semaphore = asyncio.Semaphore(settings.OUTLINE_MAX_CONCURRENCY)
+
+    # 2. Expand every volume's chapters concurrently
+    async def expand(volume: dict) -> dict:
+        vol_no = volume["order_no"]
+        async with semaphore:
+            ai_response = await ai_client.generate_response(
+                prompt=build_prompt(
+                    OUTLINE_GENERATION_PROMPT,
+                    project_sections + [
+                        Section("volume_arc", volume["arc"] or "按骨架自然推进", priority=1),
+                        Section("skeleton_context", skeleton_context, priority=2),
+                    ],
+                    system_role=SYSTEM_WRITING_ASSISTANT,
+                    target_volume_no=vol_no,
+                    volume_title=volume["title"],
+                    **project_info,
+                ).text,
+                system_role=SYSTEM_WRITING_ASSISTANT,
+                response_format={"type": "json_object"}
+            )
+        vol_content = _parse_json(ai_response, f"volume {vol_no}")
+        vol_node = vol_content.get("volume")
+        if not vol_node: # Fallback just in case
+            vol_node = (vol_content.get("volumes") or [{}])[0]
+        if not vol_node:
+            raise OutlineGenerationError(f"AI returned an empty volume {vol_no}")
+        vol_node["order_no"] = vol_no
+        vol_node.setdefault("title", volume["title"])
+        return vol_node
+
+    tasks = [asyncio.create_task(expand(volume)) for volume in skeleton]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield "volume", await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def build_outline(
+    db: AsyncSession,
+    project: Project,
+    prompt: Optional[str] = None,
+    volume_count: Optional[int] = None,
+    on_progress: Optional[Callable[[int, str], Awaitable[None]]] = None,
+) -> dict:
+    """Run the whole outline pipeline and return outline content with volumes in order."""
+    volumes = []
+    total = 0
+    async for kind, data in generate_outline_volumes(db, project, prompt, volume_count):
+        if kind == "skeleton":
+            total = len(data["volumes"])
+            message = "分卷骨架已生成，正在并行展开各卷章节..."
+        else:
+            volumes.append(data)
+            message = f"已完成 {len(volumes)}/{total} 卷大纲"
+        if on_progress:
+            # The skeleton counts as one step alongside each volume
+            await on_progress(int(100 * (len(volumes) + 1) / (total + 1)), message)
+    return {"volumes": sorted(volumes, key=lambda v: v["order_no"])}
+
+
+async def save_outline(db: AsyncSession, project: Project, content: dict) -> Outline:
+    """Create the project's outline or overwrite the existing one."""
+    result = await db.execute(select(Outline).where(Outline.project_id == project.id))
+    outline = result.scalars().first()
+    if outline:
+        outline.content = content
+        outline.status = "generated"
+    else:
+        outline = Outline(
+            project_id=project.id,
+            title=f"{project.title} 大纲",
+            content=content,
+            status="generated"
+        )
+    db.add(outline)
+    await db.commit()
+    await db.refresh(outline)
+    return outline
+
+
+@job_handler("outline")
+async def generate_outline_job(ctx: JobContext) -> dict:
+    async with AsyncSessionLocal() as db:
+        project = await db.get(Project, ctx.project_id)
+        content = await build_outline(
+            db, project, ctx.payload.get("prompt"), ctx.payload.get("volume_count"), on_progress=ctx.progress
+        )
+        outline = await save_outline(db, project, content)
+    return {"outline_id": outline.id, "volumes": len(content["volumes"])}
+
+
 @router.post("/generate", response_model=outline_schemas.Outline)
 async def generate_outline(
     request: outline_schemas.OutlineGenerateRequest,
@@ -22,87 +191,72 @@ async def generate_outline(
     """
     Generate an outline for a project using AI.
     """
-    # 1. Fetch Project
     result = await db.execute(select(Project).where(Project.id == request.project_id, Project.user_id == current_user.id))
     project = result.scalars().first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # 2. Check if outline exists (optional: overwrite or error)
     # For now, we allow overwriting or creating new
-    result = await db.execute(select(Outline).where(Outline.project_id == project.id))
-    existing_outline = result.scalars().first()
-
-    # 3. Fetch LoreItems for context
-    result = await db.execute(select(LoreItem).where(LoreItem.project_id == project.id))
-    lore_items = result.scalars().all()
-    lore_context = ""
-    if lore_items:
-        lore_texts = [f"- {item.category}: {item.name}: {item.description}" for item in lore_items]
-        lore_context = "\n".join(lore_texts)
-    else:
-        lore_context = "暂无设定库信息。"
-
-    # 4. Prepare Prompt
-    instruction = request.prompt if request.prompt else "无特殊指令，请根据作品类型自由发挥。"
-    
-    volumes_data = []
-    previous_context = "这是小说的开局部分，当前没有前文大纲。"
-    
-    # Generate 3 volumes sequentially using Sliding Window Chunking
-    for vol_no in range(1, 4):
-        prompt = OUTLINE_GENERATION_PROMPT.format(
-            title=project.title,
-            genre=project.genre,
-            target_words=project.target_words,
-            description=project.description or "无特别简介",
-            lore_context=lore_context,
-            previous_context=previous_context,
-            target_volume_no=vol_no,
-            instruction=instruction
-        )
+    try:
+        content = await build_outline(db, project, request.prompt, request.volume_count)
+    except OutlineGenerationError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return await save_outline(db, project, content)
 
-        ai_response = await ai_client.generate_response(
-            prompt=prompt,
-            system_role=SYSTEM_WRITING_ASSISTANT,
-            response_format={"type": "json_object"}
-        )
+@router.post("/generate/job", response_model=JobSchema, status_code=202)
+async def generate_outline_in_background(
+    request: outline_schemas.OutlineGenerateRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    Queue outline generation as a background job.
+    Track it via GET /jobs/{id} or the /jobs/{id}/events SSE stream.
+    """
+    result = await db.execute(select(Project).where(Project.id == request.project_id, Project.user_id == current_user.id))
+    if not result.scalars().first():
+        raise HTTPException(status_code=404, detail="Project not found")
 
-        if not ai_response:
-            raise HTTPException(status_code=500, detail=f"AI generation failed at volume {vol_no}")
-
-        try:
-            vol_content = json.loads(ai_response)
-            vol_node = vol_content.get("volume")
-            if not vol_node: # Fallback just in case
-                vol_node = vol_content.get("volumes", [{}])[0]
-            if vol_node:
-                volumes_data.append(vol_node)
-                # Compress into previous context for the next chunk
-                previous_context += f"\n第{vol_no}卷: {vol_node.get('title', '无题')} (共{len(vol_node.get('chapters', []))}章)"
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=500, detail=f"AI returned invalid JSON at volume {vol_no}")
-
-    content = {"volumes": volumes_data}
-    # 5. Save/Update Outline
-    if existing_outline:
-        existing_outline.content = content
-        existing_outline.status = "generated"
-        db.add(existing_outline)
-        await db.commit()
-        await db.refresh(existing_outline)
-        return existing_outline
-    else:
-        new_outline = Outline(
-            project_id=project.id,
-            title=f"{project.title} 大纲",
-            content=content,
-            status="generated"
-        )
-        db.add(new_outline)
-        await db.commit()
-        await db.refresh(new_outline)
-        return new_outline
+    return await enqueue_job(
+        db, "outline", current_user.id,
+        payload={"prompt": request.prompt, "volume_count": request.volume_count}, project_id=request.project_id, message="等待生成大纲...",
+    )
+
+@router.post("/generate/stream")
+async def generate_outline_stream(
+    request: outline_schemas.OutlineGenerateRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    Generate an outline and stream it as SSE: a `skeleton` event with every
+    volume's title and arc, a `volume` event as each volume's chapters are
+    expanded, then `done` with the saved outline (or `error`).
+    """
+    result = await db.execute(select(Project).where(Project.id == request.project_id, Project.user_id == current_user.id))
+    if not result.scalars().first():
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    def sse(event: str, data: Any) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+    async def event_generator():
+        # Own session: the request session is closed once streaming starts
+        async with AsyncSessionLocal() as session:
+            project = await session.get(Project, request.project_id)
+            volumes = []
+            try:
+                async for kind, data in generate_outline_volumes(session, project, request.prompt, request.volume_count):
+                    if kind == "volume":
+                        volumes.append(data)
+                    yield sse(kind, data)
+            except OutlineGenerationError as e:
+                yield sse("error", {"detail": str(e)})
+                return
+            outline = await save_outline(session, project, {"volumes": sorted(volumes, key=lambda v: v["order_no"])})
+            yield sse("done", outline_schemas.Outline.model_validate(outline).model_dump(mode="json"))
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 @router.get("/{project_id}", response_model=outline_schemas.Outline)
 async def get_outline(
@@ -159,14 +313,83 @@ async def update_outline(
     await db.refresh(outline)
     return outline
 
-@router.post("/{project_id}/apply")
+PREFILL_PREFIX = "大纲简介："
+APPLY_LOCK_NAMESPACE = 7002  # First key of the per-project advisory lock that serializes applies
+_PREFILL = re.compile(rf"{PREFILL_PREFIX}.*\n\n", re.S)
+
+
+def _prefill(summary: str) -> str:
+    return f"{PREFILL_PREFIX}{summary}\n\n" # Pre-fill with summary
+
+
+def _is_prefill(content: Optional[str]) -> bool:
+    """Whether a chapter still holds nothing but text `_prefill` wrote."""
+    return content is not None and _PREFILL.fullmatch(content) is not None
+
+
+def plan_outline_apply(content: dict, volumes: List[Any], chapters: List[Any]) -> Dict[str, outline_schemas.OutlineApplyDiff]:
+    """
+    Diff outline content against the project's rows, keyed on order_no.
+    Existing volumes and chapters keep their titles (user edits win; the
+    outline's previous titles are not stored, so a rename cannot be told
+    apart from an outline change). An existing chapter's content is only
+    replaced while it is still exactly an outline prefill with a different summary.
+    `volumes` rows carry (id, order_no, title); `chapters` rows carry
+    (id, volume_id, order_no, title, prefill), prefill being the content of unwritten chapters.
+    """
+    volume_diff = outline_schemas.OutlineApplyDiff()
+    chapter_diff = outline_schemas.OutlineApplyDiff()
+    existing_volumes = {v.order_no: v for v in volumes}
+    existing_chapters = {(c.volume_id, c.order_no): c for c in chapters}
+    seen_volumes, seen_chapters = set(), set()
+
+    for vol_index, vol_data in enumerate(content.get("volumes", []), start=1):
+        vol_order = vol_data.get("order_no") or vol_index
+        raw_title = vol_data.get("title")
+        vol_title = raw_title if raw_title and str(raw_title).strip() else f"卷 {vol_order}"
+        volume = existing_volumes.get(vol_order)
+        if vol_order not in seen_volumes: # Repeated order_no in the outline reuses the first volume
+            seen_volumes.add(vol_order)
+            if volume:
+                volume_diff.untouched.append(outline_schemas.OutlineApplyItem(
+                    volume_order_no=vol_order, title=volume.title, id=volume.id))
+            else:
+                volume_diff.create.append(outline_schemas.OutlineApplyItem(volume_order_no=vol_order, title=vol_title))
+
+        for chap_index, chap_data in enumerate(vol_data.get("chapters", []), start=1):
+            chap_order = chap_data.get("order_no") or chap_index
+            if (vol_order, chap_order) in seen_chapters:
+                continue
+            seen_chapters.add((vol_order, chap_order))
+            chap_title = chap_data.get("title", f"第 {chap_order} 章")
+            item = outline_schemas.OutlineApplyItem(volume_order_no=vol_order, order_no=chap_order, title=chap_title)
+            chapter = existing_chapters.get((volume.id, chap_order)) if volume else None
+            if chapter is None:
+                chapter_diff.create.append(item)
+                continue
+            item.id = chapter.id
+            item.title = chapter.title
+            prefill = _prefill(chap_data.get("summary", ""))
+            if _is_prefill(chapter.prefill) and chapter.prefill != prefill:
+                chapter_diff.update.append(item)
+            else:
+                chapter_diff.untouched.append(item)
+
+    return {"volumes": volume_diff, "chapters": chapter_diff}
+
+
+@router.post("/{project_id}/apply", response_model=outline_schemas.OutlineApplyResponse)
 async def apply_outline(
     project_id: int,
+    dry_run: bool = False,
     db: AsyncSession = Depends(deps.get_db),
     current_user = Depends(deps.get_current_user)
 ):
     """
     Apply the outline to the project structure (create volumes and chapters).
+    Runs in a constant number of queries however large the outline is.
+    With dry_run=true nothing is written; the response lists what would be
+    created, updated and left untouched.
     """
     # Verify project ownership
     result = await db.execute(select(Project).where(Project.id == project_id, Project.user_id == current_user.id))
@@ -183,60 +406,99 @@ async def apply_outline(
     if not content or "volumes" not in content:
         raise HTTPException(status_code=400, detail="Invalid outline content")
 
+    if not dry_run:
+        # Serialize applies per project (double clicks, retried requests): under READ COMMITTED the NOT
+        # EXISTS guards below cannot see another apply's uncommitted rows. Held until commit / rollback.
+        await db.execute(select(func.pg_advisory_xact_lock(APPLY_LOCK_NAMESPACE, project_id)))
+
+    vol_result = await db.execute(
+        select(Volume.id, Volume.order_no, Volume.title).where(Volume.project_id == project_id)
+    )
+    # Only unwritten chapters' (small, pre-filled) content is read, to detect outline changes
+    chap_result = await db.execute(
+        select(
+            Chapter.id, Chapter.volume_id, Chapter.order_no, Chapter.title,
+            case((func.coalesce(Chapter.word_count, 0) == 0, func.coalesce(Chapter.content, "")), else_=None).label("prefill"),
+        ).where(Chapter.project_id == project_id)
+    )
+    diff = plan_outline_apply(content, vol_result.all(), chap_result.all())
+    if dry_run:
+        return outline_schemas.OutlineApplyResponse(message="Dry run, nothing applied", dry_run=True, **diff)
+
+    summaries = outline_summaries(content)
+
     try:
-        # Fetch existing volumes to avoid duplication (simple check by order_no)
-        # Note: A more robust approach would be ensuring uniqueness by title or keeping track of sync status
-        # For this MVP, we will simpler check: if volume with order_no exists, skip creation but check chapters.
-        
-        # Get all existing volumes
-        vol_result = await db.execute(select(Volume).where(Volume.project_id == project_id))
-        existing_volumes = {v.order_no: v for v in vol_result.scalars().all()}
-
-        volumes_data = content.get("volumes", [])
-        
-        for vol_data in volumes_data:
-            vol_order = vol_data.get("order_no")
-            raw_title = vol_data.get("title")
-            vol_title = raw_title if raw_title and str(raw_title).strip() else f"卷 {vol_order}"
-            
-            if vol_order in existing_volumes:
-                volume = existing_volumes[vol_order]
-                # Optional: update title? Let's skip updating title to preserve user edits
-            else:
-                volume = Volume(
-                    project_id=project_id,
-                    title=vol_title,
-                    order_no=vol_order
+        volume_ids = {item.volume_order_no: item.id for item in diff["volumes"].untouched}
+        new_volumes = diff["volumes"].create
+        if new_volumes:
+            # Set-based insert; NOT EXISTS skips (project_id, order_no) rows created since the plan was read
+            rows = sa_values(
+                column("order_no", Integer), column("title", String), name="new_volumes"
+            ).data([(v.volume_order_no, v.title) for v in new_volumes])
+            existing = select(Volume.id).where(Volume.project_id == project_id, Volume.order_no == rows.c.order_no)
+            result = await db.execute(
+                insert(Volume)
+                .from_select(
+                    ["project_id", "order_no", "title"],
+                    select(literal(project_id, Integer), rows.c.order_no, rows.c.title).where(~exists(existing)),
                 )
-                db.add(volume)
-                await db.flush() # flush to get ID
-                existing_volumes[vol_order] = volume # Add to local cache
-
-            # Process Chapters
-            chapters_data = vol_data.get("chapters", [])
-            
-            # Get existing chapters for this volume
-            chap_result = await db.execute(select(Chapter).where(Chapter.volume_id == volume.id))
-            existing_chapters = {c.order_no: c for c in chap_result.scalars().all()}
-
-            for chap_data in chapters_data:
-                chap_order = chap_data.get("order_no")
-                chap_title = chap_data.get("title", f"第 {chap_order} 章")
-                chap_summary = chap_data.get("summary", "")
-
-                if chap_order not in existing_chapters:
-                    new_chapter = Chapter(
-                        project_id=project_id,
-                        volume_id=volume.id,
-                        title=chap_title,
-                        order_no=chap_order,
-                        content=f"大纲简介：{chap_summary}\n\n" # Pre-fill with summary
-                    )
-                    db.add(new_chapter)
-        
-        await db.commit()
-        return {"message": "Outline applied successfully"}
+                .returning(Volume.id, Volume.order_no)
+            )
+            volume_ids.update({row.order_no: row.id for row in result})
+            missing = [v.volume_order_no for v in new_volumes if v.volume_order_no not in volume_ids]
+            if missing:
+                result = await db.execute(
+                    select(Volume.order_no, Volume.id)
+                    .where(Volume.project_id == project_id, Volume.order_no.in_(missing))
+                )
+                volume_ids.update({row.order_no: row.id for row in result})
 
+        new_chapters = diff["chapters"].create
+        if new_chapters:
+            rows = sa_values(
+                column("volume_id", Integer), column("order_no", Integer),
+                column("title", String), column("content", Text), name="new_chapters",
+            ).data([
+                (volume_ids[c.volume_order_no], c.order_no, c.title,
+                 _prefill(summaries[(c.volume_order_no, c.order_no)]))
+                for c in new_chapters
+            ])
+            existing = select(Chapter.id).where(Chapter.volume_id == rows.c.volume_id, Chapter.order_no == rows.c.order_no)
+            await db.execute(
+                insert(Chapter).from_select(
+                    ["project_id", "volume_id", "order_no", "title", "content", "status", "word_count"],
+                    select(
+                        literal(project_id, Integer), rows.c.volume_id, rows.c.order_no, rows.c.title, rows.c.content,
+                        literal(ChapterStatus.DRAFT.value, String), literal(0, Integer),
+                    ).where(~exists(existing)),
+                )
+            )
+
+        changed_chapters = diff["chapters"].update
+        if changed_chapters:
+            rows = sa_values(
+                column("id", Integer), column("content", Text), name="changed_chapters"
+            ).data([
+                (c.id, _prefill(summaries[(c.volume_order_no, c.order_no)])) for c in changed_chapters
+            ])
+            # Re-check the content so a chapter edited since the diff is never overwritten
+            await db.execute(
+                update(Chapter)
+                .where(
+                    Chapter.id == rows.c.id,
+                    func.coalesce(Chapter.word_count, 0) == 0,
+                    Chapter.content.regexp_match(f"^{PREFILL_PREFIX}.*\n\n$"),
+                )
+                .values(content=rows.c.content, version=Chapter.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+
+        await db.commit()
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to apply outline: {str(e)}")
+
+    if diff["chapters"].create or diff["chapters"].update:
+        # Prefilled chapter text is written in bulk, outside the per-save mention updates
+        await enqueue_mention_reindex(db, project_id, current_user.id)
+    return outline_schemas.OutlineApplyResponse(message="Outline applied successfully", dry_run=False, **diff)
@@ -1,5 +1,5 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -7,27 +7,48 @@ from sqlalchemy.orm import selectinload
 from app.api import deps
 from app.models.user import User
 from app.models.project import Project, Volume, Chapter
-from app.schemas.project import Project as ProjectSchema, ProjectCreate, ProjectUpdate
+from app.schemas.project import (
+    Project as ProjectSchema, ProjectWithContent, ProjectCreate, ProjectUpdate,
+)
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ProjectSchema])
+INCLUDE_QUERY = Query(None, description="Pass `content` to embed full chapter text in the tree")
+
+
+def _wants_content(include: Optional[str]) -> bool:
+    return bool(include) and "content" in [part.strip() for part in include.split(",")]
+
+
+def _tree_options(include: Optional[str]) -> list:
+    """Loader options for the volume/chapter tree; chapter content stays deferred unless requested."""
+    loader = selectinload(Project.volumes).selectinload(Volume.chapters)
+    if _wants_content(include):
+        loader = loader.undefer(Chapter.content)
+    return [loader]
+
+
+@router.get("/", response_model=List[Union[ProjectWithContent, ProjectSchema]])
 async def read_projects(
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     current_user: User = Depends(deps.get_current_user),
     skip: int = 0,
     limit: int = 100,
+    include: Optional[str] = INCLUDE_QUERY,
 ) -> Any:
     """
-    Retrieve projects.
+    Retrieve projects with a content-free volume/chapter tree.
     """
     result = await db.execute(
         select(Project)
+        .options(*_tree_options(include))
         .where(Project.user_id == current_user.id)
         .offset(skip)
         .limit(limit)
     )
-    return result.scalars().all()
+    projects = result.scalars().all()
+    schema = ProjectWithContent if _wants_content(include) else ProjectSchema
+    return [schema.model_validate(project) for project in projects]
 
 @router.post("/", response_model=ProjectSchema, status_code=201)
 async def create_project(
@@ -58,26 +79,29 @@ async def create_project(
     
     return project
 
-@router.get("/{id}", response_model=ProjectSchema)
+@router.get("/{id}", response_model=Union[ProjectWithContent, ProjectSchema])
 async def read_project(
     *,
     db: AsyncSession = Depends(deps.get_db),
     id: int,
     current_user: User = Depends(deps.get_current_user),
+    include: Optional[str] = INCLUDE_QUERY,
 ) -> Any:
     """
-    Get project by ID.
+    Get project by ID. Chapters are summaries unless `?include=content` is passed.
     """
-    # Eager load volumes and chapters
+    # Eager load volumes and chapters (metadata only by default)
     result = await db.execute(
         select(Project)
-        .options(selectinload(Project.volumes).selectinload(Volume.chapters))
+        .options(*_tree_options(include))
         .where(Project.id == id, Project.user_id == current_user.id)
     )
     project = result.scalars().first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    if _wants_content(include):
+        return ProjectWithContent.model_validate(project)
+    return ProjectSchema.model_validate(project)
 
 @router.put("/{id}", response_model=ProjectSchema)
 async def update_project(
@@ -1,12 +1,15 @@
-from typing import Any, List
+from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import Integer, column, exists, func, update, values as sa_values
+from sqlalchemy.orm import aliased
 from pydantic import BaseModel
 
 from app.api import deps
 from app.models.user import User
 from app.models.project import Project, Volume, Chapter
+from app.core.lore_mentions import refresh_first_appearances
 
 router = APIRouter()
 
@@ -20,6 +23,74 @@ class ReorderRequest(BaseModel):
     items: List[ReorderItem]
 
 
+class MoveRequest(BaseModel):
+    before_id: Optional[int] = None  # Sibling to move in front of; None moves to the end
+    volume_id: Optional[int] = None  # Chapters only: target volume when moving to the end of another volume
+
+
+async def _bulk_reorder(db: AsyncSession, model, items: List[ReorderItem], user_id: int) -> int:
+    """
+    One UPDATE ... FROM (VALUES ...) joined to projects, so ownership is
+    checked in the same statement. Reading order decides lore first
+    appearances, so those are recomputed for the projects touched.
+    """
+    if not items:
+        return 0
+    rows = sa_values(column("id", Integer), column("order_no", Integer), name="new_order").data(
+        [(item.id, item.order_no) for item in items]
+    )
+    result = await db.execute(
+        update(model)
+        .where(model.id == rows.c.id, model.project_id == Project.id, Project.user_id == user_id)
+        .values(order_no=rows.c.order_no)
+        .returning(model.project_id)
+        .execution_options(synchronize_session=False)
+    )
+    project_ids = result.scalars().all()
+    for project_id in set(project_ids):
+        await refresh_first_appearances(db, project_id)
+    await db.commit()
+    return len(project_ids)
+
+
+async def _move(db: AsyncSession, model, scope, scope_id: int, item_id: int, before_order: Optional[int]) -> dict:
+    """
+    Give `item_id` an order_no in front of `before_order` within the scope
+    (a volume's chapters or a project's volumes). order_no values are sparse:
+    deletes and earlier moves leave gaps, and a move into a gap updates only
+    the moved row. Without a gap, only the contiguous run of keys starting at
+    the target is shifted by one, in a single UPDATE.
+    """
+    if before_order is None:
+        last = (await db.execute(select(func.max(model.order_no)).where(scope == scope_id, model.id != item_id))).scalar()
+        return {"order_no": (last or 0) + 1, "shifted": 0}
+
+    previous = (await db.execute(
+        select(func.max(model.order_no)).where(scope == scope_id, model.id != item_id, model.order_no < before_order)
+    )).scalar() or 0
+    if before_order - previous > 1:
+        return {"order_no": (previous + before_order) // 2, "shifted": 0}
+
+    # End of the run of consecutive keys starting at the target: the first key whose successor is free
+    following = aliased(model)
+    successor_taken = exists().where(
+        getattr(following, scope.key) == scope_id,
+        following.id != item_id,
+        following.order_no == model.order_no + 1,
+    )
+    run_end = (await db.execute(
+        select(func.min(model.order_no))
+        .where(scope == scope_id, model.id != item_id, model.order_no >= before_order, ~successor_taken)
+    )).scalar()
+    result = await db.execute(
+        update(model)
+        .where(scope == scope_id, model.id != item_id, model.order_no.between(before_order, run_end))
+        .values(order_no=model.order_no + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return {"order_no": before_order, "shifted": result.rowcount}
+
+
 @router.put("/volumes/reorder")
 async def reorder_volumes(
     *,
@@ -28,17 +99,8 @@ async def reorder_volumes(
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """Reorder volumes by updating their order_no."""
-    for item in body.items:
-        result = await db.execute(
-            select(Volume)
-            .join(Project)
-            .where(Volume.id == item.id, Project.user_id == current_user.id)
-        )
-        volume = result.scalars().first()
-        if volume:
-            volume.order_no = item.order_no
-    await db.commit()
-    return {"message": "ok"}
+    updated = await _bulk_reorder(db, Volume, body.items, current_user.id)
+    return {"message": "ok", "updated": updated}
 
 
 @router.put("/chapters/reorder")
@@ -49,15 +111,76 @@ async def reorder_chapters(
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """Reorder chapters by updating their order_no."""
-    for item in body.items:
-        result = await db.execute(
-            select(Chapter)
-            .join(Volume)
-            .join(Project)
-            .where(Chapter.id == item.id, Project.user_id == current_user.id)
-        )
-        chapter = result.scalars().first()
-        if chapter:
-            chapter.order_no = item.order_no
+    updated = await _bulk_reorder(db, Chapter, body.items, current_user.id)
+    return {"message": "ok", "updated": updated}
+
+
+@router.post("/volumes/{volume_id}/move")
+async def move_volume(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    volume_id: int,
+    body: MoveRequest,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Move a volume in front of another volume of the same project, or to the end."""
+    result = await db.execute(
+        select(Volume).join(Project).where(Volume.id == volume_id, Project.user_id == current_user.id)
+    )
+    volume = result.scalars().first()
+    if not volume:
+        raise HTTPException(status_code=404, detail="Volume not found")
+
+    before_order = None
+    if body.before_id is not None:
+        before = await db.get(Volume, body.before_id)
+        if not before or before.project_id != volume.project_id:
+            raise HTTPException(status_code=404, detail="Target volume not found")
+        if before.id == volume.id:
+            return {"message": "ok", "order_no": volume.order_no, "shifted": 0}
+        before_order = before.order_no
+
+    moved = await _move(db, Volume, Volume.project_id, volume.project_id, volume.id, before_order)
+    volume.order_no = moved["order_no"]
+    await refresh_first_appearances(db, volume.project_id)
+    await db.commit()
+    return {"message": "ok", **moved}
+
+
+@router.post("/chapters/{chapter_id}/move")
+async def move_chapter(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    chapter_id: int,
+    body: MoveRequest,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Move a chapter in front of another chapter (possibly in another volume of the project), or to the end of a volume."""
+    result = await db.execute(
+        select(Chapter).join(Project).where(Chapter.id == chapter_id, Project.user_id == current_user.id)
+    )
+    chapter = result.scalars().first()
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+
+    target_volume_id = body.volume_id or chapter.volume_id
+    before_order = None
+    if body.before_id is not None:
+        before = await db.get(Chapter, body.before_id)
+        if not before or before.project_id != chapter.project_id:
+            raise HTTPException(status_code=404, detail="Target chapter not found")
+        if before.id == chapter.id:
+            return {"message": "ok", "order_no": chapter.order_no, "shifted": 0}
+        target_volume_id = before.volume_id
+        before_order = before.order_no
+    elif target_volume_id != chapter.volume_id:
+        target = await db.get(Volume, target_volume_id)
+        if not target or target.project_id != chapter.project_id:
+            raise HTTPException(status_code=404, detail="Volume not found")
+
+    moved = await _move(db, Chapter, Chapter.volume_id, target_volume_id, chapter.id, before_order)
+    chapter.volume_id = target_volume_id
+    chapter.order_no = moved["order_no"]
+    await refresh_first_appearances(db, chapter.project_id)
     await db.commit()
-    return {"message": "ok"}
+    return {"message": "ok", **moved}
@@ -0,0 +1,48 @@
+from typing import Any, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api import deps
+from app.models.user import User
+from app.models.project import Project
+from app.schemas.search import SearchResponse, SearchSection
+from app.core.search import search_chapters, search_lore
+
+router = APIRouter()
+
+
+@router.get("/projects/{project_id}/search", response_model=SearchResponse)
+async def search_project(
+    *,
+    db: AsyncSession = Depends(deps.get_read_db),
+    project_id: int,
+    q: str = Query(..., min_length=1, max_length=100),
+    scope: Literal["all", "chapters", "lore"] = "all",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Search chapter content and lore of a project. Results are ranked by hit
+    count and carry snippets with their offsets in the text; chapters and
+    lore are paged separately with the same offset/limit.
+    """
+    result = await db.execute(
+        select(Project.id).where(Project.id == project_id, Project.user_id == current_user.id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    query = q.strip()
+    if not query:
+        raise HTTPException(status_code=422, detail="Empty search query")
+
+    response = SearchResponse(query=query, offset=offset, limit=limit)
+    if scope in ("all", "chapters"):
+        total, results = await search_chapters(db, project_id, query, offset, limit)
+        response.chapters = SearchSection(total=total, results=results)
+    if scope in ("all", "lore"):
+        total, results = await search_lore(db, project_id, query, offset, limit)
+        response.lore = SearchSection(total=total, results=results)
+    return response
@@ -1,17 +1,40 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Awaitable, Callable, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import undefer
 from sqlalchemy import desc
 
 from app.api import deps
 from app.models.user import User
 from app.models.project import Project, Chapter
 from app.models.snapshot import ChapterSnapshot
-from app.schemas.snapshot import SnapshotCreate, Snapshot as SnapshotSchema, SnapshotList
+from app.schemas.snapshot import SnapshotCreate, Snapshot as SnapshotSchema, SnapshotDiff, SnapshotList, SnapshotQuota
+from app.schemas.job import Job as JobSchema
+from app.core.jobs import JobContext, enqueue_job, job_handler
+from app.core.lore_mentions import update_chapter_mentions
+from app.core.snapshot_retention import SnapshotQuotaExceeded, reserve_snapshot_slot, snapshot_usage
+from app.core.snapshot_store import STORAGE_TEXT, rewrite_chain, snapshot_content, store_snapshot
+from app.core.text_diff import cached_diff
+from app.core.text_windows import content_hash
+from app.core.writing_activity import record_word_delta
+from app.db.session import AsyncSessionLocal
 
 router = APIRouter()
 
+
+def _with_content(snapshot: ChapterSnapshot, content: str) -> SnapshotSchema:
+    # Built field by field: the ORM content column only holds legacy rows' text
+    return SnapshotSchema(
+        id=snapshot.id,
+        chapter_id=snapshot.chapter_id,
+        content=content,
+        word_count=snapshot.word_count or 0,
+        label=snapshot.label,
+        created_at=snapshot.created_at,
+    )
+
+
 @router.post("/chapters/{chapter_id}/snapshots", response_model=SnapshotSchema, status_code=201)
 async def create_snapshot(
     *,
@@ -23,6 +46,7 @@ async def create_snapshot(
     """Create a snapshot of the current chapter content."""
     result = await db.execute(
         select(Chapter)
+        .options(undefer(Chapter.content))
         .join(Project)
         .where(Chapter.id == chapter_id, Project.user_id == current_user.id)
     )
@@ -30,16 +54,20 @@ async def create_snapshot(
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
 
-    snapshot = ChapterSnapshot(
-        chapter_id=chapter.id,
-        content=chapter.content,
-        word_count=chapter.word_count or 0,
-        label=snapshot_in.label,
+    try:
+        await reserve_snapshot_slot(db, chapter.id, current_user.id)
+    except SnapshotQuotaExceeded:
+        raise HTTPException(
+            status_code=409,
+            detail="快照数量已达上限，请删除部分手动快照后重试 (Snapshot quota reached.)",
+        )
+    snapshot = await store_snapshot(
+        db, chapter.id, chapter.content or "", chapter.word_count or 0,
+        label=snapshot_in.label, snapshot_type=snapshot_in.snapshot_type,
     )
-    db.add(snapshot)
     await db.commit()
     await db.refresh(snapshot)
-    return snapshot
+    return _with_content(snapshot, chapter.content or "")
 
 @router.get("/chapters/{chapter_id}/snapshots", response_model=List[SnapshotList])
 async def list_snapshots(
@@ -66,6 +94,23 @@ async def list_snapshots(
     )
     return result.scalars().all()
 
+@router.get("/chapters/{chapter_id}/snapshots/quota", response_model=SnapshotQuota)
+async def get_snapshot_quota(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    chapter_id: int,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Snapshot usage of the chapter and of the user against their quotas."""
+    result = await db.execute(
+        select(Chapter.id)
+        .join(Project)
+        .where(Chapter.id == chapter_id, Project.user_id == current_user.id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    return await snapshot_usage(db, chapter_id, current_user.id)
+
 @router.get("/snapshots/{snapshot_id}", response_model=SnapshotSchema)
 async def get_snapshot(
     *,
@@ -81,10 +126,88 @@ async def get_snapshot(
         .where(ChapterSnapshot.id == snapshot_id, Project.user_id == current_user.id)
     )
     snapshot = result.scalars().first()
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return _with_content(snapshot, await snapshot_content(db, snapshot.id))
+
+async def _owned_snapshot(db: AsyncSession, snapshot_id: int, user_id: int) -> ChapterSnapshot:
+    result = await db.execute(
+        select(ChapterSnapshot)
+        .join(Chapter)
+        .join(Project)
+        .where(ChapterSnapshot.id == snapshot_id, Project.user_id == user_id)
+    )
+    snapshot = result.scalars().first()
     if not snapshot:
         raise HTTPException(status_code=404, detail="Snapshot not found")
     return snapshot
 
+
+async def _diff_side(db: AsyncSession, snapshot: ChapterSnapshot) -> Tuple[str, Callable[[], Awaitable[str]]]:
+    """Content hash of a snapshot and a loader for its text; the text is only rebuilt when the hash is unknown."""
+    if snapshot.content_hash:
+        return snapshot.content_hash, lambda: snapshot_content(db, snapshot.id)
+    text = await snapshot_content(db, snapshot.id)  # Legacy row without a stored hash
+
+    async def loaded() -> str:
+        return text
+    return content_hash(text), loaded
+
+
+@router.get("/snapshots/{snapshot_id}/diff/{other}", response_model=SnapshotDiff)
+async def diff_snapshot(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    snapshot_id: int,
+    other: str,
+    context: int = Query(3, ge=0, le=20),
+    granularity: Literal["line", "char"] = "char",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Diff a snapshot against another snapshot (`other` is its id) or against
+    the chapter's current content (`other` is "current"). Computed and cached
+    server-side by content hash pair; hunks are paged with offset/limit.
+    """
+    snapshot = await _owned_snapshot(db, snapshot_id, current_user.id)
+    a_hash, load_a = await _diff_side(db, snapshot)
+
+    other_id: Optional[int] = None
+    if other == "current":
+        result = await db.execute(select(Chapter.content).where(Chapter.id == snapshot.chapter_id))
+        current = result.scalar() or ""
+        b_hash = content_hash(current)
+
+        async def load_b() -> str:
+            return current
+    else:
+        try:
+            other_id = int(other)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="other must be a snapshot id or 'current'")
+        b_hash, load_b = await _diff_side(db, await _owned_snapshot(db, other_id, current_user.id))
+
+    async def load() -> Tuple[str, str]:
+        return await load_a(), await load_b()
+
+    diff = await cached_diff(a_hash, b_hash, load, context=context, char_level=granularity == "char")
+    return SnapshotDiff(
+        a_id=snapshot.id,
+        b_id=other_id,
+        a_hash=a_hash,
+        b_hash=b_hash,
+        lines_added=diff["lines_added"],
+        lines_deleted=diff["lines_deleted"],
+        granularity=diff.get("granularity", granularity),
+        too_large=diff.get("too_large", False),
+        total_hunks=len(diff["hunks"]),
+        offset=offset,
+        limit=limit,
+        hunks=diff["hunks"][offset:offset + limit],
+    )
+
 @router.post("/snapshots/{snapshot_id}/rollback", response_model=dict)
 async def rollback_snapshot(
     *,
@@ -107,12 +230,21 @@ async def rollback_snapshot(
     chapter = await db.get(Chapter, snapshot.chapter_id)
 
     # Restore content
-    chapter.content = snapshot.content
+    delta = (snapshot.word_count or 0) - (chapter.word_count or 0)
+    chapter.content = await snapshot_content(db, snapshot.id)
     chapter.word_count = snapshot.word_count
+    chapter.version += 1
     db.add(chapter)
+    await record_word_delta(db, current_user.id, chapter.project_id, delta)
+    await update_chapter_mentions(db, chapter.project_id, chapter.id, chapter.content)
     await db.commit()
 
-    return {"message": "Rollback successful", "chapter_id": chapter.id, "word_count": snapshot.word_count}
+    return {
+        "message": "Rollback successful",
+        "chapter_id": chapter.id,
+        "word_count": snapshot.word_count,
+        "version": chapter.version,
+    }
 
 @router.delete("/snapshots/{snapshot_id}", status_code=204)
 async def delete_snapshot(
@@ -132,5 +264,49 @@ async def delete_snapshot(
     if not snapshot:
         raise HTTPException(status_code=404, detail="Snapshot not found")
 
-    await db.delete(snapshot)
+    # Snapshots stored as deltas against this one are re-encoded against its predecessor
+    await rewrite_chain(db, snapshot.chapter_id, drop_ids={snapshot.id})
     await db.commit()
+
+
+@job_handler("snapshot_compaction")
+async def compact_project_snapshots_job(ctx: JobContext) -> dict:
+    """Rewrite every chapter's snapshot chain; legacy plain-text rows become keyframes and deltas."""
+    async with AsyncSessionLocal() as db:
+        query = select(ChapterSnapshot.chapter_id).join(Chapter).where(Chapter.project_id == ctx.project_id)
+        if not ctx.payload.get("repack"):
+            query = query.where(ChapterSnapshot.storage == STORAGE_TEXT)
+        chapter_ids = (await db.execute(query.distinct().order_by(ChapterSnapshot.chapter_id))).scalars().all()
+
+        rewritten = 0
+        for i, chapter_id in enumerate(chapter_ids):
+            stats = await rewrite_chain(db, chapter_id, reencode_all=True)
+            await db.commit()  # Per chapter, so a retried job resumes where it stopped
+            rewritten += stats["rewritten"]
+            await ctx.progress(int(100 * (i + 1) / len(chapter_ids)), f"已压缩 {i + 1}/{len(chapter_ids)} 章")
+    return {"chapters": len(chapter_ids), "snapshots": rewritten}
+
+
+@router.post("/projects/{project_id}/snapshots/compact", response_model=JobSchema, status_code=202)
+async def compact_project_snapshots(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    project_id: int,
+    repack: bool = False,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Queue compaction of the project's snapshots. By default only chapters
+    that still have uncompressed (legacy) snapshots are rewritten; `repack`
+    repacks every chain. Track it via GET /jobs/{id}.
+    """
+    result = await db.execute(
+        select(Project).where(Project.id == project_id, Project.user_id == current_user.id)
+    )
+    if not result.scalars().first():
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return await enqueue_job(
+        db, "snapshot_compaction", current_user.id,
+        payload={"repack": repack}, project_id=project_id, message="等待压缩...",
+    )
@@ -1,5 +1,6 @@
 from typing import Any
-from fastapi import APIRouter, Depends
+from datetime import timedelta
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func
@@ -7,6 +8,8 @@ from sqlalchemy import func
 from app.api import deps
 from app.models.user import User
 from app.models.project import Project, Chapter
+from app.models.activity import WritingActivity
+from app.core.writing_activity import BASELINE_DAY, utc_today
 
 router = APIRouter()
 
@@ -14,42 +17,78 @@ router = APIRouter()
 @router.get("/overview")
 async def get_writing_stats(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     current_user: User = Depends(deps.get_current_user),
+    days: int = Query(30, ge=1, le=366),
 ) -> Any:
-    """Return writing statistics overview for the current user."""
+    """
+    Return writing statistics overview for the current user, served from the
+    daily writing_activity rollup: totals, today's words, the current streak
+    and per-day history for the last `days` days.
+    """
+    today = utc_today()
+
     # Total projects
     result = await db.execute(
         select(func.count(Project.id)).where(Project.user_id == current_user.id)
     )
     total_projects = result.scalar() or 0
 
-    # Total chapters + total words
+    # Total chapters (index-only on chapters.project_id)
     result = await db.execute(
-        select(
-            func.count(Chapter.id),
-            func.coalesce(func.sum(Chapter.word_count), 0),
-        )
-        .join(Project)
-        .where(Project.user_id == current_user.id)
+        select(func.count(Chapter.id))
+        .where(Chapter.project_id.in_(select(Project.id).where(Project.user_id == current_user.id)))
+    )
+    total_chapters = result.scalar() or 0
+
+    # Total words: net of every recorded change
+    result = await db.execute(
+        select(func.coalesce(func.sum(WritingActivity.words_added - WritingActivity.words_deleted), 0))
+        .where(WritingActivity.user_id == current_user.id)
     )
-    row = result.one()
-    total_chapters = row[0] or 0
-    total_words = row[1] or 0
+    total_words = result.scalar() or 0
 
-    # Today's words (chapters updated today)
-    from datetime import date, datetime, timezone
-    today_start = datetime.combine(date.today(), datetime.min.time()).replace(tzinfo=timezone.utc)
+    # Per-day totals across projects, newest first, far enough back for the streak
     result = await db.execute(
-        select(func.coalesce(func.sum(Chapter.word_count), 0))
-        .join(Project)
-        .where(Project.user_id == current_user.id, Chapter.updated_at >= today_start)
+        select(
+            WritingActivity.day,
+            func.sum(WritingActivity.words_added).label("words_added"),
+            func.sum(WritingActivity.words_deleted).label("words_deleted"),
+        )
+        .where(
+            WritingActivity.user_id == current_user.id,
+            WritingActivity.day >= today - timedelta(days=366),
+            WritingActivity.day != BASELINE_DAY,  # Pre-existing words, not a day of writing
+        )
+        .group_by(WritingActivity.day)
+        .order_by(WritingActivity.day.desc())
     )
-    today_words = result.scalar() or 0
+    daily = {row.day: row for row in result}
+
+    today_words = daily[today].words_added if today in daily else 0
+
+    # Consecutive days with new words, ending today (or yesterday if nothing is written yet today)
+    streak_days = 0
+    day = today if today_words else today - timedelta(days=1)
+    while day in daily and daily[day].words_added > 0:
+        streak_days += 1
+        day -= timedelta(days=1)
+
+    history = []
+    for offset in range(days - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        row = daily.get(day)
+        history.append({
+            "date": day.isoformat(),
+            "words_added": row.words_added if row else 0,
+            "words_deleted": row.words_deleted if row else 0,
+        })
 
     return {
         "total_projects": total_projects,
         "total_chapters": total_chapters,
         "total_words": total_words,
         "today_words": today_words,
+        "streak_days": streak_days,
+        "history": history,
     }
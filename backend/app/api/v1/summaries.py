@@ -0,0 +1,89 @@
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api import deps
+from app.models.user import User
+from app.models.project import Project, Volume, Chapter
+from app.models.summary import StorySummary
+from app.schemas.job import Job as JobSchema
+from app.schemas.summary import StorySummaries
+from app.core.jobs import JobContext, job_handler
+from app.core.story_summaries import (
+    CHAPTER, JOB_KIND, PROJECT, VOLUME, enqueue_summary_refresh, ensure_summaries, refresh_project_summaries,
+)
+from app.db.session import AsyncSessionLocal
+
+router = APIRouter()
+
+
+@job_handler(JOB_KIND)
+async def refresh_summaries_job(ctx: JobContext) -> dict:
+    """Regenerate the project's chapter, volume and synopsis summaries whose source text changed."""
+    async with AsyncSessionLocal() as db:
+        stats = await refresh_project_summaries(db, ctx.project_id, ctx.progress)
+    await ctx.progress(100, "摘要已更新")
+    return stats
+
+
+@router.get("/projects/{project_id}/summaries", response_model=StorySummaries)
+async def read_project_summaries(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    project_id: int,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    The project's synopsis, volume summaries and chapter summaries. Chapters
+    changed since they were summarized are queued for regeneration.
+    """
+    result = await db.execute(
+        select(Project.id).where(Project.id == project_id, Project.user_id == current_user.id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    synopsis = (await db.execute(
+        select(StorySummary).where(StorySummary.project_id == project_id, StorySummary.level == PROJECT)
+    )).scalars().first()
+    volumes = (await db.execute(
+        select(StorySummary)
+        .join(Volume, and_(Volume.id == StorySummary.volume_id, StorySummary.level == VOLUME))
+        .where(StorySummary.project_id == project_id)
+        .order_by(Volume.order_no, Volume.id)
+    )).scalars().all()
+    chapters = (await db.execute(
+        select(StorySummary)
+        .join(Chapter, and_(Chapter.id == StorySummary.chapter_id, StorySummary.level == CHAPTER))
+        .join(Volume, Volume.id == Chapter.volume_id)
+        .where(StorySummary.project_id == project_id)
+        .order_by(Volume.order_no, Chapter.order_no, Chapter.id)
+    )).scalars().all()
+    response = StorySummaries(synopsis=synopsis, volumes=volumes, chapters=chapters)
+    await ensure_summaries(db, project_id, current_user.id)
+    return response
+
+
+@router.post("/projects/{project_id}/summaries/refresh", response_model=JobSchema, status_code=202)
+async def refresh_project_summaries_now(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    project_id: int,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Queue regeneration of outdated summaries without waiting for a prompt
+    to ask for them. Track it via GET /jobs/{id}.
+    """
+    result = await db.execute(
+        select(Project.id).where(Project.id == project_id, Project.user_id == current_user.id)
+    )
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    job = await enqueue_summary_refresh(db, project_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="A summary refresh is already queued for this project")
+    return job
@@ -7,6 +7,9 @@ from app.api import deps
 from app.models.user import User
 from app.models.project import Project, Volume
 from app.schemas.project import Volume as VolumeSchema, VolumeCreate, VolumeUpdate
+from app.core.lore_mentions import refresh_first_appearances
+from app.core.story_summaries import refresh_after_removal
+from app.core.writing_activity import record_word_delta
 
 router = APIRouter()
 
@@ -88,5 +91,11 @@ async def delete_volume(
         raise HTTPException(status_code=404, detail="Volume not found")
     
     await db.delete(volume)
+    await record_word_delta(
+        db, current_user.id, volume.project_id, -sum(chapter.word_count or 0 for chapter in volume.chapters)
+    )
+    await db.flush()  # Mentions in the deleted chapters cascade away; first appearances move to later chapters
+    await refresh_first_appearances(db, volume.project_id)
     await db.commit()
+    await refresh_after_removal(db, volume.project_id, current_user.id)
     return volume
@@ -2,11 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select
+from sqlalchemy.orm import undefer
 from app.api import deps
 from app.db.session import get_db
 from app.models.project import Project, Chapter
 from app.schemas import writing as writing_schemas
 from app.core.ai_client import ai_client
+from app.core.config import settings
+from app.core.prompt_builder import PromptTooLong, Section, build_prompt
+from app.core.story_summaries import ensure_summaries, summary_context
+from app.core.tokens import truncate_to_tokens
+from app.core.writing_context import assemble_writing_context
 from app.core.prompts import CONTINUE_WRITING_PROMPT, REWRITE_PROMPT, SYSTEM_WRITING_ASSISTANT
 
 router = APIRouter()
@@ -26,28 +32,50 @@ async def continue_writing(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    result = await db.execute(select(Chapter).where(Chapter.id == request.chapter_id))
+    result = await db.execute(
+        select(Chapter)
+        .options(undefer(Chapter.content))
+        .where(Chapter.id == request.chapter_id, Chapter.project_id == project.id)
+    )
     chapter = result.scalars().first()
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
 
-    # 2. Prepare Prompt
-    context_text = request.context
-    if not context_text and chapter.content:
-        context_text = chapter.content[-2000:]
-
-    prompt = CONTINUE_WRITING_PROMPT.format(
-        title=project.title,
-        genre=project.genre,
-        chapter_title=chapter.title,
-        context=context_text,
-        instruction=request.instruction or "Advance the plot."
+    # 2. Prepare Prompt: the text before the cursor, cut to whole sentences within its token window
+    context_text = truncate_to_tokens(
+        request.context or chapter.content or "", settings.WRITING_CONTEXT_WINDOW_TOKENS, keep_end=True
     )
 
+    # Lore named in the recent text plus the outline around this chapter, within the token budget
+    story_context = await assemble_writing_context(db, chapter, context_text or "", request.instruction)
+    story_so_far = await summary_context(db, chapter)
+
+    try:
+        prompt = build_prompt(
+            CONTINUE_WRITING_PROMPT,
+            [
+                Section("instruction", request.instruction or "Advance the plot.", priority=0, required=True),
+                Section("context", context_text, priority=1, keep_end=True),
+                Section("outline_context", story_context.outline_context, priority=2),
+                Section(
+                    "summary_context", story_so_far or "暂无前情。", priority=3,
+                    max_tokens=settings.SUMMARY_CONTEXT_TOKENS, keep_end=True,
+                ),
+                Section("lore_context", story_context.lore_context, priority=4),
+            ],
+            system_role=SYSTEM_WRITING_ASSISTANT,
+            title=project.title,
+            genre=project.genre,
+            chapter_title=chapter.title,
+        )
+    except PromptTooLong:
+        raise HTTPException(status_code=422, detail="Instruction is too long")
+    await ensure_summaries(db, project.id, current_user.id)
+
     # 3. Stream Response
     return StreamingResponse(
         ai_client.generate_stream(
-            prompt=prompt,
+            prompt=prompt.text,
             system_role=SYSTEM_WRITING_ASSISTANT,
             temperature=0.8
         ),
@@ -69,13 +97,20 @@ async def rewrite_text(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    prompt = REWRITE_PROMPT.format(
-        instruction=request.instruction,
-        text=request.text
-    )
+    try:
+        prompt = build_prompt(
+            REWRITE_PROMPT,
+            [
+                Section("instruction", request.instruction, priority=0, required=True),
+                Section("text", request.text, priority=1, required=True),
+            ],
+            system_role=SYSTEM_WRITING_ASSISTANT,
+        )
+    except PromptTooLong:
+        raise HTTPException(status_code=422, detail="Text is too long to rewrite in one request")
 
     content = await ai_client.generate_response(
-        prompt=prompt,
+        prompt=prompt.text,
         system_role=SYSTEM_WRITING_ASSISTANT,
         temperature=0.7
     )
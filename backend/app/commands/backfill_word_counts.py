@@ -0,0 +1,117 @@
+"""
+Recount Chapter.word_count and ChapterSnapshot.word_count with the CJK-aware
+counter. Rows stored before it used len(content), which included whitespace
+and punctuation.
+
+    python -m app.commands.backfill_word_counts [--batch-size 500] [--dry-run]
+
+Rows are read in primary-key order, --batch-size at a time, and every batch is
+written with one UPDATE ... FROM (VALUES ...). Chapter corrections are also
+folded into each project's baseline writing_activity row (BASELINE_DAY), so
+total words match the new counts while daily history and streaks are untouched.
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from sqlalchemy import Integer, column, func, update, values as sa_values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+import app.main  # noqa: F401  Configures every mapper
+from app.core.snapshot_store import STORAGE_TEXT
+from app.core.word_count import word_count
+from app.core.writing_activity import BASELINE_DAY, record_word_delta
+from app.db.session import AsyncSessionLocal
+from app.models.project import Chapter, Project
+from app.models.snapshot import ChapterSnapshot
+
+
+async def _backfill(model, batch_size: int, dry_run: bool) -> Tuple[int, Dict[int, int]]:
+    """Recount one table; returns rows changed and, for chapters, the net change per project."""
+    changed = 0
+    project_deltas: Dict[int, int] = defaultdict(int)
+    is_chapter = model is Chapter
+    # A recount is not an edit: keep Chapter.updated_at instead of letting onupdate bump it
+    keep_updated_at = {"updated_at": Chapter.updated_at} if is_chapter else {}
+    last_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            columns = [model.id, model.content, model.word_count]
+            if is_chapter:
+                columns.append(Chapter.project_id)
+            query = select(*columns).where(model.id > last_id)
+            if not is_chapter:
+                # Compressed snapshots were counted with word_count() when they were stored
+                query = query.where(ChapterSnapshot.storage == STORAGE_TEXT)
+            rows = (await db.execute(query.order_by(model.id).limit(batch_size))).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = [
+                (row[0], row[2] or 0, word_count(row[1] or ""), row[3] if is_chapter else None)
+                for row in rows
+            ]
+            updates = [update_row for update_row in updates if update_row[1] != update_row[2]]
+            if not updates:
+                continue
+            if dry_run:
+                applied = updates
+            else:
+                new_counts = sa_values(
+                    column("id", Integer), column("old_count", Integer), column("word_count", Integer),
+                    name="new_counts",
+                ).data([update_row[:3] for update_row in updates])
+                # Skip rows saved since they were read; the save already stored a fresh count
+                updated_ids = set((await db.execute(
+                    update(model)
+                    .where(model.id == new_counts.c.id, func.coalesce(model.word_count, 0) == new_counts.c.old_count)
+                    .values(word_count=new_counts.c.word_count, **keep_updated_at)
+                    .returning(model.id)
+                    .execution_options(synchronize_session=False)
+                )).scalars())
+                applied = [update_row for update_row in updates if update_row[0] in updated_ids]
+
+            batch_deltas: Dict[int, int] = defaultdict(int)
+            if is_chapter:
+                for _, old_count, new_count, project_id in applied:
+                    batch_deltas[project_id] += new_count - old_count
+            if not dry_run:
+                # Same transaction as the recount, so an interrupted run can simply be restarted
+                await _record_adjustments(db, batch_deltas)
+                await db.commit()
+            changed += len(applied)
+            for project_id, delta in batch_deltas.items():
+                project_deltas[project_id] += delta
+    return changed, project_deltas
+
+
+async def _record_adjustments(db: AsyncSession, project_deltas: Dict[int, int]) -> None:
+    """Fold per-project corrections into writing_activity; the caller commits."""
+    project_deltas = {project_id: delta for project_id, delta in project_deltas.items() if delta}
+    if not project_deltas:
+        return
+    owners = dict((await db.execute(
+        select(Project.id, Project.user_id).where(Project.id.in_(project_deltas))
+    )).all())
+    for project_id, delta in project_deltas.items():
+        if project_id in owners:
+            await record_word_delta(db, owners[project_id], project_id, delta, day=BASELINE_DAY)
+
+
+async def main(batch_size: int, dry_run: bool) -> None:
+    chapters, project_deltas = await _backfill(Chapter, batch_size, dry_run)
+    snapshots, _ = await _backfill(ChapterSnapshot, batch_size, dry_run)
+    prefix = "Would update" if dry_run else "Updated"
+    print(f"{prefix} {chapters} chapters and {snapshots} snapshots "
+          f"(net {sum(project_deltas.values()):+d} words across {len(project_deltas)} projects)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Count rows that would change without writing")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
@@ -1,13 +1,26 @@
 from openai import AsyncOpenAI
 from app.core.config import settings
-from typing import Optional, Dict, Any
+from app.core.cache import ResponseCache, LRUResponseCache, RedisResponseCache, TieredResponseCache
+from typing import Optional, Dict, Any, List
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+def response_cache_key(model: str, system_role: str, prompt: str, temperature: float,
+                       max_tokens: int, response_format: Optional[Dict[str, Any]]) -> str:
+    payload = json.dumps(
+        [model, system_role, prompt, temperature, max_tokens, response_format],
+        ensure_ascii=False, sort_keys=True
+    )
+    return "ai:response:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 class AIClient:
     _instance = None
     client: Optional[AsyncOpenAI] = None
+    embedding_client: Optional[AsyncOpenAI] = None
+    cache: Optional[ResponseCache] = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -27,13 +40,38 @@ class AIClient:
         else:
             logger.warning("AI_API_KEY not set. AI features will be disabled.")
 
+        if settings.AI_EMBEDDING_MODEL:
+            if settings.AI_EMBEDDING_BASE_URL or settings.AI_EMBEDDING_API_KEY:
+                self.embedding_client = AsyncOpenAI(
+                    api_key=settings.AI_EMBEDDING_API_KEY or settings.AI_API_KEY,
+                    base_url=settings.AI_EMBEDDING_BASE_URL or settings.AI_BASE_URL,
+                    timeout=settings.AI_TIMEOUT
+                )
+            else:
+                self.embedding_client = self.client
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+        if settings.AI_CACHE_ENABLED:
+            local = LRUResponseCache(settings.AI_CACHE_MAX_ENTRIES)
+            if settings.REDIS_URL:
+                self.cache = TieredResponseCache(local, RedisResponseCache(settings.REDIS_URL), settings.AI_CACHE_TTL)
+            else:
+                self.cache = local
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters for the response cache (this process only)."""
+        return {"hits": self.cache_hits, "misses": self.cache_misses}
+
     async def generate_response(
         self, 
         prompt: str, 
         system_role: str = "You are a helpful creative writing assistant.",
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        response_format: Optional[Dict[str, Any]] = None
+        response_format: Optional[Dict[str, Any]] = None,
+        cache_ttl: Optional[int] = None,
+        bypass_cache: bool = False
     ) -> Optional[str]:
         """
         Generate a response from the LLM.
@@ -44,6 +82,9 @@ class AIClient:
             temperature: Creativity control.
             max_tokens: Max tokens to generate.
             response_format: Optional JSON schema for structured output (if supported by provider).
+            cache_ttl: Cache the response for this many seconds. None disables caching for the call,
+                so creative "regenerate" requests keep returning fresh output.
+            bypass_cache: Skip the cache lookup but still store the fresh response.
         
         Returns:
             The generated text content or None if failed.
@@ -52,6 +93,18 @@ class AIClient:
             logger.error("AI Client not initialized.")
             return None
 
+        cache_key = None
+        if self.cache and cache_ttl:
+            cache_key = response_cache_key(
+                settings.AI_MODEL_NAME, system_role, prompt, temperature, max_tokens, response_format
+            )
+            if not bypass_cache:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    self.cache_hits += 1
+                    return cached
+            self.cache_misses += 1
+
         try:
             kwargs = {
                 "model": settings.AI_MODEL_NAME,
@@ -68,7 +121,10 @@ class AIClient:
                 kwargs["response_format"] = response_format
 
             response = await self.client.chat.completions.create(**kwargs)
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if cache_key and content:
+                await self.cache.set(cache_key, content, cache_ttl)
+            return content
         except Exception as e:
             logger.error(f"Error generating AI response: {str(e)}")
             return None
@@ -110,5 +166,25 @@ class AIClient:
             logger.error(f"Error generating AI stream: {str(e)}")
             yield f"Error: {str(e)}"
 
+    async def embed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        Embed a batch of texts with AI_EMBEDDING_MODEL.
+
+        Returns:
+            One vector per input text, or None if embeddings are disabled or failed.
+        """
+        if not self.embedding_client or not texts:
+            return None
+
+        try:
+            response = await self.embedding_client.embeddings.create(
+                model=settings.AI_EMBEDDING_MODEL,
+                input=texts
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {str(e)}")
+            return None
+
 # Global instance
 ai_client = AIClient()
@@ -0,0 +1,103 @@
+"""
+Small async key/value caches: an in-process LRU, Redis, and a two-tier
+combination of both. Values are strings; callers serialize.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache(ABC):
+    """Cache backend interface (LLM responses, authenticated principals, snapshot diffs)."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+class LRUResponseCache(ResponseCache):
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+class RedisResponseCache(ResponseCache):
+    """Shared cache across workers. Redis errors are logged and treated as misses."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            return await self._redis.get(key)
+        except Exception as e:
+            logger.warning(f"Redis cache get failed: {str(e)}")
+            return None
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        try:
+            await self._redis.set(key, value, ex=ttl)
+        except Exception as e:
+            logger.warning(f"Redis cache set failed: {str(e)}")
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self._redis.delete(key)
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed: {str(e)}")
+
+class TieredResponseCache(ResponseCache):
+    """Looks up the local LRU first, then Redis; Redis hits are copied into the LRU."""
+
+    def __init__(self, local: ResponseCache, shared: ResponseCache, local_ttl: int):
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.local.get(key)
+        if value is None:
+            value = await self.shared.get(key)
+            if value is not None:
+                await self.local.set(key, value, self.local_ttl)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self.local.set(key, value, min(ttl, self.local_ttl))
+        await self.shared.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await self.local.delete(key)
+        await self.shared.delete(key)
@@ -2,6 +2,8 @@ from typing import List, Union, Optional
 from pydantic import AnyHttpUrl, validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.core.retention_spec import parse_tiers
+
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Male-Lead Web Novel AI Author Tool"
@@ -31,12 +33,34 @@ class Settings(BaseSettings):
             return v
         return f"postgresql+asyncpg://{values.get('POSTGRES_USER')}:{values.get('POSTGRES_PASSWORD')}@{values.get('POSTGRES_SERVER')}:{values.get('POSTGRES_PORT')}/{values.get('POSTGRES_DB')}"
 
+    # Optional read replica for lag-tolerant reads (listings, stats, exports)
+    DATABASE_REPLICA_URI: Optional[str] = None
+
+    # Connection pool, per process: total connections = processes x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
     # JWT
     SECRET_KEY: str = "changethis_secret_key"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # Principal cache for get_current_user; trusting token claims skips the user lookup entirely
+    AUTH_PRINCIPAL_CACHE_TTL: int = 60
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+
+    # Password hashing (bcrypt runs in a thread pool; excess logins get 503 instead of queueing forever)
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+
     
     # AI/LLM
     # Default to DeepSeek config as example, but compatible with OpenAI
@@ -45,6 +69,98 @@ class Settings(BaseSettings):
     AI_MODEL_NAME: str = "deepseek-chat"
     AI_TIMEOUT: int = 60
 
+    # Prompt budgets. AI_TOKENIZER is "approx" (estimate from character / word counts,
+    # tuned for DeepSeek) or a tiktoken encoding such as "cl100k_base" (needs tiktoken)
+    AI_TOKENIZER: str = "approx"
+    AI_TOKENS_PER_CJK: float = 0.6
+    AI_TOKENS_PER_WORD: float = 1.3
+    AI_CONTEXT_TOKENS: int = 65536  # Model context window
+    AI_PROMPT_TOKEN_BUDGET: int = 12000  # Cap on user prompt size, for cost
+
+    # Embeddings for semantic lore retrieval (pgvector). Leave the model empty to
+    # fall back to name matching. Base URL / key default to the chat provider's.
+    AI_EMBEDDING_MODEL: str = ""
+    AI_EMBEDDING_BASE_URL: Optional[str] = None
+    AI_EMBEDDING_API_KEY: Optional[str] = None
+    LORE_RETRIEVAL_TOP_K: int = 12
+
+    # LLM response cache: in-process LRU, plus Redis when REDIS_URL is set
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_MAX_ENTRIES: int = 512
+    AI_CACHE_TTL: int = 3600
+
+    # Consistency checks: long chapters are checked as overlapping windows in parallel
+    CONSISTENCY_WINDOW_CHARS: int = 3000
+    CONSISTENCY_WINDOW_OVERLAP: int = 300
+    CONSISTENCY_MAX_CONCURRENCY: int = 4
+    CONSISTENCY_FIX_CONTEXT_TOKENS: int = 150  # Chapter text sent on each side of the quote to fix
+
+    # Outline generation: skeleton first, then volumes expanded concurrently
+    OUTLINE_DEFAULT_VOLUMES: int = 3
+    OUTLINE_MAX_CONCURRENCY: int = 4
+
+    # Background jobs
+    JOB_WORKERS: int = 4  # Workers per API process; 0 disables job execution in this process
+    JOB_MAX_PER_USER: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: int = 5
+    JOB_LEASE_SECONDS: int = 300
+    JOB_TTL_HOURS: int = 24
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_MAINTENANCE_INTERVAL: int = 60
+
+    # Snapshots: keyframe (full compressed text) at least every N snapshots, deltas in between
+    SNAPSHOT_KEYFRAME_INTERVAL: int = 20
+    # Auto snapshot retention, "age:spacing" tiers ("all" keeps every one); older auto snapshots are
+    # deleted, manual ones are kept forever. Quotas of 0 mean unlimited.
+    SNAPSHOT_RETENTION: str = "1h:all,1d:1h,30d:1d"
+
+    @validator("SNAPSHOT_RETENTION")
+    def check_snapshot_retention(cls, v: str) -> str:
+        parse_tiers(v)  # A typo must fail at startup, not silently stop every pruning run
+        return v
+
+    SNAPSHOT_PRUNE_INTERVAL: int = 3600
+    SNAPSHOT_PRUNE_BATCH: int = 100  # Chapters per pruning query
+    SNAPSHOT_MAX_PER_CHAPTER: int = 200
+    SNAPSHOT_MAX_PER_USER: int = 5000
+    # Snapshot diffs, cached by content hash pair
+    SNAPSHOT_DIFF_CACHE_TTL: int = 86400
+    SNAPSHOT_DIFF_CACHE_MAX_ENTRIES: int = 256
+    SNAPSHOT_DIFF_WORKERS: int = 2  # Threads computing diffs on a cache miss, per process
+    SNAPSHOT_DIFF_MAX_CHARS: int = 100000  # Both texts together; beyond this diffs are line-level only
+
+    # Search: characters of context on each side of a hit, snippets per result
+    SEARCH_SNIPPET_RADIUS: int = 40
+    SEARCH_SNIPPETS_PER_RESULT: int = 3
+
+    # Lore mention index: shortest name/alias matched, projects whose matchers stay cached
+    LORE_MENTION_MIN_LENGTH: int = 2
+    LORE_MATCHER_CACHE_SIZE: int = 256
+
+    # Continue-writing: tokens of text before the cursor sent as context, token budget
+    # for the lore and outline context, chapters of outline on each side
+    WRITING_CONTEXT_WINDOW_TOKENS: int = 1200
+    WRITING_CONTEXT_TOKEN_BUDGET: int = 1500
+    WRITING_CONTEXT_NEIGHBOURS: int = 1
+
+    # Rolling summaries: minimum chapter length, quiet time before a changed chapter
+    # is re-summarized, output cap per summary, previous chapters and tokens in prompts
+    SUMMARY_MIN_WORDS: int = 200
+    SUMMARY_SETTLE_SECONDS: int = 600
+    SUMMARY_MAX_TOKENS: int = 600
+    SUMMARY_CONTEXT_CHAPTERS: int = 3
+    SUMMARY_CONTEXT_TOKENS: int = 800
+
+    # SSE progress streams: heartbeat comment (and job state re-check) interval
+    EVENT_HEARTBEAT_SECONDS: float = 15.0
+
+    # Redis (optional, shared across workers)
+    REDIS_URL: Optional[str] = None
+
+    # Bearer token for GET /metrics; unset hides the endpoint (404)
+    METRICS_TOKEN: Optional[str] = None
+
     model_config = SettingsConfigDict(case_sensitive=True, env_file=".env")
 
 settings = Settings()
@@ -0,0 +1,125 @@
+"""
+Push-based event bus for progress streams.
+
+Each channel keeps only its latest event: subscribers wait on an
+`asyncio.Condition` and wake the moment something is published, so an idle
+watcher is one suspended coroutine with no polling. Slow subscribers skip
+intermediate events and always see the newest state, which is what progress
+streams want.
+
+Without Redis, events only reach subscribers in the publishing process. When
+REDIS_URL is set, events are published through Redis pub/sub and every process
+delivers them to its local subscribers through one shared listener.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL_PREFIX = "events:"
+
+
+class _Channel:
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.version = 0
+        self.data: Optional[dict] = None
+        self.subscribers = 0
+
+
+class Subscription:
+    def __init__(self, channel: _Channel):
+        self._channel = channel
+        self._seen = channel.version
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """Wait for an event newer than the last one returned; None on timeout."""
+        channel = self._channel
+        async with channel.condition:
+            try:
+                await asyncio.wait_for(
+                    channel.condition.wait_for(lambda: channel.version > self._seen), timeout
+                )
+            except asyncio.TimeoutError:
+                return None
+            self._seen = channel.version
+            return channel.data
+
+
+class EventBus:
+    def __init__(self, redis_url: Optional[str] = None):
+        self._channels: Dict[str, _Channel] = {}
+        self._redis_url = redis_url
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def subscribe(self, name: str) -> AsyncIterator[Subscription]:
+        """Subscribe before reading current state, so no event in between is missed."""
+        channel = self._channels.setdefault(name, _Channel())
+        channel.subscribers += 1
+        try:
+            yield Subscription(channel)
+        finally:
+            channel.subscribers -= 1
+            if channel.subscribers == 0 and self._channels.get(name) is channel:
+                del self._channels[name]
+
+    async def publish(self, name: str, data: dict) -> None:
+        if self._listener is not None:
+            try:
+                await self._redis.publish(REDIS_CHANNEL_PREFIX + name, json.dumps(data, ensure_ascii=False))
+                return
+            except Exception as e:
+                logger.warning(f"Redis publish failed, delivering locally only: {str(e)}")
+        await self._deliver(name, data)
+
+    async def _deliver(self, name: str, data: dict) -> None:
+        channel = self._channels.get(name)
+        if channel is None:  # Nobody is listening in this process
+            return
+        async with channel.condition:
+            channel.version += 1
+            channel.data = data
+            channel.condition.notify_all()
+
+    def start(self) -> None:
+        """Start the Redis listener when REDIS_URL is configured; otherwise the bus stays in-process."""
+        if not self._redis_url or self._listener is not None:
+            return
+        import redis.asyncio as redis
+        self._redis = redis.from_url(self._redis_url, decode_responses=True)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.psubscribe(REDIS_CHANNEL_PREFIX + "*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    name = message["channel"][len(REDIS_CHANNEL_PREFIX):]
+                    await self._deliver(name, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis event listener failed, reconnecting: {str(e)}")
+                await asyncio.sleep(1)
+
+
+event_bus = EventBus(settings.REDIS_URL)
@@ -0,0 +1,284 @@
+"""
+Chunked manuscript writers used by the project export endpoint.
+
+Every writer is fed the book piece by piece (start -> volume/chapter ... -> finish)
+and returns the encoded bytes produced by that piece, so the caller can stream
+them out without ever holding the whole book in memory.
+"""
+import io
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+EMPTY_CHAPTER_TEXT = "(空)"
+
+
+class ExportWriter:
+    """Base class for export formats."""
+    extension = "txt"
+    media_type = "text/plain; charset=utf-8"
+
+    def start(self, title: str, genre: Optional[str]) -> bytes:
+        return b""
+
+    def volume(self, title: str) -> bytes:
+        return b""
+
+    def chapter(self, title: str, content: Optional[str]) -> bytes:
+        return b""
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class TxtWriter(ExportWriter):
+    extension = "txt"
+    media_type = "text/plain; charset=utf-8"
+
+    def start(self, title, genre):
+        header = f"《{title}》\n" f"类型: {genre or '未知'}\n" + "=" * 40 + "\n\n"
+        return header.encode("utf-8")
+
+    def volume(self, title):
+        return (f"\n{title}\n" + "-" * 30 + "\n\n").encode("utf-8")
+
+    def chapter(self, title, content):
+        return (f"\n{title}\n\n" + (content or EMPTY_CHAPTER_TEXT) + "\n\n").encode("utf-8")
+
+
+class MarkdownWriter(ExportWriter):
+    extension = "md"
+    media_type = "text/markdown; charset=utf-8"
+
+    def start(self, title, genre):
+        return f"# {title}\n\n> 类型: {genre or '未知'}\n\n".encode("utf-8")
+
+    def volume(self, title):
+        return f"\n## {title}\n\n".encode("utf-8")
+
+    def chapter(self, title, content):
+        return (f"\n### {title}\n\n" + (content or EMPTY_CHAPTER_TEXT) + "\n\n").encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink that hands back whatever zipfile wrote since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _paragraphs(content: Optional[str]) -> List[str]:
+    lines = [line.strip() for line in (content or "").splitlines()]
+    return [line for line in lines if line] or [EMPTY_CHAPTER_TEXT]
+
+
+class _ZipExportWriter(ExportWriter):
+    """
+    Shared plumbing for zip-based formats. zipfile streams to a non-seekable
+    sink by using data descriptors, so finished entries can be flushed at once.
+    """
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+
+    def _write_entry(self, name: str, data: str, compress: bool = True) -> None:
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self._zip.writestr(info, data.encode("utf-8"))
+
+    def _close(self) -> bytes:
+        self._zip.close()
+        return self._sink.drain()
+
+
+EPUB_CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+EPUB_XHTML_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="zh-CN">
+<head><meta charset="UTF-8"/><title>{title}</title></head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+class EpubWriter(_ZipExportWriter):
+    """EPUB 3: one XHTML document per volume heading and per chapter; OPF and nav written last."""
+    extension = "epub"
+    media_type = "application/epub+zip"
+
+    def __init__(self):
+        super().__init__()
+        self._title = ""
+        # (file id, toc label, is_volume) -- metadata only, never chapter text
+        self._toc: List[Tuple[str, str, bool]] = []
+
+    def _document(self, doc_id: str, title: str, body: str) -> bytes:
+        self._write_entry(
+            f"OEBPS/{doc_id}.xhtml",
+            EPUB_XHTML_TEMPLATE.format(title=escape(title), body=body),
+        )
+        return self._sink.drain()
+
+    def start(self, title, genre):
+        self._title = title
+        # The mimetype entry must come first and stay uncompressed
+        self._write_entry("mimetype", "application/epub+zip", compress=False)
+        self._write_entry("META-INF/container.xml", EPUB_CONTAINER_XML)
+        self._toc.append(("title", title, False))
+        body = f"<h1>{escape(title)}</h1>\n<p>类型: {escape(genre or '未知')}</p>"
+        return self._document("title", title, body)
+
+    def volume(self, title):
+        doc_id = f"v{len(self._toc)}"
+        self._toc.append((doc_id, title, True))
+        return self._document(doc_id, title, f"<h1>{escape(title)}</h1>")
+
+    def chapter(self, title, content):
+        doc_id = f"c{len(self._toc)}"
+        self._toc.append((doc_id, title, False))
+        paragraphs = "\n".join(f"<p>{escape(p)}</p>" for p in _paragraphs(content))
+        return self._document(doc_id, title, f"<h2>{escape(title)}</h2>\n{paragraphs}")
+
+    def finish(self):
+        modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        manifest = "\n".join(
+            f'    <item id="{doc_id}" href="{doc_id}.xhtml" media-type="application/xhtml+xml"/>'
+            for doc_id, _, _ in self._toc
+        )
+        spine = "\n".join(f'    <itemref idref="{doc_id}"/>' for doc_id, _, _ in self._toc)
+        self._write_entry("OEBPS/content.opf", f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="zh-CN">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="book-id">urn:uuid:{uuid.uuid4()}</dc:identifier>
+    <dc:title>{escape(self._title)}</dc:title>
+    <dc:language>zh-CN</dc:language>
+    <meta property="dcterms:modified">{modified}</meta>
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+{manifest}
+  </manifest>
+  <spine>
+{spine}
+  </spine>
+</package>
+""")
+        entries = []
+        for doc_id, label, is_volume in self._toc[1:]:
+            link = f'<a href="{doc_id}.xhtml">{escape(label)}</a>'
+            entries.append(f"<li>{link}</li>" if not is_volume else f"<li><strong>{link}</strong></li>")
+        nav_body = '<nav epub:type="toc" id="toc">\n<h1>目录</h1>\n<ol>\n' + "\n".join(entries) + "\n</ol>\n</nav>"
+        self._write_entry("OEBPS/nav.xhtml", EPUB_XHTML_TEMPLATE.format(title="目录", body=nav_body))
+        return self._close()
+
+
+DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+  <Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+  <Default Extension="xml" ContentType="application/xml"/>
+  <Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+  <Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>
+"""
+
+DOCX_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>
+"""
+
+DOCX_DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>
+"""
+
+DOCX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+  <w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+  <w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/><w:pPr><w:jc w:val="center"/></w:pPr><w:rPr><w:b/><w:sz w:val="48"/></w:rPr></w:style>
+  <w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:pPr><w:pageBreakBefore/><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="36"/></w:rPr></w:style>
+  <w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="1"/></w:pPr><w:rPr><w:b/><w:sz w:val="28"/></w:rPr></w:style>
+</w:styles>
+"""
+
+DOCX_DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+DOCX_DOCUMENT_TAIL = "<w:sectPr/></w:body></w:document>"
+
+
+def _docx_paragraph(text: str, style: Optional[str] = None) -> str:
+    props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{props}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+class DocxWriter(_ZipExportWriter):
+    """WordprocessingML package whose word/document.xml entry stays open and is deflated as chapters arrive."""
+    extension = "docx"
+    media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+    def __init__(self):
+        super().__init__()
+        self._body = None
+
+    def _emit(self, xml: str) -> bytes:
+        self._body.write(xml.encode("utf-8"))
+        return self._sink.drain()
+
+    def start(self, title, genre):
+        self._write_entry("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        self._write_entry("_rels/.rels", DOCX_ROOT_RELS)
+        self._write_entry("word/_rels/document.xml.rels", DOCX_DOCUMENT_RELS)
+        self._write_entry("word/styles.xml", DOCX_STYLES)
+        self._body = self._zip.open("word/document.xml", mode="w")
+        return self._emit(
+            DOCX_DOCUMENT_HEAD
+            + _docx_paragraph(title, "Title")
+            + _docx_paragraph(f"类型: {genre or '未知'}")
+        )
+
+    def volume(self, title):
+        return self._emit(_docx_paragraph(title, "Heading1"))
+
+    def chapter(self, title, content):
+        body = "".join(_docx_paragraph(p) for p in _paragraphs(content))
+        return self._emit(_docx_paragraph(title, "Heading2") + body)
+
+    def finish(self):
+        self._body.write(DOCX_DOCUMENT_TAIL.encode("utf-8"))
+        self._body.close()
+        return self._close()
+
+
+EXPORT_WRITERS = {
+    "txt": TxtWriter,
+    "md": MarkdownWriter,
+    "epub": EpubWriter,
+    "docx": DocxWriter,
+}
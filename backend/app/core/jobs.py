@@ -0,0 +1,354 @@
+"""
+Durable background job engine.
+
+Jobs are rows in the `jobs` table. Every API process runs a small pool of
+asyncio workers that claim queued jobs with `SELECT ... FOR UPDATE SKIP LOCKED`,
+so any number of uvicorn workers can share the queue and nothing is lost on
+restart. Each job runs with its own database session, is retried with
+exponential backoff, and is requeued if its worker stops heart-beating.
+Finished jobs are deleted after JOB_TTL_HOURS. Every state change is pushed
+to the job's event bus channel for SSE subscribers.
+
+While a handler runs, a heartbeat renews the worker's lease every third of
+JOB_LEASE_SECONDS, so one long step (a slow LLM call) does not get the job
+requeued under a live worker. Updates from the worker only apply while it
+still holds the lease: a worker that lost it drops its result.
+
+Handlers are registered per job kind:
+
+    @job_handler("bible")
+    async def generate_bible(ctx: JobContext) -> Optional[dict]:
+        await ctx.progress(50, "halfway")
+        return {"created": 3}
+
+Periodic housekeeping that belongs to no user (e.g. snapshot pruning) is
+registered with `@maintenance_task(interval)` and run by every pool's
+maintenance loop; such tasks must tolerate running in several processes.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.events import event_bus
+from app.db.session import AsyncSessionLocal
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+CLAIM_LOCK_NAMESPACE = 7001  # First key of the per-user advisory lock that serializes claims
+
+
+def job_channel(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def job_event(job: Job) -> dict:
+    """Progress event body; `completed`/`error` keep the shape the bible status stream always had."""
+    return {
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "completed": job.status in FINISHED_STATUSES,
+        "error": job.error if job.status == JobStatus.FAILED else None,
+        "result": job.result,
+    }
+
+
+async def _update_and_publish(job_id: str, owner: Optional[str] = None, **values) -> bool:
+    """
+    Apply an update to one job and push its new state to subscribers. With
+    `owner`, only while that worker holds the job's lease. Returns whether
+    the job was updated.
+    """
+    stmt = update(Job).where(Job.id == job_id)
+    if owner is not None:
+        stmt = stmt.where(Job.locked_by == owner)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(stmt.values(**values).returning(Job))
+        job = result.scalars().first()
+        await db.commit()
+    if job is not None:
+        await event_bus.publish(job_channel(job_id), job_event(job))
+    return job is not None
+
+
+class JobContext:
+    """Handed to job handlers: the job's input plus a way to report progress."""
+
+    def __init__(self, job: Job):
+        self.job_id = job.id
+        self.user_id = job.user_id
+        self.project_id = job.project_id
+        self.payload = dict(job.payload or {})
+        self.attempt = job.attempts
+        self.worker_id = job.locked_by
+
+    async def progress(self, progress: int, message: Optional[str] = None) -> None:
+        """Persist progress; also renews the worker's lease on the job."""
+        values = {"progress": progress, "locked_at": func.now()}
+        if message is not None:
+            values["message"] = message
+        await _update_and_publish(self.job_id, owner=self.worker_id, **values)
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[dict]]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register an async handler for a job kind."""
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+MaintenanceTask = Callable[[], Awaitable[object]]
+MAINTENANCE_TASKS: List[Tuple[MaintenanceTask, float]] = []
+
+
+def maintenance_task(interval: float) -> Callable[[MaintenanceTask], MaintenanceTask]:
+    """Run a coroutine function from the maintenance loop at most every `interval` seconds."""
+    def decorator(func: MaintenanceTask) -> MaintenanceTask:
+        MAINTENANCE_TASKS.append((func, interval))
+        return func
+    return decorator
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    kind: str,
+    user_id: int,
+    payload: Optional[dict] = None,
+    project_id: Optional[int] = None,
+    max_attempts: Optional[int] = None,
+    message: Optional[str] = None,
+) -> Job:
+    job = Job(
+        id=str(uuid.uuid4()),
+        kind=kind,
+        user_id=user_id,
+        project_id=project_id,
+        payload=payload or {},
+        status=JobStatus.QUEUED,
+        progress=0,
+        message=message,
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def _claim_job(worker_id: str) -> Optional[Job]:
+    """
+    Lock and mark as running the oldest runnable job whose owner is under
+    the per-user limit. The count in the candidate query cannot see claims
+    other workers have not committed yet, so the limit is checked again
+    under a per-user advisory lock that is held until this claim commits.
+    """
+    running = aliased(Job)
+    running_for_user = (
+        select(func.count())
+        .select_from(running)
+        .where(running.user_id == Job.user_id, running.status == JobStatus.RUNNING)
+        .scalar_subquery()
+    )
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Job)
+            .where(
+                Job.status == JobStatus.QUEUED,
+                Job.run_after <= func.now(),
+                running_for_user < settings.JOB_MAX_PER_USER,
+            )
+            .order_by(Job.run_after, Job.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = result.scalars().first()
+        if not job:
+            return None
+        await db.execute(select(func.pg_advisory_xact_lock(CLAIM_LOCK_NAMESPACE, job.user_id)))
+        running_now = (await db.execute(
+            select(func.count()).select_from(Job)
+            .where(Job.user_id == job.user_id, Job.status == JobStatus.RUNNING)
+        )).scalar()
+        if running_now >= settings.JOB_MAX_PER_USER:
+            await db.rollback()  # Another worker claimed one of this user's jobs meanwhile
+            return None
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_at = datetime.now(timezone.utc)
+        await db.commit()
+    await event_bus.publish(job_channel(job.id), job_event(job))
+    return job
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1)))
+
+
+async def _finish(job: Job, result: Optional[dict]) -> None:
+    finished = await _update_and_publish(
+        job.id, owner=job.locked_by,
+        status=JobStatus.SUCCEEDED, progress=100, result=result, error=None,
+        locked_by=None, locked_at=None, finished_at=func.now(),
+    )
+    if not finished:
+        logger.warning(f"Job {job.id} ({job.kind}) lost its lease before finishing; result dropped")
+
+
+async def _fail(job: Job, error: str) -> None:
+    """Requeue with backoff while attempts remain, otherwise mark the job failed."""
+    if job.attempts < job.max_attempts:
+        values = {
+            "status": JobStatus.QUEUED,
+            "run_after": datetime.now(timezone.utc) + _backoff(job.attempts),
+            "message": f"第 {job.attempts} 次尝试失败，稍后自动重试...",
+        }
+    else:
+        values = {"status": JobStatus.FAILED, "error": error, "finished_at": func.now()}
+    failed = await _update_and_publish(job.id, owner=job.locked_by, locked_by=None, locked_at=None, **values)
+    if not failed:
+        logger.warning(f"Job {job.id} ({job.kind}) lost its lease before failing; error dropped")
+
+
+async def _heartbeat(job: Job) -> None:
+    """Renew the job's lease until cancelled, so long handler steps are not mistaken for a dead worker."""
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(Job)
+                    .where(Job.id == job.id, Job.locked_by == job.locked_by)
+                    .values(locked_at=func.now())
+                )
+                await db.commit()
+        except Exception:
+            logger.exception(f"Failed to renew the lease of job {job.id}")
+            continue
+        if result.rowcount == 0:
+            logger.warning(f"Job {job.id} ({job.kind}) lost its lease")
+            return
+
+
+async def run_job(job: Job) -> None:
+    handler = JOB_HANDLERS.get(job.kind)
+    heartbeat = asyncio.create_task(_heartbeat(job))
+    try:
+        if handler is None:
+            raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+        result = await handler(JobContext(job))
+    except asyncio.CancelledError:
+        # Shutdown: leave the job running; its lease expires and another worker requeues it
+        raise
+    except Exception as e:
+        logger.exception(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed")
+        await _fail(job, str(e))
+        return
+    finally:
+        heartbeat.cancel()
+    await _finish(job, result)
+
+
+async def requeue_stale_jobs() -> int:
+    """
+    Return running jobs whose lease expired (worker died) to the queue, or fail them if out of attempts.
+    Not published: SSE streams re-read job state on every heartbeat.
+    """
+    lease_expired = func.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    async with AsyncSessionLocal() as db:
+        stale = Job.status == JobStatus.RUNNING, or_(Job.locked_at.is_(None), Job.locked_at < lease_expired)
+        failed = await db.execute(
+            update(Job)
+            .where(*stale, Job.attempts >= Job.max_attempts)
+            .values(status=JobStatus.FAILED, error="Job lease expired", locked_by=None, locked_at=None,
+                    finished_at=func.now())
+        )
+        requeued = await db.execute(
+            update(Job)
+            .where(*stale)
+            .values(status=JobStatus.QUEUED, run_after=func.now(), locked_by=None, locked_at=None)
+        )
+        await db.commit()
+        return failed.rowcount + requeued.rowcount
+
+
+async def delete_expired_jobs() -> int:
+    """TTL cleanup of finished jobs."""
+    cutoff = func.now() - timedelta(hours=settings.JOB_TTL_HOURS)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            delete(Job).where(Job.status.in_(FINISHED_STATUSES), Job.finished_at < cutoff)
+        )
+        await db.commit()
+        return result.rowcount
+
+
+class JobWorkerPool:
+    """Per-process pool of job workers plus a maintenance loop."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.name = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work(f"{self.name}:{n}")) for n in range(self.size)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+        logger.info(f"Job worker pool {self.name} started with {self.size} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await _claim_job(worker_id)
+            except Exception:
+                logger.exception("Failed to claim job")
+                job = None
+            if job is None:
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+            await run_job(job)
+
+    async def _maintain(self) -> None:
+        last_run: Dict[MaintenanceTask, float] = {}
+        while True:
+            try:
+                await requeue_stale_jobs()
+                await delete_expired_jobs()
+            except Exception:
+                logger.exception("Job maintenance failed")
+            for task, interval in MAINTENANCE_TASKS:
+                if time.monotonic() - last_run.get(task, float("-inf")) < interval:
+                    continue
+                last_run[task] = time.monotonic()
+                try:
+                    await task()
+                except Exception:
+                    logger.exception(f"Maintenance task {task.__name__} failed")
+            await asyncio.sleep(settings.JOB_MAINTENANCE_INTERVAL)
+
+
+worker_pool = JobWorkerPool(settings.JOB_WORKERS)
@@ -0,0 +1,290 @@
+"""
+Lore mention index: which chapters mention which lore items, and where.
+
+Each project gets an Aho-Corasick automaton over the names and aliases of
+its lore items (aliases come from `attributes["aliases"]`, `"alias"` or
+`"别名"`, as a list or a delimited string). One pass over a chapter finds
+every name at once, in time linear in the chapter length however many
+lore items the project has. Overlapping matches resolve leftmost-longest,
+so "张三丰" is not also counted as "张三"; Latin names only match on word
+boundaries.
+
+Saving a chapter rescans that chapter and writes only the rows that
+changed to `lore_mentions`, then recomputes `first_appearance_chapter_id`
+for the lore items that gained or lost the chapter. Changing lore names
+invalidates the whole index for the project, which the "lore_mentions" job
+rebuilds in the background.
+
+Automatons are cached per process, keyed by a signature of the project's
+lore (row count and newest change), so a rename anywhere is picked up on
+the next save without cross-process invalidation.
+"""
+import re
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import undefer
+
+from app.core.config import settings
+from app.core.jobs import enqueue_job
+from app.models.job import Job, JobStatus
+from app.models.lore import LoreItem, LoreMention
+from app.models.project import Chapter, Volume
+
+JOB_KIND = "lore_mentions"
+ALIAS_KEYS = ("aliases", "alias", "别名")
+_ALIAS_SPLIT = re.compile(r"[,，、/;；]")
+
+Mentions = Dict[int, Tuple[int, int]]  # lore_id -> (count, first_offset)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+def lore_patterns(name: Optional[str], attributes: Optional[dict]) -> List[str]:
+    """The name and aliases of a lore item, deduplicated, shortest-name filter applied."""
+    patterns = [name or ""]
+    for key in ALIAS_KEYS:
+        value = (attributes or {}).get(key) if isinstance(attributes, dict) else None
+        if isinstance(value, str):
+            patterns += _ALIAS_SPLIT.split(value)
+        elif isinstance(value, list):
+            patterns += [v for v in value if isinstance(v, str)]
+    seen = []
+    for pattern in (p.strip().lower() for p in patterns):
+        if len(pattern) >= settings.LORE_MENTION_MIN_LENGTH and pattern not in seen:
+            seen.append(pattern)
+    return seen
+
+
+class MentionMatcher:
+    """Aho-Corasick automaton mapping lowercased patterns to the lore ids they name."""
+
+    def __init__(self, patterns: Iterable[Tuple[int, str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Tuple[int, ...]]]] = [[]]  # (pattern length, lore ids)
+        owners: Dict[str, List[int]] = {}
+        for lore_id, pattern in patterns:
+            owners.setdefault(pattern, []).append(lore_id)
+        for pattern, lore_ids in owners.items():
+            self._add(pattern, tuple(lore_ids))
+        self._link()
+        self.size = len(owners)
+
+    def _add(self, pattern: str, lore_ids: Tuple[int, ...]) -> None:
+        node = 0
+        for ch in pattern:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        self._out[node].append((len(pattern), lore_ids))
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]  # Never the root's own children: they start in the queue with fail 0
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _matches(self, text: str) -> List[Tuple[int, int, Tuple[int, ...]]]:
+        """All (start, end, lore ids) occurrences, overlaps included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, lore_ids in out[node]:
+                found.append((i + 1 - length, i + 1, lore_ids))
+        return found
+
+    def scan(self, text: str) -> Mentions:
+        if not text or not self.size:
+            return {}
+        lowered = text.lower()
+        if len(lowered) != len(text):  # A few characters lowercase to two; keep offsets exact instead
+            lowered = text
+        mentions: Mentions = {}
+        end_of_last = 0
+        for start, end, lore_ids in sorted(self._matches(lowered), key=lambda m: (m[0], -m[1])):
+            if start < end_of_last:
+                continue
+            if _is_word_char(lowered[start]) and start > 0 and _is_word_char(lowered[start - 1]):
+                continue
+            if _is_word_char(lowered[end - 1]) and end < len(lowered) and _is_word_char(lowered[end]):
+                continue
+            end_of_last = end
+            for lore_id in lore_ids:
+                count, first = mentions.get(lore_id, (0, start))
+                mentions[lore_id] = (count + 1, first)
+        return mentions
+
+
+_matchers: "OrderedDict[int, Tuple[tuple, MentionMatcher]]" = OrderedDict()
+
+
+async def get_matcher(db: AsyncSession, project_id: int) -> MentionMatcher:
+    """The project's automaton, rebuilt only when its lore changed since it was cached."""
+    signature = tuple((await db.execute(
+        select(func.count(), func.max(func.coalesce(LoreItem.updated_at, LoreItem.created_at)))
+        .where(LoreItem.project_id == project_id)
+    )).one())
+    cached = _matchers.get(project_id)
+    if cached and cached[0] == signature:
+        _matchers.move_to_end(project_id)
+        return cached[1]
+    rows = (await db.execute(
+        select(LoreItem.id, LoreItem.name, LoreItem.attributes).where(LoreItem.project_id == project_id)
+    )).all()
+    matcher = MentionMatcher(
+        (row.id, pattern) for row in rows for pattern in lore_patterns(row.name, row.attributes)
+    )
+    _matchers[project_id] = (signature, matcher)
+    _matchers.move_to_end(project_id)
+    while len(_matchers) > settings.LORE_MATCHER_CACHE_SIZE:
+        _matchers.popitem(last=False)
+    return matcher
+
+
+async def refresh_first_appearances(
+    db: AsyncSession, project_id: int, lore_ids: Optional[Iterable[int]] = None
+) -> int:
+    """
+    Point each lore item's first appearance at its earliest mentioning
+    chapter in reading order. Items without mentions keep their value, so
+    a hand-picked first appearance survives. The caller commits.
+    """
+    earliest = (
+        select(LoreMention.lore_id, LoreMention.chapter_id)
+        .join(Chapter, Chapter.id == LoreMention.chapter_id)
+        .join(Volume, Volume.id == Chapter.volume_id)
+        .where(LoreMention.project_id == project_id)
+    )
+    if lore_ids is not None:
+        lore_ids = list(lore_ids)
+        if not lore_ids:
+            return 0
+        earliest = earliest.where(LoreMention.lore_id.in_(lore_ids))
+    earliest = (
+        earliest.distinct(LoreMention.lore_id)
+        .order_by(LoreMention.lore_id, Volume.order_no, Chapter.order_no, Chapter.id)
+        .subquery()
+    )
+    result = await db.execute(
+        update(LoreItem)
+        .where(
+            LoreItem.id == earliest.c.lore_id,
+            LoreItem.first_appearance_chapter_id.is_distinct_from(earliest.c.chapter_id),
+        )
+        # Not an edit of the lore itself: keep updated_at, which also keeps cached matchers valid
+        .values(first_appearance_chapter_id=earliest.c.chapter_id, updated_at=LoreItem.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def _chapter_mentions(db: AsyncSession, chapter_id: int) -> Mentions:
+    return {
+        row.lore_id: (row.count, row.first_offset)
+        for row in await db.execute(
+            select(LoreMention.lore_id, LoreMention.count, LoreMention.first_offset)
+            .where(LoreMention.chapter_id == chapter_id)
+        )
+    }
+
+
+async def _write_mentions(
+    db: AsyncSession, project_id: int, chapter_id: int, found: Mentions, existing: Mentions
+) -> None:
+    stale = [lore_id for lore_id in existing if lore_id not in found]
+    if stale:
+        await db.execute(
+            delete(LoreMention)
+            .where(LoreMention.chapter_id == chapter_id, LoreMention.lore_id.in_(stale))
+            .execution_options(synchronize_session=False)
+        )
+        # An automatic first appearance that no longer holds; refreshed below if mentioned elsewhere
+        await db.execute(
+            update(LoreItem)
+            .where(LoreItem.id.in_(stale), LoreItem.first_appearance_chapter_id == chapter_id)
+            .values(first_appearance_chapter_id=None, updated_at=LoreItem.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    changed = [
+        {"lore_id": lore_id, "chapter_id": chapter_id, "project_id": project_id, "count": count, "first_offset": first}
+        for lore_id, (count, first) in found.items()
+        if existing.get(lore_id) != (count, first)
+    ]
+    if changed:
+        stmt = insert(LoreMention).values(changed)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[LoreMention.lore_id, LoreMention.chapter_id],
+            set_={"count": stmt.excluded.count, "first_offset": stmt.excluded.first_offset},
+        ))
+
+
+async def update_chapter_mentions(
+    db: AsyncSession, project_id: int, chapter_id: int, text: Optional[str]
+) -> Mentions:
+    """
+    Rescan one chapter after a save (`text` None when it is being deleted)
+    and apply the difference to its mention rows. The caller commits.
+    """
+    found = (await get_matcher(db, project_id)).scan(text) if text else {}
+    existing = await _chapter_mentions(db, chapter_id)
+    await _write_mentions(db, project_id, chapter_id, found, existing)
+    # Only items that gained or lost this chapter can have a different first appearance
+    await refresh_first_appearances(db, project_id, set(found) ^ set(existing))
+    return found
+
+
+async def reindex_project_mentions(
+    db: AsyncSession, project_id: int, progress: Optional[Callable[[int, str], Awaitable[None]]] = None
+) -> dict:
+    """Rescan every chapter of the project, one transaction per chapter so a retry resumes cheaply."""
+    _matchers.pop(project_id, None)
+    matcher = await get_matcher(db, project_id)
+    chapter_ids = (await db.execute(
+        select(Chapter.id).where(Chapter.project_id == project_id).order_by(Chapter.id)
+    )).scalars().all()
+    mentions = 0
+    for i, chapter_id in enumerate(chapter_ids):
+        text = (await db.execute(
+            select(Chapter.content).options(undefer(Chapter.content)).where(Chapter.id == chapter_id)
+        )).scalar()
+        found = matcher.scan(text or "")
+        await _write_mentions(db, project_id, chapter_id, found, await _chapter_mentions(db, chapter_id))
+        await db.commit()
+        mentions += len(found)
+        if progress:
+            await progress(int(100 * (i + 1) / len(chapter_ids)), f"已索引 {i + 1}/{len(chapter_ids)} 章")
+    await refresh_first_appearances(db, project_id)
+    await db.commit()
+    return {"chapters": len(chapter_ids), "mentions": mentions}
+
+
+async def enqueue_mention_reindex(db: AsyncSession, project_id: int, user_id: int) -> Optional[Job]:
+    """Queue a project reindex unless one is already waiting, which will see the latest lore anyway."""
+    queued = (await db.execute(
+        select(Job.id).where(Job.kind == JOB_KIND, Job.project_id == project_id, Job.status == JobStatus.QUEUED)
+    )).first()
+    if queued:
+        return None
+    return await enqueue_job(db, JOB_KIND, user_id, project_id=project_id, message="等待索引...")
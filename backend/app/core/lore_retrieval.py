@@ -0,0 +1,206 @@
+"""
+Top-k lore retrieval shared by the AI prompt builders.
+
+Lore items are embedded into `lore_embeddings` (pgvector) when they are created
+or updated. Items still missing a vector for the configured model (older rows,
+a model change, a failed embedding call) are backfilled by the
+"lore_embeddings" job, which retrieval queues when it finds some; retrieval
+itself never waits for the embedding API beyond embedding the query, and ranks
+whatever vectors exist. Prompts then include only the k entries closest to the
+query text instead of the whole lore library. When no embedding model is
+configured, or nothing is embedded yet, entries are ranked by name matches instead.
+"""
+import hashlib
+import logging
+from typing import List, Optional, Sequence
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.ai_client import ai_client
+from app.core.config import settings
+from app.core.jobs import enqueue_job
+from app.db.session import AsyncSessionLocal
+from app.models.job import Job, JobStatus
+from app.models.lore import LoreItem, LoreEmbedding
+from app.models.project import Project
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "lore_embeddings"
+
+# Embedding inputs are truncated to keep requests within provider limits
+MAX_EMBED_CHARS = 4000
+EMBED_BATCH_SIZE = 64
+
+
+def lore_document(item: LoreItem) -> str:
+    """Text that represents a lore item for embedding."""
+    parts = [f"{item.name}（{item.category}）", item.description or "", item.content or ""]
+    return "\n".join(p for p in parts if p)[:MAX_EMBED_CHARS]
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+async def sync_lore_embeddings(items: Sequence[LoreItem]) -> None:
+    """
+    Embed the given lore items, skipping those whose text hash and model are unchanged.
+    Writes go through a dedicated session so the caller's transaction is never touched.
+    """
+    if not settings.AI_EMBEDDING_MODEL or not items:
+        return
+
+    async with AsyncSessionLocal() as db:
+        await _sync(db, items)
+
+
+async def _sync(db: AsyncSession, items: Sequence[LoreItem]) -> None:
+    result = await db.execute(
+        select(LoreEmbedding.lore_id, LoreEmbedding.content_hash, LoreEmbedding.model)
+        .where(LoreEmbedding.lore_id.in_([item.id for item in items]))
+    )
+    existing = {row.lore_id: (row.content_hash, row.model) for row in result}
+
+    pending = []
+    for item in items:
+        document = lore_document(item)
+        digest = _hash(document)
+        if existing.get(item.id) != (digest, settings.AI_EMBEDDING_MODEL):
+            pending.append((item, document, digest))
+
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        batch = pending[start:start + EMBED_BATCH_SIZE]
+        vectors = await ai_client.embed([document for _, document, _ in batch])
+        if not vectors:
+            return
+        rows = [
+            {
+                "lore_id": item.id,
+                "project_id": item.project_id,
+                "model": settings.AI_EMBEDDING_MODEL,
+                "content_hash": digest,
+                "embedding": vector,
+            }
+            for (item, _, digest), vector in zip(batch, vectors)
+        ]
+        stmt = insert(LoreEmbedding).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LoreEmbedding.lore_id],
+            set_={
+                "model": stmt.excluded.model,
+                "content_hash": stmt.excluded.content_hash,
+                "embedding": stmt.excluded.embedding,
+            },
+        )
+        await db.execute(stmt)
+        await db.commit()
+
+
+async def index_lore_item(item: LoreItem) -> None:
+    """Refresh one item's embedding after create/update. Failures only degrade retrieval, never the write."""
+    try:
+        await sync_lore_embeddings([item])
+    except Exception as e:
+        logger.error(f"Failed to index lore item {item.id}: {str(e)}")
+
+
+def _unembedded(project_id: int):
+    """Lore items of the project without a vector from the configured model."""
+    return (
+        select(LoreItem)
+        .outerjoin(LoreEmbedding, LoreEmbedding.lore_id == LoreItem.id)
+        .where(
+            LoreItem.project_id == project_id,
+            or_(LoreEmbedding.lore_id.is_(None), LoreEmbedding.model != settings.AI_EMBEDDING_MODEL),
+        )
+    )
+
+
+async def backfill_project_embeddings(project_id: int) -> dict:
+    """Embed every lore item of the project that has no current vector. Runs in the "lore_embeddings" job."""
+    async with AsyncSessionLocal() as db:
+        items = (await db.execute(_unembedded(project_id))).scalars().all()
+    await sync_lore_embeddings(items)
+    return {"items": len(items)}
+
+
+async def _queue_backfill(db: AsyncSession, project_id: int) -> None:
+    """Queue the backfill job if some item lacks a vector and no backfill is already pending or running."""
+    missing = (await db.execute(_unembedded(project_id).with_only_columns(LoreItem.id).limit(1))).first()
+    if not missing:
+        return
+    # Own session: enqueue_job commits, which must not end the caller's transaction
+    async with AsyncSessionLocal() as jobs_db:
+        pending = (await jobs_db.execute(
+            select(Job.id).where(
+                Job.kind == JOB_KIND, Job.project_id == project_id,
+                Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+            )
+        )).first()
+        if pending:
+            return
+        user_id = (await jobs_db.execute(select(Project.user_id).where(Project.id == project_id))).scalar()
+        if user_id is not None:
+            await enqueue_job(jobs_db, JOB_KIND, user_id, project_id=project_id, message="等待生成设定向量...")
+
+
+async def _retrieve_by_vector(db: AsyncSession, project_id: int, query: str, k: int) -> Optional[List[LoreItem]]:
+    vectors = await ai_client.embed([query[:MAX_EMBED_CHARS]])
+    if not vectors:
+        return None
+
+    # Savepoint: a failed vector query must not abort the caller's transaction
+    async with db.begin_nested():
+        await _queue_backfill(db, project_id)
+        result = await db.execute(
+            select(LoreItem)
+            .join(LoreEmbedding, LoreEmbedding.lore_id == LoreItem.id)
+            .where(LoreItem.project_id == project_id, LoreEmbedding.model == settings.AI_EMBEDDING_MODEL)
+            .order_by(LoreEmbedding.embedding.cosine_distance(vectors[0]))
+            .limit(k)
+        )
+        items = list(result.scalars().all())
+    # Nothing embedded yet (the backfill is still queued): name matching beats an empty context
+    return items or None
+
+
+async def _retrieve_by_name(db: AsyncSession, project_id: int, query: str, k: int) -> List[LoreItem]:
+    result = await db.execute(
+        select(LoreItem)
+        .where(LoreItem.project_id == project_id)
+        .order_by(LoreItem.id)
+    )
+    items = result.scalars().all()
+    # Items named in the query first (by mention count), then in creation order
+    ranked = sorted(items, key=lambda item: -query.count(item.name) if item.name else 0)
+    return ranked[:k]
+
+
+async def retrieve_lore(
+    db: AsyncSession, project_id: int, query: str, k: Optional[int] = None
+) -> List[LoreItem]:
+    """Return the k lore items most relevant to `query` for a project."""
+    k = k or settings.LORE_RETRIEVAL_TOP_K
+    if settings.AI_EMBEDDING_MODEL and query.strip():
+        try:
+            items = await _retrieve_by_vector(db, project_id, query, k)
+            if items is not None:
+                return items
+        except Exception as e:
+            logger.error(f"Vector lore retrieval failed, falling back to name matching: {str(e)}")
+    return await _retrieve_by_name(db, project_id, query, k)
+
+
+def format_lore_context(items: Sequence[LoreItem], detailed: bool = True, empty: str = "暂无设定库信息。") -> str:
+    """Render retrieved lore as prompt lines; `detailed` uses the full content instead of the one-line description."""
+    if not items:
+        return empty
+    lines = []
+    for item in items:
+        detail = (item.content or item.description) if detailed else (item.description or item.content)
+        lines.append(f"- {item.name} ({item.category}): {detail or ''}")
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+"""
+Authenticated principal resolution for get_current_user.
+
+Access tokens carry the user id (`uid`), a token id (`jti`) and a sub-second
+`iat`. The user row behind a token is cached for AUTH_PRINCIPAL_CACHE_TTL
+seconds (in-process, plus Redis when REDIS_URL is set), so most requests
+resolve their user without a database round trip. With AUTH_TRUST_TOKEN_CLAIMS the
+token's claims are trusted outright and the user table is never read (only with
+Redis, see below).
+
+Revocations live in their own store, never in the size-bounded principal
+cache, so no amount of login traffic can evict them: logout revokes one
+token by `jti`, and a password change rejects every token issued before it.
+Each marker is kept until the tokens it rejects would have expired anyway.
+With Redis they are shared by all processes and survive restarts; a Redis
+error while checking one rejects the token (fails closed). Without Redis
+they are only seen by the process that wrote them and are lost on restart,
+so trusting token claims is refused and the user row is read instead.
+"""
+import json
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.cache import LRUResponseCache, RedisResponseCache, ResponseCache, TieredResponseCache
+from app.core.config import settings
+from app.models.user import User
+
+PRINCIPAL_PREFIX = "auth:principal:"
+REVOKED_TOKEN_PREFIX = "auth:revoked:"
+NOT_BEFORE_PREFIX = "auth:not-before:"
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationUnavailable(Exception):
+    """The shared revocation store could not be read."""
+
+
+class RevocationStore:
+    """
+    Revocation markers with per-entry expiry and no size bound: entries only
+    leave when they expire. Kept in-process, and in Redis when REDIS_URL is set.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._sweep_at = 1024  # Drop expired entries when the map grows past this
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+
+    @property
+    def durable(self) -> bool:
+        return self._redis is not None
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        self._entries = {key: entry for key, entry in self._entries.items() if entry[1] >= now}
+        self._sweep_at = max(1024, 2 * len(self._entries))
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] >= time.monotonic():
+            return entry[0]
+        if self._redis is None:
+            return None
+        try:
+            return await self._redis.get(key)
+        except Exception as e:
+            raise RevocationUnavailable(str(e)) from e
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+        if len(self._entries) > self._sweep_at:
+            self._sweep()
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, value, ex=ttl)
+            except Exception as e:
+                logger.error(f"Failed to share token revocation {key}; only this process rejects it: {str(e)}")
+
+
+def _build_cache() -> ResponseCache:
+    local = LRUResponseCache(settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES)
+    if settings.REDIS_URL:
+        return TieredResponseCache(local, RedisResponseCache(settings.REDIS_URL), settings.AUTH_PRINCIPAL_CACHE_TTL)
+    return local
+
+
+auth_cache = _build_cache()
+revocations = RevocationStore(settings.REDIS_URL)
+
+# Trusted claims skip the user row, so revocation is the only check left; require it to be shared
+TRUST_TOKEN_CLAIMS = settings.AUTH_TRUST_TOKEN_CLAIMS and revocations.durable
+if settings.AUTH_TRUST_TOKEN_CLAIMS and not revocations.durable:
+    logger.warning("AUTH_TRUST_TOKEN_CLAIMS needs REDIS_URL for shared token revocation; reading the user table instead")
+
+
+def user_from_claims(payload: dict) -> User:
+    """Detached User built from token claims; only id/email/is_active are populated."""
+    return User(id=payload["uid"], email=payload.get("sub"), is_active=True)
+
+
+async def get_principal(user_id: int) -> Optional[User]:
+    cached = await auth_cache.get(f"{PRINCIPAL_PREFIX}{user_id}")
+    if cached is None:
+        return None
+    return User(**json.loads(cached))
+
+
+async def cache_principal(user: User) -> None:
+    principal = {"id": user.id, "email": user.email, "is_active": user.is_active}
+    await auth_cache.set(f"{PRINCIPAL_PREFIX}{user.id}", json.dumps(principal), settings.AUTH_PRINCIPAL_CACHE_TTL)
+
+
+async def invalidate_principal(user_id: int) -> None:
+    await auth_cache.delete(f"{PRINCIPAL_PREFIX}{user_id}")
+
+
+async def is_token_revoked(payload: dict) -> bool:
+    try:
+        jti = payload.get("jti")
+        if jti and await revocations.get(f"{REVOKED_TOKEN_PREFIX}{jti}"):
+            return True
+        user_id = payload.get("uid")
+        if user_id is not None:
+            not_before = await revocations.get(f"{NOT_BEFORE_PREFIX}{user_id}")
+            if not_before and payload.get("iat", 0) < float(not_before):
+                return True
+    except RevocationUnavailable as e:
+        logger.warning(f"Token revocation check failed, rejecting the token: {str(e)}")
+        return True
+    return False
+
+
+async def revoke_token(payload: dict) -> None:
+    """Reject this token (by jti) until it would have expired anyway."""
+    jti = payload.get("jti")
+    if not jti:
+        return
+    ttl = int(payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        await revocations.set(f"{REVOKED_TOKEN_PREFIX}{jti}", "1", ttl)
+
+
+async def revoke_user_tokens(user_id: int) -> None:
+    """Reject every token issued to the user before now, e.g. after a password change."""
+    ttl = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+    await revocations.set(f"{NOT_BEFORE_PREFIX}{user_id}", repr(time.time()), ttl)
+    await invalidate_principal(user_id)
@@ -0,0 +1,125 @@
+"""
+Token-budgeted prompt assembly.
+
+Templates in prompts.py are plain `str.format` templates. Each is parsed
+once (cached by template text) into literal parts and field names, and the
+token cost of its literal text is counted once.
+
+A prompt is built from fixed fields, inserted as they are, and sections,
+which share what is left of the budget. Sections are served in priority
+order (lower first); a section that does not fit is truncated on a sentence
+boundary, keeping its start, or its end with `keep_end` (text before the
+cursor). A `required` section that does not fit raises PromptTooLong
+instead, for input that is useless when cut, like the text to rewrite.
+
+The budget is AI_PROMPT_TOKEN_BUDGET, capped by the model's context window
+(AI_CONTEXT_TOKENS) minus the system prompt and the reserved output tokens.
+"""
+import string
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.tokens import count_tokens, truncate_to_tokens
+
+_formatter = string.Formatter()
+
+
+class PromptTooLong(ValueError):
+    """A required section does not fit in the prompt budget."""
+
+    def __init__(self, section: str, tokens: int, available: int):
+        super().__init__(f"Section '{section}' needs {tokens} tokens but only {available} are available")
+        self.section = section
+        self.tokens = tokens
+        self.available = available
+
+
+@dataclass
+class Section:
+    name: str
+    text: Optional[str]
+    priority: int = 0
+    max_tokens: Optional[int] = None
+    keep_end: bool = False
+    required: bool = False
+
+
+@dataclass
+class Prompt:
+    text: str
+    tokens: int
+    truncated: List[str] = field(default_factory=list)  # Names of the sections that were shortened
+
+
+class CompiledTemplate:
+    def __init__(self, template: str):
+        # (literal, field name, conversion, format spec) per replacement field
+        self.parts: List[Tuple[str, Optional[str], Optional[str], str]] = [
+            (literal, name, conversion, spec or "")
+            for literal, name, spec, conversion in _formatter.parse(template)
+        ]
+        self.fields = {name for _, name, _, _ in self.parts if name}
+        self._literal = "".join(literal for literal, _, _, _ in self.parts)
+
+    @property
+    def literal_tokens(self) -> int:
+        return _literal_tokens(self._literal)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        out = []
+        for literal, name, conversion, spec in self.parts:
+            out.append(literal)
+            if name is not None:
+                value = _formatter.convert_field(values[name], conversion)
+                out.append(_formatter.format_field(value, spec))
+        return "".join(out)
+
+
+@lru_cache(maxsize=None)
+def compile_template(template: str) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
+@lru_cache(maxsize=256)
+def _literal_tokens(literal: str) -> int:
+    return count_tokens(literal)
+
+
+def prompt_budget(system_role: str = "", max_output: int = 2000, budget: Optional[int] = None) -> int:
+    """Tokens available to the user prompt."""
+    window = settings.AI_CONTEXT_TOKENS - max_output - _literal_tokens(system_role)
+    return min(budget or settings.AI_PROMPT_TOKEN_BUDGET, window)
+
+
+def build_prompt(
+    template: str,
+    sections: List[Section] = (),
+    system_role: str = "",
+    max_output: int = 2000,
+    budget: Optional[int] = None,
+    **fields: Any,
+) -> Prompt:
+    """Fill `template` with `fields` as given and `sections` fitted into the remaining budget."""
+    compiled = compile_template(template)
+    available = prompt_budget(system_role, max_output, budget)
+    total = available
+    available -= compiled.literal_tokens + sum(count_tokens(str(value)) for value in fields.values())
+
+    values = dict(fields)
+    truncated = []
+    for section in sorted(sections, key=lambda s: s.priority):
+        text = section.text or ""
+        allowance = max(0, available if section.max_tokens is None else min(available, section.max_tokens))
+        tokens = count_tokens(text)
+        if tokens > allowance:
+            if section.required:
+                raise PromptTooLong(section.name, tokens, allowance)
+            text = truncate_to_tokens(text, allowance, keep_end=section.keep_end)
+            tokens = count_tokens(text)
+            truncated.append(section.name)
+        values[section.name] = text
+        available -= tokens
+
+    return Prompt(text=compiled.render(values), tokens=total - available, truncated=truncated)
@@ -8,6 +8,39 @@ SYSTEM_WRITING_ASSISTANT = """
 
 
 # Outline Generation (Sliding Window Chunk)
+OUTLINE_SKELETON_PROMPT = """
+分析以下作品信息，秉承网文创作规律，为全书规划 **{volume_count} 个分卷**的骨架。
+
+**作品信息:**
+- 标题: {title}
+- 类型: {genre}
+- 整体目标字数: {target_words}
+- 简介/核心构思: {description} (如果有)
+
+**设定库关联信息 (Lore Context):**
+{lore_context}
+
+**用户特别指令:**
+{instruction}
+
+**要求:**
+1. 恰好输出 {volume_count} 卷，序号从 1 开始连续编号。
+2. 每卷提供卷名和 2-3 句核心剧情走向 (arc)，包括本卷主要矛盾、高潮与卷尾钩子。
+3. 各卷之间剧情递进、境界/地图逐步升级，整体形成完整主线。
+4. 此步只规划分卷，不要列出章节。
+5. **注意：必须以完整的简体中文输出最终 JSON。不允许出现英文属性值！**
+
+**输出格式:**
+仅返回有效的 JSON。
+结构:
+{{
+  "volumes": [
+    {{ "order_no": 1, "title": "第X卷卷名", "arc": "本卷核心剧情走向" }},
+    ...
+  ]
+}}
+"""
+
 OUTLINE_GENERATION_PROMPT = """
 分析以下作品信息，秉承网文创作规律，严格**仅生成第 {target_volume_no} 卷**的大纲内容。
 
@@ -20,15 +53,18 @@ OUTLINE_GENERATION_PROMPT = """
 **设定库关联信息 (Lore Context):**
 {lore_context}
 
-**前文大纲摘要 (Previous Context):**
-{previous_context}
+**全书分卷骨架 (Skeleton):**
+{skeleton_context}
+
+**本卷定位:**
+第 {target_volume_no} 卷《{volume_title}》：{volume_arc}
 
 **用户特别指令:**
 {instruction}
 
 **要求:**
 1. 本次推演仅生出**1个“分卷” (Volume)**。
-2. 为该卷提供符合设定的标题，序号必须为 {target_volume_no}。
+2. 沿用骨架中的本卷卷名，序号必须为 {target_volume_no}；剧情须衔接前后卷，不得提前写出后续分卷的内容。
 3. 该卷内必须包含 10-15 个具有连贯剧情推进的关键章节。
 4. 为每一章提供标题和一句话剧情简介。
 5. 节奏必须紧凑：开篇抛出悬念/危机、中期破局、单卷卷尾必留钩子 (Hook)。
@@ -86,10 +122,19 @@ CONTINUE_WRITING_PROMPT = """
 - 当前章节: {chapter_title}
 - 前文内容: "{context}"
 
+**相关设定 (Lore Context):**
+{lore_context}
+
+**大纲 (Outline):**
+{outline_context}
+
+**前情提要 (Story So Far):**
+{summary_context}
+
 **任务:**
 根据前文内容继续续写故事。
 续写大约 500-800 字。
-保持与前文一致的基调、风格和角色语气。
+保持与前文一致的基调、风格和角色语气，且不得与相关设定相矛盾；剧情走向参照本章大纲。
 重点关注: {instruction} (如果有) 或自然地推进剧情发展。
 
 **输出:**
@@ -119,12 +164,15 @@ CONSISTENCY_CHECK_PROMPT = """
 **设定与大纲上下文:**
 {lore_context}
 
+**前情提要:**
+{summary_context}
+
 **章节内容:**
 {chapter_content}
 
 **要求:**
 1. 将章节内容与设定及大纲上下文进行对比分析。
-2. 识别具体的矛盾点（例如：角色外貌、性格、力量体系规则、剧情时间线等）。
+2. 识别具体的矛盾点（例如：角色外貌、性格、力量体系规则、剧情时间线、与前情的衔接等）。
 3. 忽略细微的文笔风格问题，仅关注叙事事实的冲突。
 4. 如果没有发现重大问题，请返回一个空列表。
 
@@ -188,3 +236,76 @@ BIBLE_INPUTS_GENERATION_PROMPT = """
   "power_system": "力量体系..."
 }}
 """
+
+# Bible generation job, one call per lore category
+BIBLE_CHARACTERS_PROMPT = """
+请为设定下的仙侠小说推演3个核心角色（包含主角与重要配角/反派）。
+主角设定：{protagonist}
+要求输出纯JSON格式列表，形如: {{"characters": [{{"name": "", "description": "", "content": ""}}]}}。注意：必须以完整的简体中文输出最终 JSON。不允许出现英文属性值！
+"""
+
+BIBLE_REALMS_PROMPT = """
+请根据力量体系设定：{power_system}，推演并衍生5个大境界等级详细说明与突破条件。
+要求输出纯JSON格式列表，形如: {{"realms": [{{"name": "", "description": "", "content": ""}}]}}。注意：必须以完整的简体中文输出最终 JSON。不允许出现英文属性值！
+"""
+
+BIBLE_ITEMS_PROMPT = """
+请根据金手指设定：{cheat}，推演并衍生出3个核心功法或气运法宝。
+要求输出纯JSON格式列表，形如: {{"items": [{{"name": "", "description": "", "content": ""}}]}}。注意：必须以完整的简体中文输出最终 JSON。不允许出现英文属性值！
+"""
+
+# Rolling summaries (chapter -> volume -> project)
+CHAPTER_SUMMARY_PROMPT = """
+为以下网文章节撰写剧情摘要，供后续章节续写与一致性校验参考。
+
+**作品:** {title}
+**章节:** {chapter_title}
+
+**章节内容:**
+{content}
+
+**要求:**
+1. 150 字以内，按时间顺序概括本章关键事件。
+2. 写明出场的主要角色、其状态变化（受伤、突破、获得物品等）以及新揭示的设定。
+3. 保留本章结尾的悬念或未解决的冲突。
+4. 只陈述事实，不做评价。
+
+**输出:**
+仅返回摘要正文。
+"""
+
+VOLUME_SUMMARY_PROMPT = """
+根据以下各章摘要，为网文分卷撰写卷梗概。
+
+**作品:** {title}
+**分卷:** {volume_title}
+
+**各章摘要 (按顺序):**
+{chapter_summaries}
+
+**要求:**
+1. 300 字以内，概括本卷主线进展、核心冲突及其结果。
+2. 写明主要角色在本卷结束时的处境与实力。
+3. 列出尚未回收的伏笔。
+
+**输出:**
+仅返回梗概正文。
+"""
+
+PROJECT_SYNOPSIS_PROMPT = """
+根据以下各卷梗概，为网文撰写全书梗概。
+
+**作品:** {title}
+**类型:** {genre}
+
+**各卷梗概 (按顺序):**
+{volume_summaries}
+
+**要求:**
+1. 500 字以内，概括迄今为止的主线剧情与世界观的展开。
+2. 写明主角当前的处境、实力和目标。
+3. 保留仍在推进的主要矛盾与伏笔。
+
+**输出:**
+仅返回梗概正文。
+"""
@@ -0,0 +1,28 @@
+"""
+Parsing of SNAPSHOT_RETENTION ("age:spacing" tiers, see snapshot_retention).
+Kept free of app imports so Settings can validate the spec when it loads.
+"""
+from typing import List, Tuple
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_duration(value: str) -> int:
+    """Seconds in "90s", "15m", "1h", "1d" or "2w"."""
+    value = value.strip().lower()
+    if value[-1:] not in _UNITS or not value[:-1].isdigit() or int(value[:-1]) <= 0:
+        raise ValueError(f"Invalid duration '{value}'")
+    return int(value[:-1]) * _UNITS[value[-1]]
+
+
+def parse_tiers(spec: str) -> List[Tuple[int, int]]:
+    """(max_age, spacing) pairs in seconds, youngest tier first; spacing 0 keeps every snapshot."""
+    tiers = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        age, sep, spacing = part.partition(":")
+        if not sep:
+            raise ValueError(f"Invalid retention tier '{part}', expected 'age:spacing'")
+        tiers.append((parse_duration(age), 0 if spacing.strip().lower() == "all" else parse_duration(spacing)))
+    if not tiers:
+        raise ValueError("SNAPSHOT_RETENTION needs at least one 'age:spacing' tier")
+    return sorted(tiers)
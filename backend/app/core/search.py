@@ -0,0 +1,133 @@
+"""
+Project-scoped full-text search over chapter content and lore.
+
+Matching is a case-insensitive substring search (ILIKE) backed by pg_trgm
+GIN indexes, which work on CJK text without a word segmenter: Postgres keeps
+them current on every write. Queries shorter than three characters cannot
+use trigrams and fall back to scanning the project's rows, which the
+project_id indexes keep bounded.
+
+Results are ranked by hit count. Hit counts, ranking, paging and the total
+are computed in one SQL statement; only the rows of the requested page are
+returned with their text, from which snippets with offsets are cut.
+"""
+from typing import List, Tuple
+
+from sqlalchemy import case, func, literal, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.lore import LoreItem
+from app.models.project import Chapter, Volume
+
+
+def like_pattern(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _hits(column, query: str):
+    """Occurrences of `query` in `column`, case-insensitive, computed in SQL."""
+    text = func.lower(func.coalesce(column, ""))
+    return (func.length(text) - func.length(func.replace(text, literal(query.lower()), ""))) // len(query)
+
+
+def find_snippets(text: str, query: str, limit: int, radius: int) -> List[dict]:
+    """
+    Up to `limit` snippets around occurrences of `query`. Each snippet has
+    its `offset` in the full text and `highlights`, [start, end] ranges of
+    the matches within the snippet. Overlapping windows are merged.
+    """
+    lowered, needle = text.lower(), query.lower()
+    snippets: List[dict] = []
+    pos = lowered.find(needle)
+    while pos >= 0:
+        start, end = max(0, pos - radius), min(len(text), pos + len(needle) + radius)
+        last = snippets[-1] if snippets else None
+        if last and start <= last["offset"] + len(last["text"]):
+            last["text"] = text[last["offset"]:max(end, last["offset"] + len(last["text"]))]
+            last["highlights"].append([pos - last["offset"], pos - last["offset"] + len(needle)])
+        elif len(snippets) == limit:
+            break
+        else:
+            snippets.append({"offset": start, "text": text[start:end], "highlights": [[pos - start, pos - start + len(needle)]]})
+        pos = lowered.find(needle, pos + len(needle))
+    return snippets
+
+
+async def search_chapters(
+    db: AsyncSession, project_id: int, query: str, offset: int, limit: int
+) -> Tuple[int, List[dict]]:
+    hits = _hits(Chapter.content, query).label("hits")
+    rows = (await db.execute(
+        select(
+            Chapter.id, Chapter.title, Chapter.volume_id, Chapter.order_no, Volume.order_no.label("volume_order_no"),
+            Chapter.content, hits, func.count().over().label("total"),
+        )
+        .join(Volume, Volume.id == Chapter.volume_id)
+        .where(Chapter.project_id == project_id, Chapter.content.ilike(like_pattern(query), escape="\\"))
+        .order_by(hits.desc(), Volume.order_no, Chapter.order_no, Chapter.id)
+        .offset(offset)
+        .limit(limit)
+    )).all()
+    results = [
+        {
+            "type": "chapter",
+            "id": row.id,
+            "title": row.title,
+            "volume_id": row.volume_id,
+            "volume_order_no": row.volume_order_no,
+            "order_no": row.order_no,
+            "hits": row.hits,
+            "snippets": find_snippets(
+                row.content or "", query, settings.SEARCH_SNIPPETS_PER_RESULT, settings.SEARCH_SNIPPET_RADIUS
+            ),
+        }
+        for row in rows
+    ]
+    return (rows[0].total if rows else 0), results
+
+
+async def search_lore(
+    db: AsyncSession, project_id: int, query: str, offset: int, limit: int
+) -> Tuple[int, List[dict]]:
+    pattern = like_pattern(query)
+    name_match = LoreItem.name.ilike(pattern, escape="\\")
+    hits = (_hits(LoreItem.name, query) + _hits(LoreItem.description, query) + _hits(LoreItem.content, query))
+    # A name match outranks any number of mentions in the description or body
+    rank = (case((name_match, 1000), else_=0) + hits).label("rank")
+    rows = (await db.execute(
+        select(
+            LoreItem.id, LoreItem.name, LoreItem.category, LoreItem.description, LoreItem.content,
+            hits.label("hits"), rank, func.count().over().label("total"),
+        )
+        .where(
+            LoreItem.project_id == project_id,
+            or_(
+                name_match,
+                LoreItem.description.ilike(pattern, escape="\\"),
+                LoreItem.content.ilike(pattern, escape="\\"),
+            ),
+        )
+        .order_by(rank.desc(), LoreItem.name, LoreItem.id)
+        .offset(offset)
+        .limit(limit)
+    )).all()
+    results = []
+    for row in rows:
+        snippets = []
+        for field in ("description", "content"):
+            for snippet in find_snippets(
+                getattr(row, field) or "", query, settings.SEARCH_SNIPPETS_PER_RESULT, settings.SEARCH_SNIPPET_RADIUS
+            ):
+                snippets.append({**snippet, "field": field})
+        results.append({
+            "type": "lore",
+            "id": row.id,
+            "title": row.name,
+            "category": row.category,
+            "hits": row.hits,
+            "snippets": snippets[:settings.SEARCH_SNIPPETS_PER_RESULT],
+        })
+    return (rows[0].total if rows else 0), results
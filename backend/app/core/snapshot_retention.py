@@ -0,0 +1,167 @@
+"""
+Snapshot retention and quotas.
+
+Auto snapshots are thinned by age following SNAPSHOT_RETENTION, a list of
+"age:spacing" tiers: with the default "1h:all,1d:1h,30d:1d" every auto
+snapshot of the last hour is kept, then the newest one per hour up to a
+day old, then the newest one per day up to 30 days; older auto snapshots
+are deleted. Slots are aligned to the epoch, so a snapshot kept once stays
+kept until it ages into the next tier. Manual snapshots are never pruned.
+
+Pruning runs from the job workers' maintenance loop every
+SNAPSHOT_PRUNE_INTERVAL seconds, SNAPSHOT_PRUNE_BATCH chapters per query
+and one transaction per chapter. Chapters locked by a concurrent save or
+another process's pruner are skipped until the next run.
+
+Per-chapter and per-user quotas are enforced when a snapshot is created:
+the oldest auto snapshots of the chapter make room, and the create is
+refused when only manual ones are left.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.jobs import maintenance_task
+from app.core.retention_spec import parse_tiers
+from app.core.snapshot_store import lock_chapter, rewrite_chain
+from app.db.session import AsyncSessionLocal
+from app.models.project import Chapter, Project
+from app.models.snapshot import ChapterSnapshot
+
+logger = logging.getLogger(__name__)
+
+AUTO = "auto"
+
+
+class SnapshotQuotaExceeded(Exception):
+    def __init__(self, usage: dict):
+        super().__init__("Snapshot quota reached")
+        self.usage = usage
+
+
+def expired_snapshot_ids(
+    snapshots: Iterable[Tuple[int, datetime, str]], now: datetime, tiers: List[Tuple[int, int]]
+) -> Set[int]:
+    """Ids of (id, created_at, snapshot_type) entries the tiers no longer keep."""
+    kept_slots: Set[Tuple[int, int]] = set()
+    expired: Set[int] = set()
+    for snapshot_id, created_at, snapshot_type in sorted(snapshots, key=lambda s: s[1], reverse=True):
+        if snapshot_type != AUTO:
+            continue
+        age = (now - created_at).total_seconds()
+        tier = next((i for i, (max_age, _) in enumerate(tiers) if age < max_age), None)
+        if tier is None:
+            expired.add(snapshot_id)
+            continue
+        spacing = tiers[tier][1]
+        if not spacing:
+            continue
+        slot = (tier, int(created_at.timestamp() // spacing))
+        if slot in kept_slots:  # Newest first, so the slot's newest snapshot is the one kept
+            expired.add(snapshot_id)
+        else:
+            kept_slots.add(slot)
+    return expired
+
+
+@maintenance_task(settings.SNAPSHOT_PRUNE_INTERVAL)
+async def prune_snapshots() -> int:
+    """Apply the retention tiers to every chapter with auto snapshots old enough to thin."""
+    tiers = parse_tiers(settings.SNAPSHOT_RETENTION)
+    now = datetime.now(timezone.utc)
+    # Snapshots inside a leading keep-everything tier can never expire, so their chapters are not scanned
+    untouchable = tiers[0][0] if tiers and tiers[0][1] == 0 else 0
+    deleted = 0
+    last_chapter_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            chapter_ids = (await db.execute(
+                select(ChapterSnapshot.chapter_id)
+                .where(
+                    ChapterSnapshot.snapshot_type == AUTO,
+                    ChapterSnapshot.created_at < now - timedelta(seconds=untouchable),
+                    ChapterSnapshot.chapter_id > last_chapter_id,
+                )
+                .distinct()
+                .order_by(ChapterSnapshot.chapter_id)
+                .limit(settings.SNAPSHOT_PRUNE_BATCH)
+            )).scalars().all()
+            if not chapter_ids:
+                break
+            last_chapter_id = chapter_ids[-1]
+
+            snapshots: Dict[int, list] = defaultdict(list)
+            for row in await db.execute(
+                select(ChapterSnapshot.chapter_id, ChapterSnapshot.id, ChapterSnapshot.created_at)
+                .where(ChapterSnapshot.chapter_id.in_(chapter_ids), ChapterSnapshot.snapshot_type == AUTO)
+            ):
+                snapshots[row.chapter_id].append((row.id, row.created_at, AUTO))
+            await db.rollback()  # End the read transaction before taking per-chapter locks
+
+            for chapter_id, chapter_snapshots in snapshots.items():
+                expired = expired_snapshot_ids(chapter_snapshots, now, tiers)
+                if not expired:
+                    continue
+                if not await lock_chapter(db, chapter_id, skip_locked=True):
+                    continue
+                stats = await rewrite_chain(db, chapter_id, drop_ids=expired)
+                await db.commit()
+                deleted += stats["deleted"]
+    if deleted:
+        logger.info(f"Pruned {deleted} auto snapshots")
+    return deleted
+
+
+def _limit(value: int) -> Optional[int]:
+    return value or None
+
+
+async def snapshot_usage(db: AsyncSession, chapter_id: int, user_id: int) -> dict:
+    chapter_count = (await db.execute(
+        select(func.count()).select_from(ChapterSnapshot).where(ChapterSnapshot.chapter_id == chapter_id)
+    )).scalar()
+    user_count = (await db.execute(
+        select(func.count())
+        .select_from(ChapterSnapshot)
+        .join(Chapter, Chapter.id == ChapterSnapshot.chapter_id)
+        .join(Project, Project.id == Chapter.project_id)
+        .where(Project.user_id == user_id)
+    )).scalar()
+    return {
+        "chapter_count": chapter_count,
+        "chapter_limit": _limit(settings.SNAPSHOT_MAX_PER_CHAPTER),
+        "user_count": user_count,
+        "user_limit": _limit(settings.SNAPSHOT_MAX_PER_USER),
+    }
+
+
+async def reserve_snapshot_slot(db: AsyncSession, chapter_id: int, user_id: int) -> None:
+    """
+    Make room for one more snapshot of the chapter, deleting its oldest auto
+    snapshots if a quota is full; raises SnapshotQuotaExceeded when only
+    manual snapshots are left. The caller commits.
+    """
+    await lock_chapter(db, chapter_id)
+    usage = await snapshot_usage(db, chapter_id, user_id)
+    over = 0  # Snapshots to delete so that one more fits under both quotas
+    if usage["chapter_limit"]:
+        over = max(over, usage["chapter_count"] + 1 - usage["chapter_limit"])
+    if usage["user_limit"]:
+        over = max(over, usage["user_count"] + 1 - usage["user_limit"])
+    if over <= 0:
+        return
+    oldest_auto = (await db.execute(
+        select(ChapterSnapshot.id)
+        .where(ChapterSnapshot.chapter_id == chapter_id, ChapterSnapshot.snapshot_type == AUTO)
+        .order_by(ChapterSnapshot.id)
+        .limit(over)
+    )).scalars().all()
+    if len(oldest_auto) < over:
+        raise SnapshotQuotaExceeded(usage)
+    await rewrite_chain(db, chapter_id, drop_ids=oldest_auto)
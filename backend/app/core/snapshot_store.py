@@ -0,0 +1,197 @@
+"""
+Delta-compressed snapshot storage.
+
+Each chapter's snapshots form one chain in creation order. A snapshot is
+stored either as a keyframe (the zlib-compressed text) or as a delta against
+the snapshot before it (`base_id`): the line ranges it shares with the base
+plus the new lines, also zlib-compressed. A keyframe is written every
+SNAPSHOT_KEYFRAME_INTERVAL snapshots, or sooner when the delta would not be
+much smaller, so reading any version applies at most that many deltas.
+
+Rows written before this format keep their text in the plain `content`
+column (storage "text"); the compaction job rewrites them into chains.
+"""
+import json
+import zlib
+from difflib import SequenceMatcher
+from typing import Collection, Dict, Optional, Tuple
+
+from sqlalchemy import delete, literal_column, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.text_windows import content_hash
+from app.models.project import Chapter
+from app.models.snapshot import ChapterSnapshot
+
+STORAGE_TEXT = "text"  # Legacy: uncompressed text in `content`
+STORAGE_KEYFRAME = "keyframe"
+STORAGE_DELTA = "delta"
+
+
+def encode_delta(base: str, text: str) -> bytes:
+    """Ops are [start, end] (copy base lines) or a string (new text), JSON-encoded and compressed."""
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, base_lines, lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def apply_delta(base: str, data: bytes) -> str:
+    base_lines = base.splitlines(keepends=True)
+    return "".join(
+        "".join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(zlib.decompress(data))
+    )
+
+
+def encode_keyframe(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+
+def _decode(storage: str, content: Optional[str], data: Optional[bytes], base: Optional[str]) -> str:
+    if storage == STORAGE_KEYFRAME:
+        return zlib.decompress(data).decode("utf-8")
+    if storage == STORAGE_DELTA:
+        return apply_delta(base or "", data)
+    return content or ""
+
+
+def _encode(base: Optional[str], base_depth: int, text: str) -> Tuple[str, bytes, int]:
+    """Pick keyframe or delta for `text`; returns (storage, data, chain_depth)."""
+    keyframe = encode_keyframe(text)
+    if base is None or base_depth + 1 >= settings.SNAPSHOT_KEYFRAME_INTERVAL:
+        return STORAGE_KEYFRAME, keyframe, 0
+    delta = encode_delta(base, text)
+    if len(delta) * 2 > len(keyframe):  # A keyframe costs little more and shortens the chain
+        return STORAGE_KEYFRAME, keyframe, 0
+    return STORAGE_DELTA, delta, base_depth + 1
+
+
+async def lock_chapter(db: AsyncSession, chapter_id: int, skip_locked: bool = False) -> bool:
+    """
+    Serialize chain changes per chapter: creates and rewrites both append to / edit
+    the same chain. With `skip_locked`, returns False instead of waiting.
+    """
+    result = await db.execute(
+        select(Chapter.id).where(Chapter.id == chapter_id).with_for_update(skip_locked=skip_locked)
+    )
+    return result.scalar() is not None
+
+
+async def snapshot_content(db: AsyncSession, snapshot_id: int) -> str:
+    """Reconstruct a snapshot's text: its chain back to a keyframe is read in one recursive query."""
+    S = ChapterSnapshot
+    chain = (
+        select(S.id, S.base_id, literal_column("0").label("hop"))
+        .where(S.id == snapshot_id)
+        .cte("chain", recursive=True)
+    )
+    chain = chain.union_all(select(S.id, S.base_id, chain.c.hop + 1).where(S.id == chain.c.base_id))
+    rows = (await db.execute(
+        select(S.storage, S.content, S.data).join(chain, chain.c.id == S.id).order_by(chain.c.hop.desc())
+    )).all()
+    text = None
+    for row in rows:
+        text = _decode(row.storage, row.content, row.data, text)
+    return text or ""
+
+
+async def store_snapshot(
+    db: AsyncSession,
+    chapter_id: int,
+    text: str,
+    word_count: int,
+    label: Optional[str] = None,
+    snapshot_type: str = "manual",
+) -> ChapterSnapshot:
+    """Append a snapshot to the chapter's chain; the caller commits."""
+    await lock_chapter(db, chapter_id)
+    latest = (await db.execute(
+        select(ChapterSnapshot.id, ChapterSnapshot.chain_depth)
+        .where(ChapterSnapshot.chapter_id == chapter_id)
+        .order_by(ChapterSnapshot.id.desc())
+        .limit(1)
+    )).first()
+    base = await snapshot_content(db, latest.id) if latest else None
+    storage, data, depth = _encode(base, latest.chain_depth if latest else 0, text)
+    snapshot = ChapterSnapshot(
+        chapter_id=chapter_id,
+        storage=storage,
+        data=data,
+        base_id=latest.id if storage == STORAGE_DELTA else None,
+        chain_depth=depth,
+        content_hash=content_hash(text),
+        word_count=word_count,
+        label=label,
+        snapshot_type=snapshot_type,
+    )
+    db.add(snapshot)
+    await db.flush()
+    return snapshot
+
+
+async def rewrite_chain(
+    db: AsyncSession, chapter_id: int, drop_ids: Collection[int] = (), reencode_all: bool = False
+) -> Dict[str, int]:
+    """
+    Delete `drop_ids` from the chapter's chain and re-encode the snapshots
+    that depended on them against their new predecessor. With `reencode_all`
+    every snapshot is rewritten (legacy rows become keyframes and deltas).
+    The caller commits.
+    """
+    await lock_chapter(db, chapter_id)
+    rows = (await db.execute(
+        select(
+            ChapterSnapshot.id, ChapterSnapshot.base_id, ChapterSnapshot.storage,
+            ChapterSnapshot.content, ChapterSnapshot.data, ChapterSnapshot.chain_depth,
+        )
+        .where(ChapterSnapshot.chapter_id == chapter_id)
+        .order_by(ChapterSnapshot.id)
+    )).all()
+
+    drop_ids = set(drop_ids)
+    texts: Dict[int, str] = {}
+    previous: Optional[Tuple[int, str, int]] = None  # (id, text, chain_depth) of the last kept snapshot
+    rewritten = 0
+    for row in rows:
+        text = _decode(row.storage, row.content, row.data, texts.get(row.base_id))
+        texts[row.id] = text
+        if row.id in drop_ids:
+            continue
+        base_dropped = row.base_id is not None and row.base_id in drop_ids
+        if reencode_all or base_dropped:
+            storage, data, depth = _encode(previous[1] if previous else None, previous[2] if previous else 0, text)
+            await db.execute(
+                update(ChapterSnapshot)
+                .where(ChapterSnapshot.id == row.id)
+                .values(
+                    storage=storage,
+                    data=data,
+                    content=None,
+                    base_id=previous[0] if storage == STORAGE_DELTA else None,
+                    chain_depth=depth,
+                    content_hash=content_hash(text),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            rewritten += 1
+            previous = (row.id, text, depth)
+        else:
+            previous = (row.id, text, row.chain_depth)
+
+    deleted = 0
+    if drop_ids:
+        result = await db.execute(
+            delete(ChapterSnapshot)
+            .where(ChapterSnapshot.chapter_id == chapter_id, ChapterSnapshot.id.in_(drop_ids))
+            .execution_options(synchronize_session=False)
+        )
+        deleted = result.rowcount
+    return {"rewritten": rewritten, "deleted": deleted}
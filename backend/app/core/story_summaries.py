@@ -0,0 +1,299 @@
+"""
+Hierarchical rolling summaries: chapter -> volume -> project synopsis.
+
+Each summary stores the hash of the text it was written from. A chapter
+summary comes from the chapter text, a volume summary from its chapter
+summaries in reading order, the synopsis from the volume summaries, so an
+edit only regenerates the levels whose input actually changed.
+
+Regeneration is lazy and runs in the "summaries" job. Prompt builders call
+`ensure_summaries`, a single indexed query that queues the job when some
+chapter changed after its summary was written; the job then compares
+hashes and calls the LLM only for real changes. Deleting a chapter or
+volume changes no remaining chapter, so the delete endpoints queue the job
+themselves (`refresh_after_removal`) for the volume summaries and synopsis
+that still describe it. Chapters still being
+edited (changed within SUMMARY_SETTLE_SECONDS) or too short to summarize
+(under SUMMARY_MIN_WORDS) are left for a later run.
+
+`summary_context` is the cheap read side: the synopsis, the current
+volume's summary and the last SUMMARY_CONTEXT_CHAPTERS chapter summaries
+before the current chapter, whatever their age.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import undefer
+
+from app.core.ai_client import ai_client
+from app.core.config import settings
+from app.core.jobs import enqueue_job
+from app.core.prompt_builder import Section, build_prompt
+from app.core.prompts import (
+    CHAPTER_SUMMARY_PROMPT, PROJECT_SYNOPSIS_PROMPT, SYSTEM_WRITING_ASSISTANT, VOLUME_SUMMARY_PROMPT,
+)
+from app.core.text_windows import content_hash
+from app.models.job import Job, JobStatus
+from app.models.project import Chapter, Project, Volume
+from app.models.summary import StorySummary
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "summaries"
+CHAPTER = "chapter"
+VOLUME = "volume"
+PROJECT = "project"
+
+# Unique index (and its predicate) that identifies the row of each level, for upserts. The
+# predicate is inlined: Postgres cannot match a partial index against a bound parameter.
+_CONFLICT = {
+    CHAPTER: ("chapter_id", text(f"level = '{CHAPTER}'")),
+    VOLUME: ("volume_id", text(f"level = '{VOLUME}'")),
+    PROJECT: ("project_id", text(f"level = '{PROJECT}'")),
+}
+
+
+def _changed_at(model):
+    return func.coalesce(model.updated_at, model.created_at)
+
+
+def _pending_chapters(project_id: int, settled_before: datetime):
+    """Chapters long enough to summarize, no longer being edited, and changed since their summary."""
+    return (
+        select(Chapter.id)
+        .outerjoin(StorySummary, and_(StorySummary.chapter_id == Chapter.id, StorySummary.level == CHAPTER))
+        .where(
+            Chapter.project_id == project_id,
+            Chapter.word_count >= settings.SUMMARY_MIN_WORDS,
+            _changed_at(Chapter) <= settled_before,
+            (StorySummary.id.is_(None)) | (_changed_at(Chapter) > StorySummary.updated_at),
+        )
+    )
+
+
+async def _upsert(db: AsyncSession, project_id: int, level: str, source_hash: str, content: str, **ids) -> None:
+    column, where = _CONFLICT[level]
+    stmt = insert(StorySummary).values(
+        project_id=project_id, level=level, source_hash=source_hash, content=content, **ids
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[column],
+        index_where=where,
+        set_={"source_hash": stmt.excluded.source_hash, "content": stmt.excluded.content, "updated_at": func.now()},
+    ))
+
+
+async def _summarize(template: str, sections: List[Section], **fields) -> Optional[str]:
+    prompt = build_prompt(
+        template, sections, system_role=SYSTEM_WRITING_ASSISTANT, max_output=settings.SUMMARY_MAX_TOKENS, **fields
+    )
+    response = await ai_client.generate_response(
+        prompt=prompt.text,
+        system_role=SYSTEM_WRITING_ASSISTANT,
+        temperature=0.3,
+        max_tokens=settings.SUMMARY_MAX_TOKENS,
+    )
+    return response.strip() if response else None
+
+
+async def _refresh_chapters(
+    db: AsyncSession, project: Project, progress: Optional[Callable[[int, str], Awaitable[None]]]
+) -> Dict[str, int]:
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=settings.SUMMARY_SETTLE_SECONDS)
+    chapter_ids = (await db.execute(
+        _pending_chapters(project.id, settled_before).order_by(Chapter.id)
+    )).scalars().all()
+    stats = {"chapters": 0, "unchanged": 0, "failed": 0}
+    for i, chapter_id in enumerate(chapter_ids):
+        chapter = (await db.execute(
+            select(Chapter).options(undefer(Chapter.content)).where(Chapter.id == chapter_id)
+        )).scalars().first()
+        if chapter is None:
+            continue
+        source_hash = content_hash(chapter.content or "")
+        existing = (await db.execute(
+            select(StorySummary).where(StorySummary.chapter_id == chapter.id, StorySummary.level == CHAPTER)
+        )).scalars().first()
+        if existing and existing.source_hash == source_hash:
+            # Touched but not changed (e.g. moved); mark as checked so it is not queued again
+            await db.execute(
+                update(StorySummary).where(StorySummary.id == existing.id).values(updated_at=func.now())
+            )
+            stats["unchanged"] += 1
+        else:
+            summary = await _summarize(
+                CHAPTER_SUMMARY_PROMPT,
+                [Section("content", chapter.content)],
+                title=project.title,
+                chapter_title=chapter.title,
+            )
+            if summary is None:
+                stats["failed"] += 1
+                continue
+            await _upsert(db, project.id, CHAPTER, source_hash, summary, chapter_id=chapter.id)
+            stats["chapters"] += 1
+        await db.commit()  # Per chapter, so a retried job resumes where it stopped
+        if progress:
+            await progress(int(80 * (i + 1) / len(chapter_ids)), f"已摘要 {i + 1}/{len(chapter_ids)} 章")
+    return stats
+
+
+async def _refresh_volumes(db: AsyncSession, project: Project) -> int:
+    rows = (await db.execute(
+        select(Volume.id, Volume.title, Chapter.title.label("chapter_title"), StorySummary.content)
+        .join(Chapter, Chapter.volume_id == Volume.id)
+        .join(StorySummary, and_(StorySummary.chapter_id == Chapter.id, StorySummary.level == CHAPTER))
+        .where(Volume.project_id == project.id)
+        .order_by(Volume.order_no, Chapter.order_no, Chapter.id)
+    )).all()
+    sources: Dict[int, list] = {}
+    titles: Dict[int, str] = {}
+    for row in rows:
+        sources.setdefault(row.id, []).append(f"《{row.chapter_title}》：{row.content}")
+        titles[row.id] = row.title
+    existing = dict((await db.execute(
+        select(StorySummary.volume_id, StorySummary.source_hash)
+        .where(StorySummary.project_id == project.id, StorySummary.level == VOLUME)
+    )).all())
+
+    emptied = [volume_id for volume_id in existing if volume_id not in sources]
+    if emptied:  # Every summarized chapter of these volumes was deleted
+        await db.execute(
+            delete(StorySummary).where(StorySummary.level == VOLUME, StorySummary.volume_id.in_(emptied))
+        )
+        await db.commit()
+
+    refreshed = 0
+    for volume_id, lines in sources.items():
+        source = "\n".join(lines)
+        source_hash = content_hash(source)
+        if existing.get(volume_id) == source_hash:
+            continue
+        summary = await _summarize(
+            VOLUME_SUMMARY_PROMPT,
+            [Section("chapter_summaries", source)],
+            title=project.title,
+            volume_title=titles[volume_id],
+        )
+        if summary is None:
+            continue
+        await _upsert(db, project.id, VOLUME, source_hash, summary, volume_id=volume_id)
+        await db.commit()
+        refreshed += 1
+    return refreshed
+
+
+async def _refresh_synopsis(db: AsyncSession, project: Project) -> int:
+    rows = (await db.execute(
+        select(Volume.title, StorySummary.content)
+        .join(StorySummary, and_(StorySummary.volume_id == Volume.id, StorySummary.level == VOLUME))
+        .where(Volume.project_id == project.id)
+        .order_by(Volume.order_no, Volume.id)
+    )).all()
+    if not rows:
+        return 0
+    source = "\n".join(f"《{row.title}》：{row.content}" for row in rows)
+    source_hash = content_hash(source)
+    existing = (await db.execute(
+        select(StorySummary.source_hash).where(StorySummary.project_id == project.id, StorySummary.level == PROJECT)
+    )).scalar()
+    if existing == source_hash:
+        return 0
+    summary = await _summarize(
+        PROJECT_SYNOPSIS_PROMPT,
+        [Section("volume_summaries", source)],
+        title=project.title,
+        genre=project.genre,
+    )
+    if summary is None:
+        return 0
+    await _upsert(db, project.id, PROJECT, source_hash, summary)
+    await db.commit()
+    return 1
+
+
+async def refresh_project_summaries(
+    db: AsyncSession, project_id: int, progress: Optional[Callable[[int, str], Awaitable[None]]] = None
+) -> dict:
+    """Bring every level of the project's summaries up to date, bottom-up."""
+    project = await db.get(Project, project_id)
+    if project is None:
+        return {}
+    stats = await _refresh_chapters(db, project, progress)
+    if progress:
+        await progress(85, "正在汇总分卷梗概...")
+    stats["volumes"] = await _refresh_volumes(db, project)
+    if progress:
+        await progress(95, "正在汇总全书梗概...")
+    stats["synopsis"] = await _refresh_synopsis(db, project)
+    return stats
+
+
+async def enqueue_summary_refresh(db: AsyncSession, project_id: int, user_id: int) -> Optional[Job]:
+    """Queue a refresh unless one is already waiting."""
+    queued = (await db.execute(
+        select(Job.id).where(Job.kind == JOB_KIND, Job.project_id == project_id, Job.status == JobStatus.QUEUED)
+    )).first()
+    if queued:
+        return None
+    return await enqueue_job(db, JOB_KIND, user_id, project_id=project_id, message="等待生成摘要...")
+
+
+async def ensure_summaries(db: AsyncSession, project_id: int, user_id: int) -> None:
+    """Queue a refresh if any settled chapter changed since it was summarized. Commits when it queues."""
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=settings.SUMMARY_SETTLE_SECONDS)
+    pending = (await db.execute(_pending_chapters(project_id, settled_before).limit(1))).first()
+    if pending:
+        await enqueue_summary_refresh(db, project_id, user_id)
+
+
+async def refresh_after_removal(db: AsyncSession, project_id: int, user_id: int) -> None:
+    """
+    Queue a refresh after chapters were deleted, if the project has volume
+    or synopsis summaries that may still describe them. Call after committing
+    the delete; commits when it queues.
+    """
+    rolled_up = (await db.execute(
+        select(StorySummary.id).where(StorySummary.project_id == project_id, StorySummary.level != CHAPTER).limit(1)
+    )).first()
+    if rolled_up:
+        await enqueue_summary_refresh(db, project_id, user_id)
+
+
+async def summary_context(db: AsyncSession, chapter: Chapter) -> str:
+    """Synopsis, current volume summary and the summaries of the chapters just before `chapter`."""
+    volume_order = (await db.execute(select(Volume.order_no).where(Volume.id == chapter.volume_id))).scalar()
+    summaries = (await db.execute(
+        select(StorySummary.level, StorySummary.content)
+        .where(
+            StorySummary.project_id == chapter.project_id,
+            (StorySummary.level == PROJECT)
+            | ((StorySummary.level == VOLUME) & (StorySummary.volume_id == chapter.volume_id)),
+        )
+    )).all()
+    by_level = {row.level: row.content for row in summaries}
+    previous = (await db.execute(
+        select(Chapter.title, StorySummary.content)
+        .join(Volume, Volume.id == Chapter.volume_id)
+        .join(StorySummary, and_(StorySummary.chapter_id == Chapter.id, StorySummary.level == CHAPTER))
+        .where(
+            Chapter.project_id == chapter.project_id,
+            tuple_(Volume.order_no, Chapter.order_no) < tuple_(volume_order, chapter.order_no),
+        )
+        .order_by(Volume.order_no.desc(), Chapter.order_no.desc())
+        .limit(settings.SUMMARY_CONTEXT_CHAPTERS)
+    )).all()
+
+    parts = []
+    if PROJECT in by_level:
+        parts.append(f"全书梗概：{by_level[PROJECT]}")
+    if VOLUME in by_level:
+        parts.append(f"本卷梗概：{by_level[VOLUME]}")
+    if previous:
+        parts.append("前情提要：\n" + "\n".join(f"- 《{row.title}》：{row.content}" for row in reversed(previous)))
+    return "\n".join(parts)
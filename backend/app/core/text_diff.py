@@ -0,0 +1,124 @@
+"""
+Server-side text diffs for snapshot comparison.
+
+Texts are diffed line by line (a line is a paragraph in the editor) and
+grouped into hunks with `context` unchanged lines around each change, like
+a unified diff. With character granularity, changed lines that pair up are
+refined into character runs, so a one-word edit in a long paragraph is sent
+as that word rather than two copies of the paragraph.
+
+A hunk is {"a": [start, count], "b": [start, count], "lines": [...]} with
+0-based line numbers. Each line is [tag, text] where tag is " " (context),
+"-" (only in a) or "+" (only in b), or ["~", runs] for a changed line whose
+runs are [op, text] with op "=", "-" or "+".
+
+Matching is quadratic in the worst case (a fully rewritten chapter), so a
+cache miss runs on a small dedicated thread pool (SNAPSHOT_DIFF_WORKERS)
+rather than on the event loop. When the two texts together exceed
+SNAPSHOT_DIFF_MAX_CHARS, character refinement is skipped and the result is
+line-level only, flagged `too_large`.
+
+Results depend only on the two texts, so they are cached by content hash
+pair (in-process, plus Redis when REDIS_URL is set).
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app.core.cache import LRUResponseCache, RedisResponseCache, ResponseCache, TieredResponseCache
+from app.core.config import settings
+
+CACHE_PREFIX = "diff:"
+CHAR_DIFF_MAX_LINE = 5000  # Longer changed lines are sent whole; char matching is quadratic
+
+
+def _build_cache() -> ResponseCache:
+    local = LRUResponseCache(settings.SNAPSHOT_DIFF_CACHE_MAX_ENTRIES)
+    if settings.REDIS_URL:
+        return TieredResponseCache(local, RedisResponseCache(settings.REDIS_URL), settings.SNAPSHOT_DIFF_CACHE_TTL)
+    return local
+
+
+diff_cache = _build_cache()
+_executor = ThreadPoolExecutor(max_workers=settings.SNAPSHOT_DIFF_WORKERS, thread_name_prefix="text-diff")
+
+
+def _char_runs(a: str, b: str) -> list:
+    runs = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            runs.append(["=", a[i1:i2]])
+            continue
+        if i2 > i1:
+            runs.append(["-", a[i1:i2]])
+        if j2 > j1:
+            runs.append(["+", b[j1:j2]])
+    return runs
+
+
+def _changed_lines(a_lines: List[str], b_lines: List[str], char_level: bool) -> list:
+    lines = []
+    paired = min(len(a_lines), len(b_lines)) if char_level else 0
+    for a, b in zip(a_lines[:paired], b_lines[:paired]):
+        if len(a) > CHAR_DIFF_MAX_LINE or len(b) > CHAR_DIFF_MAX_LINE:
+            lines += [["-", a], ["+", b]]
+        else:
+            lines.append(["~", _char_runs(a, b)])
+    lines += [["-", line] for line in a_lines[paired:]]
+    lines += [["+", line] for line in b_lines[paired:]]
+    return lines
+
+
+def diff_texts(a: str, b: str, context: int = 3, char_level: bool = True) -> dict:
+    """Hunks turning `a` into `b`, plus line totals. CPU-bound: call through `cached_diff`."""
+    too_large = len(a) + len(b) > settings.SNAPSHOT_DIFF_MAX_CHARS
+    char_level = char_level and not too_large
+    a_lines = a.splitlines()
+    b_lines = b.splitlines()
+    matcher = SequenceMatcher(None, a_lines, b_lines, autojunk=False)
+    hunks = []
+    added = deleted = 0
+    for group in matcher.get_grouped_opcodes(context):
+        lines = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                lines += [[" ", line] for line in a_lines[i1:i2]]
+                continue
+            deleted += i2 - i1
+            added += j2 - j1
+            if tag == "replace":
+                lines += _changed_lines(a_lines[i1:i2], b_lines[j1:j2], char_level)
+            elif tag == "delete":
+                lines += [["-", line] for line in a_lines[i1:i2]]
+            else:
+                lines += [["+", line] for line in b_lines[j1:j2]]
+        first, last = group[0], group[-1]
+        hunks.append({
+            "a": [first[1], last[2] - first[1]],
+            "b": [first[3], last[4] - first[3]],
+            "lines": lines,
+        })
+    return {
+        "hunks": hunks, "lines_added": added, "lines_deleted": deleted,
+        "granularity": "char" if char_level else "line", "too_large": too_large,
+    }
+
+
+async def cached_diff(
+    a_hash: str,
+    b_hash: str,
+    load: Callable[[], Awaitable[Tuple[str, str]]],
+    context: int = 3,
+    char_level: bool = True,
+) -> dict:
+    """Diff of two texts identified by content hash; `load` fetches them only on a cache miss."""
+    key = f"{CACHE_PREFIX}{a_hash}:{b_hash}:{context}:{'char' if char_level else 'line'}"
+    cached: Optional[str] = await diff_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    a, b = await load()
+    result = await asyncio.get_running_loop().run_in_executor(_executor, diff_texts, a, b, context, char_level)
+    await diff_cache.set(key, json.dumps(result, ensure_ascii=False), settings.SNAPSHOT_DIFF_CACHE_TTL)
+    return result
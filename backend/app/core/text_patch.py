@@ -0,0 +1,65 @@
+"""
+Text operations for delta saves.
+
+A patch is a list of (offset, delete, insert) operations applied in order;
+each offset refers to the text as left by the operations before it. Offsets
+and lengths are in UTF-16 code units, as the browser editor measures them
+(JavaScript string indices), and are converted to code points here: a
+character outside the BMP (emoji, CJK Extension B names) is two units but
+one Python character. Texts without such characters, nearly all of them,
+skip the conversion. An offset that falls inside a surrogate pair is
+rejected. Word counts are updated per operation with `count_delta`, so
+applying a patch costs O(size of the edits) beyond copying the string.
+"""
+import re
+from typing import Iterable, Tuple
+
+from app.core.word_count import WordCount, count_delta
+
+_ASTRAL = re.compile("[\U00010000-\U0010FFFF]")
+
+
+class PatchError(ValueError):
+    """An operation does not fit the text it is applied to."""
+
+
+def utf16_length(text: str) -> int:
+    return len(text) + len(_ASTRAL.findall(text))
+
+
+def _code_point_index(text: str, units: int) -> int:
+    """Python index of the UTF-16 offset `units` in `text`; -1 inside a surrogate pair or past the end."""
+    astral = 0
+    for match in _ASTRAL.finditer(text):
+        start = match.start() + astral  # In code units
+        if units <= start:
+            break
+        if units == start + 1:
+            return -1
+        astral += 1
+    index = units - astral
+    return index if index <= len(text) else -1
+
+
+def apply_ops(text: str, ops: Iterable[Tuple[int, int, str]]) -> Tuple[str, WordCount]:
+    """Apply (offset, delete, insert) operations in UTF-16 units; returns the new text and the word count change."""
+    delta = WordCount(0, 0, 0)
+    astral = _ASTRAL.search(text) is not None
+    for i, (offset, delete, insert) in enumerate(ops):
+        if offset < 0 or delete < 0:
+            raise PatchError(f"Operation {i} has a negative offset or length")
+        if astral:
+            start, end = _code_point_index(text, offset), _code_point_index(text, offset + delete)
+        else:
+            start, end = offset, offset + delete
+        if start < 0 or end < 0 or end > len(text):
+            raise PatchError(
+                f"Operation {i} (offset {offset}, delete {delete}) does not fit the text "
+                f"(length {utf16_length(text)} UTF-16 units) or splits a surrogate pair"
+            )
+        if not delete and not insert:
+            continue
+        delta += count_delta(text, start, end, insert)
+        text = text[:start] + insert + text[end:]
+        astral = astral or _ASTRAL.search(insert) is not None
+    return text, delta
@@ -0,0 +1,77 @@
+"""
+Split long chapter text into overlapping windows on paragraph boundaries.
+
+Offsets always refer to the original text, so results produced per window
+(e.g. quoted consistency issues) can be mapped back onto the full chapter.
+"""
+import hashlib
+from typing import List, NamedTuple, Tuple
+
+SENTENCE_ENDINGS = "。！？!?…；;\n"
+
+
+class TextWindow(NamedTuple):
+    start: int  # Offset of `text` within the original string
+    text: str
+
+
+def content_hash(text: str) -> str:
+    """sha256 hex digest of a piece of text, used to detect unchanged content."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_long_span(text: str, start: int, end: int, max_chars: int) -> List[Tuple[int, int]]:
+    """Cut a paragraph longer than max_chars, preferring sentence endings in the back half of each piece."""
+    pieces = []
+    while end - start > max_chars:
+        cut = start + max_chars
+        for pos in range(cut - 1, start + max_chars // 2, -1):
+            if text[pos] in SENTENCE_ENDINGS:
+                cut = pos + 1
+                break
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def paragraph_spans(text: str, max_chars: int = 0) -> List[Tuple[int, int]]:
+    """(start, end) offsets of every non-blank line; lines over max_chars (if set) are split further."""
+    spans = []
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped:
+            start = pos + line.index(stripped[0])
+            end = start + len(stripped)
+            if max_chars and end - start > max_chars:
+                spans.extend(_split_long_span(text, start, end, max_chars))
+            else:
+                spans.append((start, end))
+        pos += len(line)
+    return spans
+
+
+def split_windows(text: str, max_chars: int, overlap_chars: int = 0) -> List[TextWindow]:
+    """
+    Group paragraphs into windows of at most max_chars. Consecutive windows
+    repeat trailing paragraphs totalling at most overlap_chars, so an issue
+    spanning a boundary is still seen whole by one window.
+    """
+    spans = paragraph_spans(text, max_chars)
+    windows: List[TextWindow] = []
+    i = 0
+    while i < len(spans):
+        start = spans[i][0]
+        j = i
+        while j + 1 < len(spans) and spans[j + 1][1] - start <= max_chars:
+            j += 1
+        windows.append(TextWindow(start, text[start:spans[j][1]]))
+        if j == len(spans) - 1:
+            break
+        # Step back over paragraphs that fit in the overlap, but always make progress
+        k = j + 1
+        while k - 1 > i and spans[j][1] - spans[k - 1][0] <= overlap_chars:
+            k -= 1
+        i = k
+    return windows
@@ -0,0 +1,109 @@
+"""
+Prompt token counting and truncation.
+
+With AI_TOKENIZER set to a tiktoken encoding name (e.g. "cl100k_base") and
+the optional `tiktoken` package installed, tokens are counted exactly with
+that BPE. Otherwise ("approx", the default) they are estimated from the
+CJK-aware word count: AI_TOKENS_PER_CJK per Han / kana / hangul character
+and AI_TOKENS_PER_WORD per Latin word, which with the defaults matches the
+DeepSeek tokenizer's published ratios closely enough for budgeting.
+
+Truncation keeps whole sentences where it can: the cut moves back to the
+nearest sentence end unless that would drop more than half of what fits.
+"""
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Optional
+
+from app.core.config import settings
+from app.core.word_count import count_words
+
+try:
+    import tiktoken
+except ImportError:  # Optional: only needed for exact counts
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+APPROXIMATE = "approx"
+TOKENS_PER_PUNCTUATION = 1.0
+# A run of sentence-ending punctuation (or a line break) plus any closing quotes or brackets
+_SENTENCE_END = re.compile(r"(?:[。！？!?…；;]+|\.(?=\s)|\n)[”’」』\"')）\]】]*")
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    if name == APPROXIMATE:
+        return None
+    if tiktoken is None:
+        logger.warning(f"AI_TOKENIZER={name} needs the tiktoken package; falling back to estimates")
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Unknown tiktoken encoding {name}, falling back to estimates: {str(e)}")
+        return None
+
+
+def _approximate(text: str) -> int:
+    counts = count_words(text)
+    return math.ceil(
+        counts.cjk * settings.AI_TOKENS_PER_CJK
+        + counts.words * settings.AI_TOKENS_PER_WORD
+        + counts.punctuation * TOKENS_PER_PUNCTUATION
+    )
+
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(settings.AI_TOKENIZER)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _approximate(text)
+
+
+def _fitting_length(text: str, budget: int, keep_end: bool) -> int:
+    """Characters of `text` (from the start, or from the end with `keep_end`) that fit in `budget` tokens."""
+    encoding = _encoding(settings.AI_TOKENIZER)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        kept = tokens[-budget:] if keep_end else tokens[:budget]
+        # A partial character at the cut decodes to U+FFFD; drop it
+        return len(encoding.decode(kept).strip("�"))
+    lo, hi = 0, len(text)
+    while lo < hi:  # Binary search on length: estimates only grow with the text
+        mid = (lo + hi + 1) // 2
+        if _approximate(text[len(text) - mid:] if keep_end else text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def truncate_to_tokens(text: str, budget: int, keep_end: bool = False) -> str:
+    """
+    Shorten `text` to at most `budget` tokens, cutting at a sentence
+    boundary. Keeps the beginning, or with `keep_end` the end (for text
+    that leads up to where the model continues).
+    """
+    if count_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    length = _fitting_length(text, budget, keep_end)
+    if keep_end:
+        kept = text[len(text) - length:]
+        boundary = _SENTENCE_END.search(kept)
+        if boundary and boundary.end() <= length // 2:
+            kept = kept[boundary.end():]
+        return kept.lstrip()
+    kept = text[:length]
+    last = None
+    for last in _SENTENCE_END.finditer(kept):
+        pass
+    if last and last.end() >= length // 2:
+        kept = kept[:last.end()]
+    return kept.rstrip()
@@ -0,0 +1,45 @@
+"""
+Incremental writing statistics. Every change to a chapter's word count is
+folded into the `writing_activity` row for (user, project, UTC day) inside the
+caller's transaction, so the stats endpoint reads O(days) rows.
+
+Words that predate the rollup (the migration seed, word-count corrections)
+are recorded on BASELINE_DAY. They count towards total words but are not
+writing done on any day, so daily history and streaks skip that row.
+"""
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.activity import WritingActivity
+
+
+BASELINE_DAY = date(1970, 1, 1)
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def record_word_delta(
+    db: AsyncSession, user_id: int, project_id: int, delta: int, day: Optional[date] = None
+) -> None:
+    """Add a word-count change to today's rollup; the caller commits."""
+    if not delta:
+        return
+    added, deleted = (delta, 0) if delta > 0 else (0, -delta)
+    stmt = insert(WritingActivity).values(
+        user_id=user_id, project_id=project_id, day=day or utc_today(),
+        words_added=added, words_deleted=deleted,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WritingActivity.user_id, WritingActivity.project_id, WritingActivity.day],
+        set_={
+            "words_added": WritingActivity.words_added + stmt.excluded.words_added,
+            "words_deleted": WritingActivity.words_deleted + stmt.excluded.words_deleted,
+            "updated_at": datetime.now(timezone.utc),
+        },
+    )
+    await db.execute(stmt)
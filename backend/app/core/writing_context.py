@@ -0,0 +1,141 @@
+"""
+Story context for continue-writing prompts.
+
+The text before the cursor is scanned with the project's lore mention
+matcher (see lore_mentions); only the lore items it names are included,
+most mentioned first. The outline summaries of the current chapter and its
+neighbours in reading order tell the model where the plot is heading.
+
+Both are trimmed to WRITING_CONTEXT_TOKEN_BUDGET: outline summaries come
+first (current chapter, then the following ones, then the preceding ones),
+lore fills the rest, each entry shortened to its description when its full
+text no longer fits. Without any mentions, e.g. at the start of a chapter,
+lore falls back to similarity retrieval.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.lore_mentions import get_matcher
+from app.core.lore_retrieval import format_lore_context, retrieve_lore
+from app.core.tokens import count_tokens, truncate_to_tokens
+from app.models.lore import LoreItem
+from app.models.outline import Outline
+from app.models.project import Chapter, Volume
+
+MIN_ENTRY_TOKENS = 20  # Smaller remainders are not worth a truncated entry
+
+
+@dataclass
+class WritingContext:
+    lore_context: str
+    outline_context: str
+    lore_ids: List[int]
+    tokens: int
+
+
+def outline_summaries(content: dict) -> Dict[Tuple[int, int], str]:
+    """Chapter summaries of an outline keyed by (volume order_no, chapter order_no), as outline apply numbers them."""
+    summaries: Dict[Tuple[int, int], str] = {}
+    for vol_index, vol_data in enumerate(content.get("volumes", []), start=1):
+        for chap_index, chap_data in enumerate(vol_data.get("chapters", []), start=1):
+            key = (vol_data.get("order_no") or vol_index, chap_data.get("order_no") or chap_index)
+            summaries.setdefault(key, chap_data.get("summary", ""))
+    return summaries
+
+
+async def mentioned_lore(db: AsyncSession, project_id: int, text: str) -> List[LoreItem]:
+    """Lore items named in `text`, most mentioned first, then most recently first mentioned."""
+    mentions = (await get_matcher(db, project_id)).scan(text)
+    if not mentions:
+        return []
+    items = (await db.execute(
+        select(LoreItem).where(LoreItem.project_id == project_id, LoreItem.id.in_(list(mentions)))
+    )).scalars().all()
+    return sorted(items, key=lambda item: (-mentions[item.id][0], -mentions[item.id][1]))
+
+
+async def _neighbour_chapters(db: AsyncSession, chapter: Chapter) -> List[Tuple[str, int, int, str]]:
+    """(role, volume order_no, chapter order_no, title) for the chapter and its neighbours, in priority order."""
+    volume_order = (await db.execute(select(Volume.order_no).where(Volume.id == chapter.volume_id))).scalar()
+    position = tuple_(Volume.order_no, Chapter.order_no)
+    here = tuple_(volume_order, chapter.order_no)
+    base = (
+        select(Volume.order_no.label("volume_order_no"), Chapter.order_no, Chapter.title)
+        .join(Volume, Volume.id == Chapter.volume_id)
+        .where(Chapter.project_id == chapter.project_id)
+        .limit(settings.WRITING_CONTEXT_NEIGHBOURS)
+    )
+    following = (await db.execute(
+        base.where(position > here).order_by(Volume.order_no, Chapter.order_no)
+    )).all()
+    preceding = (await db.execute(
+        base.where(position < here).order_by(Volume.order_no.desc(), Chapter.order_no.desc())
+    )).all()
+    return (
+        [("本章", volume_order, chapter.order_no, chapter.title)]
+        + [("后续章节", row.volume_order_no, row.order_no, row.title) for row in following]
+        + [("前序章节", row.volume_order_no, row.order_no, row.title) for row in preceding]
+    )
+
+
+async def _outline_lines(db: AsyncSession, chapter: Chapter) -> List[Tuple[Tuple[int, int], str]]:
+    """(reading position, line) per chapter that has an outline summary; position keeps the output in order."""
+    content = (await db.execute(
+        select(Outline.content).where(Outline.project_id == chapter.project_id)
+    )).scalar()
+    if not content:
+        return []
+    summaries = outline_summaries(content)
+    lines = []
+    for role, volume_order, chapter_order, title in await _neighbour_chapters(db, chapter):
+        summary = summaries.get((volume_order, chapter_order))
+        if summary:
+            lines.append(((volume_order, chapter_order), f"- {role}《{title}》：{summary}"))
+    return lines
+
+
+async def assemble_writing_context(
+    db: AsyncSession, chapter: Chapter, window: str, instruction: Optional[str] = None
+) -> WritingContext:
+    """Lore and outline context for continuing `chapter` after `window`, within the token budget."""
+    budget = settings.WRITING_CONTEXT_TOKEN_BUDGET
+
+    outline = []
+    for position, line in await _outline_lines(db, chapter):
+        cost = count_tokens(line) + 1
+        if cost > budget:
+            if budget >= MIN_ENTRY_TOKENS:
+                line = truncate_to_tokens(line, budget - 1)
+                outline.append((position, line))
+                budget -= count_tokens(line) + 1
+            break
+        outline.append((position, line))
+        budget -= cost
+    outline.sort()
+
+    scanned = "\n".join(filter(None, [chapter.title, window, instruction]))
+    items = await mentioned_lore(db, chapter.project_id, scanned)
+    if not items:
+        items = await retrieve_lore(db, chapter.project_id, scanned)
+    lore, lore_ids = [], []
+    for item in items:
+        if budget < MIN_ENTRY_TOKENS:
+            break
+        line = format_lore_context([item])
+        if count_tokens(line) + 1 > budget:
+            line = truncate_to_tokens(format_lore_context([item], detailed=False), budget - 1)
+        lore.append(line)
+        lore_ids.append(item.id)
+        budget -= count_tokens(line) + 1
+
+    return WritingContext(
+        lore_context="\n".join(lore) or "暂无设定库信息。",
+        outline_context="\n".join(line for _, line in outline) or "暂无大纲信息。",
+        lore_ids=lore_ids,
+        tokens=settings.WRITING_CONTEXT_TOKEN_BUDGET - budget,
+    )
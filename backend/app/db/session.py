@@ -1,10 +1,119 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import itertools
+import time
+from typing import Dict, Optional
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
-engine = create_async_engine(settings.DATABASE_URI, echo=True)
+# Upper bounds (seconds) of the pool checkout latency histogram
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """Checkout latency histogram for one pool; saturation is read from the pool itself."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.buckets = [0] * (len(CHECKOUT_BUCKETS) + 1)  # Last bucket: slower than every bound
+
+    def observe(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        for i, bound in enumerate(CHECKOUT_BUCKETS):
+            if wait <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _make_engine(uri: str) -> AsyncEngine:
+    connect_args = {}
+    if uri.startswith("postgresql+asyncpg"):
+        # 0 disables asyncpg's prepared statement cache (needed behind pgbouncer in transaction mode)
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return create_async_engine(
+        uri,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+engine = _make_engine(settings.DATABASE_URI)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Read-only traffic that tolerates replication lag (listings, stats, exports) can go to a replica
+replica_engine: Optional[AsyncEngine] = (
+    _make_engine(settings.DATABASE_REPLICA_URI) if settings.DATABASE_REPLICA_URI else None
+)
+ReadSessionLocal = (
+    sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine else AsyncSessionLocal
+)
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+async def _get_replica_db():
+    async with ReadSessionLocal() as session:
+        yield session
+
+# Without a replica this is get_db itself, so FastAPI shares one session per request
+get_read_db = _get_replica_db if replica_engine else get_db
+
+
+def pool_stats() -> Dict[str, dict]:
+    """Pool saturation and checkout latency per engine."""
+    stats = {}
+    for name, eng in (("primary", engine), ("replica", replica_engine)):
+        if eng is None:
+            continue
+        pool = eng.pool
+        metrics: PoolMetrics = pool.metrics
+        capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "idle": pool.checkedin(),
+            "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+            "checkouts": metrics.checkouts,
+            "avg_wait_ms": round(1000 * metrics.total_wait / metrics.checkouts, 3) if metrics.checkouts else 0.0,
+            "max_wait_ms": round(1000 * metrics.max_wait, 3),
+            # Cumulative, Prometheus style: checkouts that waited at most `bound` seconds
+            "wait_histogram": dict(zip(
+                [f"le_{bound}" for bound in CHECKOUT_BUCKETS] + ["le_inf"],
+                itertools.accumulate(metrics.buckets),
+            )),
+        }
+    return stats
@@ -21,6 +21,41 @@ from app.api.api import api_router
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+from app.core.events import event_bus
+from app.core.jobs import worker_pool
+
+@app.on_event("startup")
+async def start_job_workers():
+    event_bus.start()
+    if settings.JOB_WORKERS > 0:
+        worker_pool.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await worker_pool.stop()
+    await event_bus.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Male-Lead Web Novel AI Author Tool API"}
+
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+from app.core.ai_client import ai_client
+from app.core.security import password_hasher
+from app.db.session import pool_stats
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Pool, cache and hasher internals for operators; needs `Authorization: Bearer <METRICS_TOKEN>`."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return {
+        "db_pool": pool_stats(),
+        "ai_cache": ai_client.cache_stats(),
+        "password_hashing": password_hasher.stats(),
+    }
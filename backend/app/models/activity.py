@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, ForeignKey, Date, DateTime, Index
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+class WritingActivity(Base):
+    """
+    Daily word-count rollup per user and project, written incrementally on every
+    content change so stats and streaks never have to scan chapters.
+    """
+    __tablename__ = "writing_activity"
+    __table_args__ = (
+        Index("ix_writing_activity_user_day", "user_id", "day"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC
+
+    # Sum of positive / negative word-count changes across the day's saves
+    words_added = Column(Integer, nullable=False, server_default="0")
+    words_deleted = Column(Integer, nullable=False, server_default="0")
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+class ParagraphCheck(Base):
+    """
+    Cached consistency result for one paragraph of a chapter.
+    A paragraph is only re-sent to the LLM when its text hash or the stamp of the lore it mentions changes.
+    """
+    __tablename__ = "paragraph_checks"
+    __table_args__ = (
+        UniqueConstraint("chapter_id", "paragraph_hash", name="uq_paragraph_checks_chapter_hash"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    chapter_id = Column(Integer, ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False)
+    paragraph_hash = Column(String(64), nullable=False)
+    lore_stamp = Column(String(64), nullable=False)
+
+    # Issues found in this paragraph; "offset" is relative to the paragraph start
+    issues = Column(JSONB, nullable=False, server_default='[]')
+
+    checked_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    chapter = relationship("Chapter")
@@ -0,0 +1,43 @@
+import enum
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class Job(Base):
+    """Durable background job, claimed by worker pools with SELECT ... FOR UPDATE SKIP LOCKED."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(String, primary_key=True)  # uuid4, doubles as the public task id
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=True, index=True)
+    kind = Column(String, nullable=False)  # Handler name, e.g. "bible", "outline", "consistency_bulk"
+    status = Column(String, default=JobStatus.QUEUED, nullable=False)
+
+    payload = Column(JSONB, nullable=False, server_default='{}')
+    result = Column(JSONB, nullable=True)
+    progress = Column(Integer, default=0, nullable=False)
+    message = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    run_after = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # Lease held by the worker running the job; renewed by its heartbeat and on every progress update
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,6 +1,7 @@
 import enum
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Enum, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Enum, DateTime, Index
 from sqlalchemy.dialects.postgresql import JSONB
+from pgvector.sqlalchemy import Vector
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -17,9 +18,15 @@ class LoreCategory(str, enum.Enum):
 
 class LoreItem(Base):
     __tablename__ = "lore_items"
+    __table_args__ = (
+        # Trigram indexes for project search
+        Index("ix_lore_items_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_lore_items_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}),
+        Index("ix_lore_items_content_trgm", "content", postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
     category = Column(String, nullable=False, index=True) # Using string to store enum value
     name = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=True)
@@ -40,3 +47,26 @@ class LoreItem(Base):
     # Relationships
     project = relationship("Project", backref="lore_items")
     first_appearance_chapter = relationship("Chapter", foreign_keys=[first_appearance_chapter_id])
+
+class LoreEmbedding(Base):
+    """Semantic vector for a lore item, used to retrieve only the top-k relevant entries for prompts."""
+    __tablename__ = "lore_embeddings"
+
+    lore_id = Column(Integer, ForeignKey("lore_items.id", ondelete="CASCADE"), primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    model = Column(String, nullable=False)
+    # sha256 of the embedded text, so unchanged items are not re-embedded
+    content_hash = Column(String(64), nullable=False)
+    # Dimensionless so the embedding model can change; rows are filtered by `model`
+    embedding = Column(Vector(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class LoreMention(Base):
+    """How often (and where first) a lore item's name or aliases occur in a chapter; maintained on every save."""
+    __tablename__ = "lore_mentions"
+
+    lore_id = Column(Integer, ForeignKey("lore_items.id", ondelete="CASCADE"), primary_key=True)
+    chapter_id = Column(Integer, ForeignKey("chapters.id", ondelete="CASCADE"), primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    count = Column(Integer, nullable=False)
+    first_offset = Column(Integer, nullable=False)  # Character offset of the first mention in the chapter
@@ -1,6 +1,6 @@
 from typing import List
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum, Index
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.db.base import Base
 import enum
@@ -48,15 +48,22 @@ class ChapterStatus(str, enum.Enum):
 
 class Chapter(Base):
     __tablename__ = "chapters"
+    __table_args__ = (
+        # Trigram index for project search (ILIKE '%...%'), works for CJK text without segmentation
+        Index("ix_chapters_content_trgm", "content", postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
     volume_id = Column(Integer, ForeignKey("volumes.id"), nullable=False)
     title = Column(String, nullable=False)
     order_no = Column(Integer, nullable=False)
     status = Column(String, default=ChapterStatus.DRAFT)
-    content = Column(Text, nullable=True)
+    # Deferred: project/volume trees only load metadata. Use undefer(Chapter.content) when the text is needed.
+    content = deferred(Column(Text, nullable=True))
     word_count = Column(Integer, default=0)
+    # Bumped on every content change; delta saves must name the version they were based on
+    version = Column(Integer, default=1, server_default="1", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, LargeBinary, Index
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 
 from app.db.base import Base
@@ -9,9 +9,17 @@ class ChapterSnapshot(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     chapter_id = Column(Integer, ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False)
-    content = Column(Text, nullable=True)
+    # Legacy plain-text storage; new snapshots keep their text in `data` (see app.core.snapshot_store)
+    content = deferred(Column(Text, nullable=True))
     word_count = Column(Integer, default=0)
-    
+
+    # "text" (legacy), "keyframe" (compressed text) or "delta" (compressed diff against base_id)
+    storage = Column(String(16), server_default="text", nullable=False)
+    data = deferred(Column(LargeBinary, nullable=True))
+    base_id = Column(Integer, ForeignKey("chapter_snapshots.id"), nullable=True)
+    chain_depth = Column(Integer, server_default="0", nullable=False)  # Deltas since the last keyframe
+    content_hash = Column(String(64), nullable=True)
+
     # "auto" or "manual" distinction
     snapshot_type = Column(String, default="manual", nullable=False, index=True)
     
@@ -20,3 +28,7 @@ class ChapterSnapshot(Base):
 
     # Relationships
     chapter = relationship("Chapter", backref="snapshots")
+
+    __table_args__ = (
+        Index("ix_chapter_snapshots_chapter_created", "chapter_id", "created_at"),
+    )
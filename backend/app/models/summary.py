@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, text
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+class StorySummary(Base):
+    """
+    Rolling summary of a chapter, a volume (built from its chapter summaries) or
+    the whole project (built from the volume summaries). Regenerated only when
+    `source_hash`, the hash of the text it was written from, no longer matches.
+    """
+    __tablename__ = "story_summaries"
+    __table_args__ = (
+        Index("uq_story_summaries_chapter", "chapter_id", unique=True, postgresql_where=text("level = 'chapter'")),
+        Index("uq_story_summaries_volume", "volume_id", unique=True, postgresql_where=text("level = 'volume'")),
+        Index("uq_story_summaries_project", "project_id", unique=True, postgresql_where=text("level = 'project'")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    level = Column(String, nullable=False)  # chapter, volume, project
+    volume_id = Column(Integer, ForeignKey("volumes.id", ondelete="CASCADE"), nullable=True)
+    chapter_id = Column(Integer, ForeignKey("chapters.id", ondelete="CASCADE"), nullable=True)
+    source_hash = Column(String(64), nullable=False)
+    content = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
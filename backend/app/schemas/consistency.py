@@ -6,6 +6,7 @@ class ConsistencyIssue(BaseModel):
     description: str
     quote: Optional[str] = None
     suggestion: Optional[str] = None
+    offset: Optional[int] = None  # Position of `quote` in the chapter content, if located
 
 class ConsistencyCheckResponse(BaseModel):
     issues: List[ConsistencyIssue]
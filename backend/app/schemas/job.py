@@ -0,0 +1,20 @@
+from typing import Optional, Any, Dict
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str
+    project_id: Optional[int] = None
+    progress: int
+    message: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    attempts: int
+    max_attempts: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -32,3 +32,22 @@ class LoreItem(LoreItemBase):
     updated_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+class LoreMention(BaseModel):
+    """One chapter mentioning one lore item."""
+    lore_id: int
+    chapter_id: int
+    count: int
+    first_offset: int
+
+class LoreAppearance(LoreMention):
+    """A mention listed under its lore item, with the chapter's place in reading order."""
+    chapter_title: str
+    volume_id: int
+    volume_order_no: int
+    chapter_order_no: int
+
+class ChapterLoreMention(LoreMention):
+    """A mention listed under its chapter, with the lore item it names."""
+    name: str
+    category: str
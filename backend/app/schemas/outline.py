@@ -1,6 +1,6 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 class OutlineBase(BaseModel):
     title: str
@@ -14,6 +14,7 @@ class OutlineCreate(BaseModel):
 class OutlineGenerateRequest(BaseModel):
     project_id: int
     prompt: Optional[str] = None
+    volume_count: Optional[int] = Field(None, ge=1, le=20) # Defaults to OUTLINE_DEFAULT_VOLUMES
 
 class OutlineUpdateRequest(BaseModel):
     content: Dict[str, Any]
@@ -33,3 +34,20 @@ class Outline(OutlineBase):
     updated_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+class OutlineApplyItem(BaseModel):
+    volume_order_no: int
+    order_no: Optional[int] = None # None for volume entries
+    title: str
+    id: Optional[int] = None # Existing row, None for creates
+
+class OutlineApplyDiff(BaseModel):
+    create: List[OutlineApplyItem] = []
+    update: List[OutlineApplyItem] = []
+    untouched: List[OutlineApplyItem] = []
+
+class OutlineApplyResponse(BaseModel):
+    message: str
+    dry_run: bool
+    volumes: OutlineApplyDiff
+    chapters: OutlineApplyDiff
@@ -1,6 +1,6 @@
 from typing import Optional, List
 from datetime import datetime
-from pydantic import BaseModel, constr
+from pydantic import BaseModel, Field, constr
 
 # Chapter Schemas
 class ChapterBase(BaseModel):
@@ -17,18 +17,51 @@ class ChapterUpdate(BaseModel):
     order_no: Optional[int] = None
     status: Optional[str] = None
     content: Optional[str] = None
+    version: Optional[int] = None # When set, the save is rejected unless it matches the stored version
+
+class ChapterTextOp(BaseModel):
+    """Replace `delete` UTF-16 code units at `offset` with `insert`; offsets see the text left by earlier ops."""
+    offset: int = Field(ge=0)
+    delete: int = Field(0, ge=0)
+    insert: str = ""
+
+class ChapterPatch(BaseModel):
+    version: int
+    base_hash: Optional[str] = None # sha256 hex of the content the ops were computed against
+    result_hash: Optional[str] = None # sha256 hex of the content the client expects after the ops
+    ops: List[ChapterTextOp]
+
+class ChapterPatchResult(BaseModel):
+    id: int
+    version: int
+    content_hash: str
+    word_count: int
+    updated_at: Optional[datetime] = None
 
 class Chapter(ChapterBase):
     id: int
     project_id: int
     volume_id: int
     word_count: int
+    version: int = 1
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class ChapterSummary(BaseModel):
+    """Content-free chapter node used by project/volume trees."""
+    id: int
+    title: str
+    order_no: int
+    word_count: int
+    status: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # Volume Schemas
 class VolumeBase(BaseModel):
     title: str
@@ -46,11 +79,14 @@ class Volume(VolumeBase):
     project_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
-    chapters: List[Chapter] = []
+    chapters: List[ChapterSummary] = []
 
     class Config:
         from_attributes = True
 
+class VolumeWithContent(Volume):
+    chapters: List[Chapter] = []
+
 # Project Schemas
 class ProjectBase(BaseModel):
     title: str
@@ -80,3 +116,6 @@ class Project(ProjectBase):
 
     class Config:
         from_attributes = True
+
+class ProjectWithContent(Project):
+    volumes: List[VolumeWithContent] = []
@@ -0,0 +1,32 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+class SearchSnippet(BaseModel):
+    offset: int # Position of the snippet in the full text
+    text: str
+    highlights: List[List[int]] # [start, end] of each match within `text`
+    field: Optional[str] = None # Lore only: "description" or "content"
+
+class SearchResult(BaseModel):
+    type: Literal["chapter", "lore"]
+    id: int
+    title: str
+    hits: int
+    snippets: List[SearchSnippet] = []
+    # Chapters
+    volume_id: Optional[int] = None
+    volume_order_no: Optional[int] = None
+    order_no: Optional[int] = None
+    # Lore
+    category: Optional[str] = None
+
+class SearchSection(BaseModel):
+    total: int
+    results: List[SearchResult]
+
+class SearchResponse(BaseModel):
+    query: str
+    offset: int
+    limit: int
+    chapters: Optional[SearchSection] = None
+    lore: Optional[SearchSection] = None
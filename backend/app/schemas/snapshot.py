@@ -1,9 +1,10 @@
-from typing import Optional, List
+from typing import Any, Literal, Optional, List
 from datetime import datetime
 from pydantic import BaseModel
 
 class SnapshotCreate(BaseModel):
     label: Optional[str] = None
+    snapshot_type: Literal["manual", "auto"] = "manual" # Auto snapshots are thinned by the retention policy
 
 class Snapshot(BaseModel):
     id: int
@@ -20,8 +21,31 @@ class SnapshotList(BaseModel):
     id: int
     chapter_id: int
     word_count: int
+    snapshot_type: str = "manual"
     label: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
+
+class SnapshotQuota(BaseModel):
+    """Snapshot counts against their quotas; a limit of None means unlimited."""
+    chapter_count: int
+    chapter_limit: Optional[int] = None
+    user_count: int
+    user_limit: Optional[int] = None
+
+class SnapshotDiff(BaseModel):
+    """One page of hunks turning version a into version b (see app.core.text_diff for the hunk format)."""
+    a_id: int
+    b_id: Optional[int] = None # None: the chapter's current content
+    a_hash: str
+    b_hash: str
+    lines_added: int
+    lines_deleted: int
+    granularity: Literal["line", "char"] # "line" when char granularity was asked for but the texts are too large
+    too_large: bool = False # Over SNAPSHOT_DIFF_MAX_CHARS: character refinement was skipped
+    total_hunks: int
+    offset: int
+    limit: int
+    hunks: List[Any]
@@ -0,0 +1,17 @@
+from typing import List, Literal, Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+
+class StorySummary(BaseModel):
+    level: Literal["chapter", "volume", "project"]
+    volume_id: Optional[int] = None
+    chapter_id: Optional[int] = None
+    content: str
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class StorySummaries(BaseModel):
+    synopsis: Optional[StorySummary] = None
+    volumes: List[StorySummary] = [] # In reading order
+    chapters: List[StorySummary] = [] # In reading order
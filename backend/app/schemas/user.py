@@ -10,6 +10,13 @@ class UserCreate(UserBase):
 class UserLogin(UserBase):
     password: str
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class User(UserBase):
     id: int
     is_active: bool
@@ -226,7 +226,7 @@ export default function ChapterEditorPage({ params }: { params: Promise<{ id: st
         if (!snapshotCreatedForFix) {
             try {
                 await handleSave(content, true);
-                await createSnapshot(chapter.id, `修复前自动快照 - ${new Date().toLocaleString('zh-CN')}`);
+                await createSnapshot(chapter.id, `修复前自动快照 - ${new Date().toLocaleString('zh-CN')}`, 'auto');
                 setSnapshotCreatedForFix(true);
             } catch (e) {
                 console.error('Auto-snapshot failed:', e);
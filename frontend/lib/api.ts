@@ -401,12 +401,17 @@ export interface Snapshot {
     chapter_id: number;
     content?: string;
     word_count: number;
+    snapshot_type?: 'manual' | 'auto';
     label?: string;
     created_at: string;
 }
 
-export const createSnapshot = async (chapterId: number, label?: string): Promise<Snapshot> => {
-    const response = await api.post<Snapshot>(`/chapters/${chapterId}/snapshots`, { label });
+export const createSnapshot = async (
+    chapterId: number,
+    label?: string,
+    snapshotType: 'manual' | 'auto' = 'manual',
+): Promise<Snapshot> => {
+    const response = await api.post<Snapshot>(`/chapters/${chapterId}/snapshots`, { label, snapshot_type: snapshotType });
     return response.data;
 };
 